@@ -0,0 +1,24 @@
+"""
+BatchAvoider.py is the IR obstacle avoider written as a controller function for the experiment runner, for example:
+
+    python -m src.experiment --worlds maze1.xml maze2.xml --controllers examples/BatchAvoider.py:controller
+
+The speeds can be swept by passing them as run parameters.
+"""
+
+speed = 60
+turn_speed = 50
+
+
+def controller(observation, memory):
+    """Drives forwards and spins away from whichever side sees an obstacle. When both sides, or only the middle
+    sensor, see one it keeps spinning the way it last turned."""
+    ir = observation["ir"]
+    if not any(ir):
+        return memory.get("speed", speed), 0
+    if ir[0] and not ir[-1]:
+        # obstacle on the left, spin right
+        memory["direction"] = -1
+    elif ir[-1] and not ir[0]:
+        memory["direction"] = 1
+    return 0, memory.setdefault("direction", 1) * memory.get("turn_speed", turn_speed)
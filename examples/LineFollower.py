@@ -9,6 +9,8 @@ initio.init()
 # main loop
 try:
     while True:
+        # wait for the next sensor reading rather than spinning on the old one
+        initio.wait_for_update(1.0)
         if initio.irLeftLine():
             initio.turnForward(speed - turn_speed, speed + turn_speed)
             time.sleep(0.1)
@@ -5,6 +5,9 @@ pysim.py this script handles the loading of the simulator.
 from tkinter import DISABLED
 
 import pyglet
+from src.commandline import parse_args
+from src.robots import robotlink
+from src.simclock import SimClock
 from src.windows.simulator import Simulator
 from src.windows.startwindow import StartWindow
 
@@ -23,7 +26,10 @@ from src.windows.startwindow import StartWindow
 #     except KeyboardInterrupt:
 #         print("Goodbye!")
 
+
 if __name__ == "__main__":
+    args = parse_args()
+    robotlink.configure(args.host, args.command_port, args.data_port)
     try:
         selected_file = ""
         selected_robot = ""
@@ -49,11 +55,19 @@ if __name__ == "__main__":
                 print(selected_file, selected_robot)
             # run the simulator
             if selected_file != "None" and selected_robot != None:
-                simulator = Simulator(selected_file, selected_robot, start_window)
-                pyglet.clock.schedule_interval(simulator.update, 1.0 / 30)
+                clock = SimClock(args.fixed_step, args.seed, args.lockstep)
+                simulator = Simulator(
+                    selected_file, selected_robot, start_window, clock
+                )
+                if args.fast and clock.is_fixed_step():
+                    # step as fast as possible, rendering a frame every now and then
+                    pyglet.clock.schedule(simulator.fast_forward)
+                else:
+                    pyglet.clock.schedule_interval(simulator.update, 1.0 / 30)
                 pyglet.app.run()
                 # Clean up when simulator window closes
                 pyglet.clock.unschedule(simulator.update)
+                pyglet.clock.unschedule(simulator.fast_forward)
                 simulator.clear()
                 simulator.close()
                 # del(simulator)
@@ -7,6 +7,10 @@ after the user has selected a world filea and robot but on ther otherhand allows
 from tkinter import Tk, Toplevel, DISABLED
 import gc
 
+from src.commandline import parse_args
+
+args = parse_args()
+
 try:
     selected_file = ""
     selected_robot = ""
@@ -38,18 +42,28 @@ try:
 
         # load pyglet + other deps for the simulator
         import pyglet
+        from src.robots import robotlink
+        from src.simclock import SimClock
         from src.windows.simulator import Simulator
 
+        robotlink.configure(args.host, args.command_port, args.data_port)
+
         # run the simulator
 
         if selected_file != "None" and selected_robot is not None:
-            simulator = Simulator(selected_file, selected_robot, start_window)
-            pyglet.clock.schedule_interval(simulator.update, 1.0 / 30)
+            clock = SimClock(args.fixed_step, args.seed, args.lockstep)
+            simulator = Simulator(selected_file, selected_robot, start_window, clock)
+            if args.fast and clock.is_fixed_step():
+                # step as fast as possible, rendering a frame every now and then
+                pyglet.clock.schedule(simulator.fast_forward)
+            else:
+                pyglet.clock.schedule_interval(simulator.update, 1.0 / 30)
             # pyglet.app.EventLoop.has_exit = False
             pyglet.app.run()
             # Clean up when simulator window closes
             print("3")
             pyglet.clock.unschedule(simulator.update)
+            pyglet.clock.unschedule(simulator.fast_forward)
             print("4")
             simulator.clear()
             print("5")
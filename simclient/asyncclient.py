@@ -0,0 +1,281 @@
+"""
+asyncclient.py provides AsyncSimulatorClient, the simulator client for controllers written with asyncio. It speaks the
+same binary protocol as SimulatorClient, through the same codec, but runs on the event loop of the controller with
+datagram endpoints, or the shared memory channels watched by the loop, instead of background threads:
+
+    async with AsyncSimulatorClient() as client:
+        async for frame in client.frames():
+            if frame.ir_left:
+                await client.set_velocity(0, 20)
+            else:
+                await client.set_velocity(20, 0)
+
+Each frame is the SensorSnapshot of a state message. A consumer slower than the simulator gets the newest frame each
+time it asks, the frames in between are skipped rather than queued.
+
+As with SimulatorClient, commands are sent as soon as a setter changes them and repeated every KEEPALIVE_INTERVAL
+seconds, and in lockstep mode every state message is answered with the current command straight away.
+"""
+
+import asyncio
+
+from . import protocol
+from .simclient import (
+    KEEPALIVE_INTERVAL,
+    NOT_CONNECTED,
+    PUBLISH_INTERVAL,
+    decode_state,
+    open_shared_channels,
+    resolve,
+    sensor_snapshot,
+)
+from .sharedmemory import MAX_MESSAGE_SIZE
+
+
+class StateProtocol(asyncio.DatagramProtocol):
+    def __init__(self, client):
+        """Receives the state messages for a client on the event loop."""
+        self.client = client
+
+    def datagram_received(self, data, addr):
+        try:
+            self.client.receive_state(decode_state(data, robot_id=self.client.robot_id))
+        except Exception:
+            # a malformed datagram is dropped, the endpoint keeps receiving
+            pass
+
+
+class AsyncSimulatorClient(object):
+    def __init__(
+        self, transport="auto", host=None, command_port=None, data_port=None, robot_id=0
+    ):
+        """The ports are found like those of SimulatorClient, nothing is opened until connect() is awaited."""
+        self.transport_mode = transport
+        self.robot_id = robot_id
+        self.host, self.command_port, self.data_port = resolve(
+            host, command_port, data_port, robot_id
+        )
+        self.transport = None
+        self.shared_state = None
+        self.shared_command = None
+        self.shared_buffer = bytearray(MAX_MESSAGE_SIZE)
+        self.keepalive = None
+        self.closed = False
+
+        # readings of the last state message, and the event set when the next one arrives, created on the loop
+        self.sensors = NOT_CONNECTED
+        self.frame_event = None
+        # step number of the last lockstep state message, None if the simulator is not in lockstep mode
+        self.lockstep_step = None
+
+        # the command: velocities, sonar servo angle and the red, green and blue values of the leds in the order of
+        # the command message, front, right, back and left, two of each
+        self.vx = 0
+        self.vth = 0
+        self.sonar_angle = 0
+        self.leds = [(0, 0, 0)] * 8
+        # number of commands sent, and the values and loop time of the last one sent
+        self.seq = 0
+        self.sent_values = None
+        self.sent_time = 0.0
+
+    async def connect(self):
+        """Opens the shared memory channels or the socket to the simulator and starts saying hello to it."""
+        loop = asyncio.get_running_loop()
+        self.frame_event = asyncio.Event()
+        if self.transport_mode != "udp":
+            try:
+                self.shared_state, self.shared_command = open_shared_channels(
+                    self.command_port, self.robot_id
+                )
+            except (OSError, ValueError):
+                if self.transport_mode == "shm":
+                    raise
+        if self.shared_state is not None:
+            loop.add_reader(self.shared_state.fileno(), self.read_shared_state)
+        else:
+            self.transport, _ = await loop.create_datagram_endpoint(
+                lambda: StateProtocol(self), local_addr=(self.host, self.data_port)
+            )
+            self.data_port = self.transport.get_extra_info("sockname")[1]
+        self.keepalive = loop.create_task(self.keep_alive())
+        return self
+
+    async def close(self):
+        """Closes the channels or socket, frames() and wait_for_update() return."""
+        if self.closed:
+            return
+        self.closed = True
+        if self.keepalive is not None:
+            self.keepalive.cancel()
+        if self.transport is not None:
+            self.transport.close()
+        if self.shared_state is not None:
+            asyncio.get_running_loop().remove_reader(self.shared_state.fileno())
+            self.shared_state.close()
+            self.shared_command.close()
+        if self.frame_event is not None:
+            self.frame_event.set()
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def snapshot(self):
+        """Returns the SensorSnapshot holding all the readings of the last state message."""
+        return self.sensors
+
+    async def wait_for_update(self, timeout=None, after=None):
+        """Waits for a frame newer than the frame numbered after, by default the current one, and returns its
+        SensorSnapshot. Returns None if timeout seconds passed first or the client was closed. Raises RuntimeError if
+        the client has not been connected yet."""
+        if self.frame_event is None:
+            raise RuntimeError("the client is not connected, await connect() first")
+        if after is None:
+            after = self.sensors.frame
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        try:
+            while self.sensors.frame <= after and not self.closed:
+                remaining = None if deadline is None else deadline - loop.time()
+                await asyncio.wait_for(self.frame_event.wait(), remaining)
+        except asyncio.TimeoutError:
+            return None
+        if self.closed:
+            return None
+        return self.sensors
+
+    async def frames(self):
+        """Yields the SensorSnapshot of each new frame as it arrives, until the client is closed."""
+        frame = self.sensors.frame
+        while True:
+            sensors = await self.wait_for_update(after=frame)
+            if sensors is None:
+                return
+            frame = sensors.frame
+            yield sensors
+
+    async def set_velocity(self, vx, vth):
+        """Sets the linear (vx) and angular (vth) velocity of the robot."""
+        self.vx = vx
+        self.vth = vth
+        self.send_changes()
+
+    async def stop(self):
+        """Stops both motors."""
+        await self.set_velocity(0, 0)
+
+    async def set_servo(self, degrees):
+        """Sets the angle of the panning sonar of the robot."""
+        self.sonar_angle = degrees
+        self.send_changes()
+
+    async def set_led(self, led, red, green, blue):
+        """Sets the pair of LEDs on one side of the robot, 0 front, 1 right, 2 back and 3 left, to an RGB value.
+        0 <= R,G,B <= 4095"""
+        self.leds[2 * led] = self.leds[2 * led + 1] = (red, green, blue)
+        self.send_changes()
+
+    async def set_all_leds(self, red, green, blue):
+        """Sets all LEDs to an RGB value. 0 <= R,G,B <= 4095"""
+        self.leds = [(red, green, blue)] * 8
+        self.send_changes()
+
+    def get_command_values(self):
+        """Returns the values of the command for the connected robot, see SimulatorClient.get_command_message(), or
+        None if no robot is connected yet."""
+        if self.sensors.robot_name == "INITIO":
+            return (self.vx, self.vth, self.sonar_angle)
+        elif self.sensors.robot_name == "PI2GO":
+            return (self.vx, self.vth) + tuple(
+                int(value) for led in self.leds for value in led
+            )
+        return None
+
+    def send_changes(self):
+        """Sends the command straight away if it differs from the last one sent. In lockstep mode commands are only
+        sent in answer to the state messages."""
+        if self.closed or self.lockstep_step is not None:
+            return
+        if self.get_command_values() != self.sent_values:
+            self.send_command()
+
+    def send_command(self, step=None):
+        """Sends the command, or a hello message while no robot is connected, tagged with the step number of a
+        lockstep state message if given."""
+        model = protocol.MODELS.get(self.sensors.robot_name)
+        self.sent_values = self.get_command_values()
+        if model is None:
+            data = protocol.encode(
+                protocol.HELLO, protocol.NO_MODEL, robot_id=self.robot_id
+            )
+        else:
+            self.seq += 1
+            data = protocol.encode(
+                protocol.COMMAND,
+                model,
+                self.sent_values,
+                robot_id=self.robot_id,
+                seq=self.seq,
+                step=step,
+            )
+        self.sent_time = asyncio.get_running_loop().time()
+        if self.shared_command is not None:
+            self.shared_command.send(data)
+        elif self.transport is not None:
+            self.transport.sendto(data, (self.host, self.command_port))
+
+    async def keep_alive(self):
+        """Task which says hello every PUBLISH_INTERVAL seconds until the simulator answers, and then repeats the
+        command when none was sent for KEEPALIVE_INTERVAL seconds."""
+        loop = asyncio.get_running_loop()
+        while not self.closed:
+            if self.sensors.robot_name not in protocol.MODELS:
+                interval = PUBLISH_INTERVAL
+            else:
+                interval = KEEPALIVE_INTERVAL
+            wait = self.sent_time + interval - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            elif self.lockstep_step is None:
+                self.send_command()
+            else:
+                await asyncio.sleep(interval)
+
+    def read_shared_state(self):
+        """Reads the state written to the shared memory state channel, called by the event loop when the simulator
+        signals a new one."""
+        size = self.shared_state.poll(self.shared_buffer)
+        if size is not None:
+            self.receive_state(
+                decode_state(self.shared_buffer, size, robot_id=self.robot_id)
+            )
+
+    def receive_state(self, state):
+        """Replaces the sensor snapshot with a state message decoded by decode_state(), wakes up the consumers of the
+        frames and answers the message in lockstep mode. A lockstep state sent again is answered again but is no new
+        frame."""
+        if state is None or self.closed:
+            return
+        robot_name, values, step = state
+        if step is not None and step == self.sensors.step:
+            # the simulator sent the lockstep state again, the answer was lost
+            self.send_command(step)
+            return
+        sensors = sensor_snapshot(self.sensors.frame + 1, robot_name, values, step)
+        if sensors is None:
+            return
+        if step is not None:
+            self.lockstep_step = step
+        self.sensors = sensors
+        # wake up the current waiters, later ones wait on a new event
+        frame_event = self.frame_event
+        self.frame_event = asyncio.Event()
+        frame_event.set()
+        if self.lockstep_step is not None:
+            self.send_command(self.lockstep_step)
+        elif self.sent_values is None:
+            # the robot is known now, send the command set so far
+            self.send_changes()
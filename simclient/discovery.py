@@ -0,0 +1,123 @@
+"""
+discovery.py lets several simulators and clients share a host. A simulator can be given its ports by the command line,
+the environment (PYSIM_HOST, PYSIM_COMMAND_PORT and PYSIM_DATA_PORT) or configuration, and port 0 lets the operating
+system pick a free one. Every simulator announces the ports it actually bound in a small JSON file in the pysim folder
+of the temporary directory, which clients read to find it.
+
+The command port is where a simulator receives commands. The data port is where it sends the state, 0 meaning that it
+replies to the address the client said hello from instead, so clients of different simulators never compete for a
+port.
+"""
+import json
+import os
+import tempfile
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_DATA_PORT = 5000
+DEFAULT_COMMAND_PORT = 5001
+DISCOVERY_DIR = os.path.join(tempfile.gettempdir(), "pysim")
+
+
+def environment_settings():
+    """Returns the host and ports set in the environment, None for those which are not set."""
+    host = os.environ.get("PYSIM_HOST")
+    command_port = os.environ.get("PYSIM_COMMAND_PORT")
+    data_port = os.environ.get("PYSIM_DATA_PORT")
+    return (
+        host,
+        int(command_port) if command_port else None,
+        int(data_port) if data_port else None,
+    )
+
+
+def announce(host, command_port, data_port, robots=None):
+    """Records the ports bound by a simulator of this process and the robots it serves, a mapping from robot id to robot
+    name, and returns the path of the announcement, which the simulator removes with withdraw() when it closes."""
+    if not os.path.isdir(DISCOVERY_DIR):
+        os.makedirs(DISCOVERY_DIR, exist_ok=True)
+    path = os.path.join(DISCOVERY_DIR, "%s_%d.json" % (host, command_port))
+    announcement = {
+        "pid": os.getpid(),
+        "host": host,
+        "command_port": command_port,
+        "data_port": data_port,
+        "robots": robots or {},
+    }
+    # write then rename so that a client never reads half a file
+    with open(path + ".tmp", "w") as f:
+        json.dump(announcement, f)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def withdraw(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def is_running(pid):
+    """Returns false if the process is known to have exited, only checked on POSIX systems."""
+    if os.name != "posix":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def find_simulators():
+    """Returns the announcements of the simulators running on this host, the most recently started first.
+    Announcements left behind by simulators which did not exit cleanly are removed."""
+    if not os.path.isdir(DISCOVERY_DIR):
+        return []
+    found = []
+    for file_name in os.listdir(DISCOVERY_DIR):
+        if not file_name.endswith(".json"):
+            continue
+        path = os.path.join(DISCOVERY_DIR, file_name)
+        try:
+            with open(path) as f:
+                announcement = json.load(f)
+            modified = os.path.getmtime(path)
+        except (OSError, ValueError):
+            continue
+        if not is_running(announcement.get("pid", 0)):
+            withdraw(path)
+            continue
+        found.append((modified, announcement))
+    found.sort(key=lambda entry: entry[0], reverse=True)
+    return [announcement for _, announcement in found]
+
+
+def resolve(host=None, command_port=None, data_port=None):
+    """Returns the (host, command_port, data_port) a client should use. Values given as arguments win, then those of
+    the environment, then those announced by the most recent simulator matching the host and command port given, and
+    the defaults last."""
+    env_host, env_command_port, env_data_port = environment_settings()
+    host = host if host is not None else env_host
+    command_port = command_port if command_port is not None else env_command_port
+    data_port = data_port if data_port is not None else env_data_port
+    if command_port is None or data_port is None:
+        for announcement in find_simulators():
+            if host is not None and announcement["host"] != host:
+                continue
+            if (
+                command_port is not None
+                and announcement["command_port"] != command_port
+            ):
+                continue
+            host = announcement["host"]
+            command_port = announcement["command_port"]
+            if data_port is None:
+                data_port = announcement["data_port"]
+            break
+    return (
+        host if host is not None else DEFAULT_HOST,
+        command_port if command_port is not None else DEFAULT_COMMAND_PORT,
+        data_port if data_port is not None else DEFAULT_DATA_PORT,
+    )
@@ -0,0 +1,230 @@
+"""
+protocol.py defines the binary form of the messages exchanged between the simulator and the simulator client, shared by
+both sides. Each message is a fixed size header followed by a fixed layout body packed with struct, so building or
+reading a message is a single pack or unpack call rather than formatting, splitting and converting a text string.
+
+The header holds the magic bytes, the protocol version, the kind of message (state or command), the robot model, the
+robot id, a sequence number counting the messages sent by each side and the lockstep step number, NO_STEP if the
+simulator is not in lockstep mode. The bodies hold the same values, in the same order, as the text messages
+<<VALUE1;VALUE2;...>>, without the robot name of the state message which is given by the model.
+
+Several robots can share the sockets of a simulator, the robot id in the header tells which robot a message is from
+or for. Messages are self delimiting, their size is given by their kind and model, so a datagram may carry several
+messages back to back, see batch() and decode_batch(). The simulator sends the state of all its robots that way.
+
+A client sends a hello message, which has no body, from the socket it receives the state on so that the simulator knows
+where to reply when it was not given a fixed data port (see discovery.py).
+
+Values are packed as the type of their field, clamp() brings a value out of the range of its field, such as a LED value
+above 65535, to the nearest one it can hold rather than letting the packing fail.
+
+The text messages are kept as a fallback: the simulator publishes text until a controller sends it a binary command,
+and then answers in kind, so older clients which only speak text keep working.
+"""
+import collections
+import math
+import struct
+
+MAGIC = b"PS"
+VERSION = 1
+# magic, version, kind, model, robot id, sequence number, lockstep step
+HEADER = struct.Struct("<2sBBBxHIi")
+# the header without the magic bytes, checked by is_binary() instead to avoid creating a bytes object per message
+HEADER_FIELDS = struct.Struct("<2xBBBxHIi")
+NO_STEP = -1
+# largest datagram batched, which fits the receive buffers of the clients
+MAX_DATAGRAM_SIZE = 1024
+
+# kinds of message
+STATE = 1
+COMMAND = 2
+HELLO = 3
+
+# robot models, by the robot names used in the text messages, NO_MODEL for messages not about a robot
+NO_MODEL = 0
+INITIO = 1
+PI2GO = 2
+MODELS = {"INITIO": INITIO, "PI2GO": PI2GO}
+MODEL_NAMES = {model: name for name, model in MODELS.items()}
+
+STATE_BODIES = {
+    # sonar range, line left and right, ir left and right, light front left, front right, back right and back left,
+    # control switch
+    INITIO: struct.Struct("<f4B4hB"),
+    # sonar range, line left and right, ir left, middle and right, the four light sensors, the red, green and blue
+    # values of the front, back, right and left leds, control switch
+    PI2GO: struct.Struct("<f5B4h24HB"),
+}
+COMMAND_BODIES = {
+    # linear velocity, angular velocity, sonar servo angle
+    INITIO: struct.Struct("<3f"),
+    # linear velocity, angular velocity, the red, green and blue values of the front, right, back and left leds
+    PI2GO: struct.Struct("<2f24H"),
+}
+BODIES = {
+    STATE: STATE_BODIES,
+    COMMAND: COMMAND_BODIES,
+    HELLO: {NO_MODEL: struct.Struct("<")},
+}
+
+Header = collections.namedtuple("Header", "kind model robot_id seq step")
+
+# ranges of the integer fields of the bodies by struct format character, and the largest float32
+INTEGER_RANGES = {"B": (0, 0xFF), "H": (0, 0xFFFF), "h": (-0x8000, 0x7FFF)}
+FLOAT_MAX = 3.4028234663852886e38
+
+
+def field_types(body):
+    """Returns the struct format character of each field of a body, in order."""
+    types = []
+    count = ""
+    for char in body.format.lstrip("<"):
+        if char.isdigit():
+            count += char
+        else:
+            types.extend(char * int(count or 1))
+            count = ""
+    return types
+
+
+FIELD_TYPES = {
+    kind: {model: field_types(body) for model, body in bodies.items()}
+    for kind, bodies in BODIES.items()
+}
+
+
+def is_binary(data, size=None):
+    """Returns true if the data starts like a binary message, text messages start with <<. size is the number of bytes
+    of data holding the message, all of them if None."""
+    if size is None:
+        size = len(data)
+    return size >= 2 and data[0] == MAGIC[0] and data[1] == MAGIC[1]
+
+
+def message_robot_id(data, size=None):
+    """Returns the robot id of a binary message, or 0 for a text message, which carries no id and addresses the first
+    robot. Returns None if the data is too short to be either."""
+    if size is None:
+        size = len(data)
+    if not is_binary(data, size):
+        return 0
+    if size < HEADER.size:
+        return None
+    return HEADER_FIELDS.unpack_from(data, 0)[3]
+
+
+def seq_difference(newer, older):
+    """Returns how many messages the sequence number newer is ahead of older, negative if it is behind, counting
+    modulo 2**32 as the sequence numbers wrap around."""
+    difference = (newer - older) & 0xFFFFFFFF
+    return difference - 0x100000000 if difference >= 0x80000000 else difference
+
+
+def clamp(kind, model, values):
+    """Returns the values of the body of a message converted to the type of their fields and clamped to the range the
+    fields can hold. Raises ValueError if there are not as many values as fields or one is not a number."""
+    types = FIELD_TYPES[kind][model]
+    if len(values) != len(types):
+        raise ValueError("expected %d values, got %d" % (len(types), len(values)))
+    clamped = []
+    for field_type, value in zip(types, values):
+        value = float(value)
+        if math.isnan(value):
+            raise ValueError("not a number")
+        if field_type in INTEGER_RANGES:
+            low, high = INTEGER_RANGES[field_type]
+            value = int(min(max(value, low), high))
+        else:
+            value = min(max(value, -FLOAT_MAX), FLOAT_MAX)
+        clamped.append(value)
+    return tuple(clamped)
+
+
+def message_size(kind, model):
+    """Returns the size in bytes of a message."""
+    return HEADER.size + BODIES[kind][model].size
+
+
+def encode(kind, model, values=(), robot_id=0, seq=0, step=None):
+    """Packs a message, values are the values of the body in the order of the text message."""
+    body = BODIES[kind][model]
+    data = bytearray(HEADER.size + body.size)
+    HEADER.pack_into(
+        data,
+        0,
+        MAGIC,
+        VERSION,
+        kind,
+        model,
+        robot_id,
+        seq & 0xFFFFFFFF,
+        NO_STEP if step is None else step,
+    )
+    body.pack_into(data, HEADER.size, *values)
+    return bytes(data)
+
+
+def batch(messages, max_size=MAX_DATAGRAM_SIZE):
+    """Joins binary messages into as few datagrams of at most max_size bytes as they fit in, keeping their order, and
+    returns the list of datagrams."""
+    datagrams = []
+    current = []
+    current_size = 0
+    for message in messages:
+        if current and current_size + len(message) > max_size:
+            datagrams.append(b"".join(current))
+            current = []
+            current_size = 0
+        current.append(message)
+        current_size += len(message)
+    if current:
+        datagrams.append(b"".join(current))
+    return datagrams
+
+
+def decode(data, size=None):
+    """Unpacks a message and returns its Header and the tuple of values of its body, or None if the data is not a
+    valid message of this version. data can be any buffer, such as a bytearray filled by socket.recv_into(), with size
+    the number of bytes received, it is read in place without copying."""
+    if size is None:
+        size = len(data)
+    message = decode_at(data, 0, size)
+    if message is None or message[2] != size:
+        return None
+    return message[0], message[1]
+
+
+def decode_batch(data, size=None):
+    """Unpacks the messages of a datagram, one or several joined by batch(), and returns the list of their Header and
+    values, or None if the data does not consist of valid messages of this version. Read in place like decode()."""
+    if size is None:
+        size = len(data)
+    messages = []
+    offset = 0
+    while offset < size:
+        message = decode_at(data, offset, size)
+        if message is None:
+            return None
+        messages.append(message[:2])
+        offset = message[2]
+    return messages
+
+
+def decode_at(data, offset, size):
+    """Unpacks the message starting at offset in the first size bytes of data and returns its Header, the tuple of
+    values of its body and the offset following it, or None if there is no valid message there."""
+    if (
+        size - offset < HEADER.size
+        or data[offset] != MAGIC[0]
+        or data[offset + 1] != MAGIC[1]
+    ):
+        return None
+    version, kind, model, robot_id, seq, step = HEADER_FIELDS.unpack_from(data, offset)
+    if version != VERSION:
+        return None
+    body = BODIES.get(kind, {}).get(model)
+    end = offset + HEADER.size + (body.size if body is not None else 0)
+    if body is None or end > size:
+        return None
+    header = Header(kind, model, robot_id, seq, step)
+    return header, body.unpack_from(data, offset + HEADER.size), end
@@ -0,0 +1,248 @@
+"""
+sharedmemory.py is an optional transport between the simulator and the simulator client for when both run on the same
+host, which skips the UDP sockets. Each direction is a Channel: a block of shared memory holding the latest binary
+message (see protocol.py) and a named pipe used to wake up the reading process once a new message has been written.
+
+A block starts with a seqlock counter, the length of the message and the process id of the simulator which created
+it. The single writer makes the counter odd, copies
+the message in and makes it even again. A reader copies the message out and keeps it only if the counter was even and
+unchanged over the copy, otherwise it copies again. Only the latest message is kept, a reader which falls behind skips
+the messages in between.
+
+The simulator creates the state and command channels of every robot it serves, the client attaches to them if they exist
+and the simulator which created them is still running, and falls back to UDP otherwise. A simulator which crashed leaves
+its blocks behind, they are replaced by the next simulator on the same port. The simulator only writes the state of a
+robot to its channel once a client has said hello through the command channel. Shared memory needs Python 3.8 and named
+pipes, so the transport is not available on Windows.
+"""
+import os
+import select
+import struct
+import tempfile
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+from . import protocol
+
+# seqlock counter, length of the message
+BLOCK_HEADER = struct.Struct("<II")
+COUNTER = struct.Struct("<I")
+# process id of the creator of the block, after the header
+OWNER = struct.Struct("<I")
+MESSAGE_OFFSET = BLOCK_HEADER.size + OWNER.size
+MAX_MESSAGE_SIZE = max(
+    protocol.message_size(kind, model)
+    for kind, bodies in protocol.BODIES.items()
+    for model in bodies
+)
+BLOCK_SIZE = MESSAGE_OFFSET + MAX_MESSAGE_SIZE
+# reads retried while the writer is in the middle of a write before giving up on the message
+MAX_READ_ATTEMPTS = 1000
+
+
+def is_available():
+    """Returns true if the shared memory transport can be used on this host."""
+    return shared_memory is not None and hasattr(os, "mkfifo")
+
+
+def channel_name(port, direction, robot_id=0):
+    """Returns the name of the channel carrying the state or command messages of a robot of the simulator listening on
+    port."""
+    return "pysim_%d_%d_%s" % (port, robot_id, direction)
+
+
+def attach_memory(name):
+    """Attaches to an existing block of shared memory without handing it to the resource tracker, which would
+    otherwise delete it when this process exits while the simulator still uses it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        memory = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(memory._name, "shared_memory")
+        return memory
+
+
+def is_running(pid):
+    """Returns true if a process with the id pid exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # it exists but belongs to another user
+        return True
+    return True
+
+
+def unlink_memory(memory):
+    """Deletes a block of shared memory. unlink() also removes the block from the resource tracker, so it is first
+    registered again in case it was attached with attach_memory()."""
+    resource_tracker.register(memory._name, "shared_memory")
+    memory.unlink()
+
+
+class SharedBlock(object):
+    def __init__(self, name, create=False):
+        """Creates the block, replacing any block left over by a process which did not exit cleanly, or attaches to an
+        existing one. Attaching raises FileNotFoundError if the block does not exist and ConnectionRefusedError if the
+        process which created it is no longer running."""
+        self.name = name
+        self.owner = create
+        if create:
+            try:
+                self.memory = shared_memory.SharedMemory(
+                    name=name, create=True, size=BLOCK_SIZE
+                )
+            except FileExistsError:
+                unlink_memory(attach_memory(name))
+                self.memory = shared_memory.SharedMemory(
+                    name=name, create=True, size=BLOCK_SIZE
+                )
+            BLOCK_HEADER.pack_into(self.memory.buf, 0, 0, 0)
+            OWNER.pack_into(self.memory.buf, BLOCK_HEADER.size, os.getpid())
+        else:
+            self.memory = attach_memory(name)
+            owner = OWNER.unpack_from(self.memory.buf, BLOCK_HEADER.size)[0]
+            if not is_running(owner):
+                self.memory.close()
+                raise ConnectionRefusedError(
+                    "%s was left over by process %d, which is no longer running"
+                    % (name, owner)
+                )
+        # counter of the last write, by the writer, or of the last message read, by the reader
+        self.counter = COUNTER.unpack_from(self.memory.buf, 0)[0] & ~1
+        self.read_counter = self.counter
+
+    def write(self, data):
+        """Replaces the message held by the block, there must be a single writer."""
+        buf = self.memory.buf
+        BLOCK_HEADER.pack_into(buf, 0, (self.counter + 1) & 0xFFFFFFFF, len(data))
+        buf[MESSAGE_OFFSET : MESSAGE_OFFSET + len(data)] = data
+        self.counter = (self.counter + 2) & 0xFFFFFFFF
+        COUNTER.pack_into(buf, 0, self.counter)
+
+    def read(self, buffer):
+        """Copies the message held by the block into buffer and returns its size, or None if the block holds no message
+        newer than the last one read."""
+        buf = self.memory.buf
+        for _ in range(MAX_READ_ATTEMPTS):
+            counter, size = BLOCK_HEADER.unpack_from(buf, 0)
+            if counter == self.read_counter:
+                return None
+            if counter & 1 or size > MAX_MESSAGE_SIZE:
+                # the writer is half way through
+                continue
+            buffer[:size] = buf[MESSAGE_OFFSET : MESSAGE_OFFSET + size]
+            if COUNTER.unpack_from(buf, 0)[0] == counter:
+                self.read_counter = counter
+                return size
+        return None
+
+    def close(self):
+        """Detaches from the block, the process which created it also deletes it."""
+        self.memory.close()
+        if self.owner:
+            try:
+                unlink_memory(self.memory)
+            except FileNotFoundError:
+                pass
+
+
+class Wakeup(object):
+    def __init__(self, name, reader):
+        """A named pipe in the temporary folder, created by its reader. The writer opens it when it first signals and
+        ignores signals sent while nobody reads it."""
+        self.path = os.path.join(tempfile.gettempdir(), name + ".fifo")
+        self.reader = reader
+        self.fd = None
+        self.keep_fd = None
+        if reader:
+            if not os.path.exists(self.path):
+                os.mkfifo(self.path)
+            self.fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+            # a pipe without any writer reads as end of file, keep one open so waiting blocks instead
+            self.keep_fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+
+    def fileno(self):
+        """The file descriptor which becomes readable when the writer signals, for select or an event loop."""
+        return self.fd
+
+    def signal(self):
+        """Wakes up the reader."""
+        if self.fd is None:
+            try:
+                self.fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError:
+                # nobody is reading
+                return
+        try:
+            os.write(self.fd, b"\0")
+        except BlockingIOError:
+            # the pipe is full of wakeups the reader has not consumed yet
+            pass
+        except OSError:
+            os.close(self.fd)
+            self.fd = None
+
+    def clear(self):
+        """Consumes the pending wakeups."""
+        try:
+            os.read(self.fd, 4096)
+        except BlockingIOError:
+            pass
+
+    def wait(self, timeout=None):
+        """Waits for the writer to signal and returns false if timeout seconds passed first."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
+            self.clear()
+        return bool(ready)
+
+    def close(self):
+        for fd in (self.fd, self.keep_fd):
+            if fd is not None:
+                os.close(fd)
+        self.fd = self.keep_fd = None
+        if self.reader:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class Channel(object):
+    def __init__(self, name, writer, create=False):
+        """One direction of the transport, used by the process writing to it if writer is true and by the process
+        reading from it otherwise."""
+        self.block = SharedBlock(name, create)
+        self.wakeup = Wakeup(name, reader=not writer)
+
+    def send(self, data):
+        """Replaces the message held by the channel and wakes up the reader."""
+        self.block.write(data)
+        self.wakeup.signal()
+
+    def receive(self, buffer, timeout=None):
+        """Copies the latest message into buffer and returns its size, waiting up to timeout seconds for one if there
+        is no new message. Returns None if none arrived."""
+        size = self.block.read(buffer)
+        if size is None and self.wakeup.wait(timeout):
+            size = self.block.read(buffer)
+        return size
+
+    def fileno(self):
+        """The file descriptor which becomes readable when a new message is sent, for the reader's event loop."""
+        return self.wakeup.fileno()
+
+    def poll(self, buffer):
+        """Copies the latest message into buffer and returns its size, or None if there is no new message, without
+        waiting. For an event loop watching fileno()."""
+        self.wakeup.clear()
+        return self.block.read(buffer)
+
+    def close(self):
+        self.wakeup.close()
+        self.block.close()
@@ -1,31 +1,231 @@
 """
 simclient.py provides the interface between the simulator and external python code. The simulator client connects
-to the simulator via two udp sockets and exchanges robot state and command messages with the simulator. The command
+to the simulator via a udp socket and exchanges robot state and command messages with the simulator. The command
 exchange is done in the background using two daemon threads to minimize any timing issues.
+
+A command is sent as soon as a setter (forward(), cmd_vel(), setLED() and so on) changes it, and otherwise repeated
+every KEEPALIVE_INTERVAL seconds in case a datagram was lost, so an idle client sends next to nothing.
+
+The sensor readings of each state message are decoded into one immutable SensorSnapshot which replaces the previous
+one as a whole, so the getters, which read the current snapshot, never mix readings from two messages as long as they
+are read from the same snapshot. snapshot() returns it, to read several sensors at once.
+
+Every state message received is a new frame, numbered by frame_seq. A controller calling wait_for_update() at the top of
+its loop runs once per frame, as soon as it arrives, instead of polling the sensors.
+
+The host and ports of the simulator are found by discovery.py: given as arguments, set in the environment or announced
+by the simulator started last. The client binds its data port, 0 for any free port, and says hello to the simulator
+from it until the first state message arrives, so the simulator knows where to send the state.
+
+If the simulator runs in lockstep mode each state message carries the simulation step number as an extra last value.
+The client then answers every state message with the current command tagged with the same step number instead of
+sending commands on its own clock, and the simulator only advances once it has the answer. A controller looping on
+wait_for_update() answers each state message when it calls wait_for_update() again, so the answer holds the command it
+worked out from that state and a seeded run is reproduced exactly. For a controller which never calls it the client
+answers each state message straight away, once the first one went unanswered for KEEPALIVE_INTERVAL, so no change to
+older user code is needed.
+
+Messages are sent in the binary form defined by protocol.py once the robot is known, the simulator answers binary
+commands with binary state messages. State messages are read in either form, and a client created with binary=False
+only speaks the text form.
+
+If the simulator serves the shared memory transport of sharedmemory.py, which it does where it is available, the
+client uses that instead of the sockets unless it is created with transport="udp". transport="shm" insists on shared
+memory and fails if the simulator does not provide it.
+
+A simulator can serve several robots, each with a robot id, 0 for the first one. The client controls the robot given
+by robot_id, the state messages of the other robots which share its datagrams are skipped. Only robot 0 can be
+controlled with text messages.
 """
 
+import collections
 import time
 import socket
 import threading
 
-UDP_IP = "127.0.0.1"
-UDP_DATA_PORT = 5000
-UDP_COMMAND_PORT = 5001
+from . import discovery, protocol, sharedmemory
+
+UDP_IP = discovery.DEFAULT_HOST
+UDP_DATA_PORT = discovery.DEFAULT_DATA_PORT
+UDP_COMMAND_PORT = discovery.DEFAULT_COMMAND_PORT
 PAN = 1
-PUBLISH_INTERVAL = 0.02  # seconds
+PUBLISH_INTERVAL = 0.02  # seconds between hello messages until the simulator answers
+KEEPALIVE_INTERVAL = 0.5  # seconds between repeats of an unchanged command
+NUM_INITIO_STATE_VALUES = 11
+NUM_PI2GO_STATE_VALUES = 36
+# bytes, the largest datagram the simulator sends
+RECV_BUFFER_SIZE = protocol.MAX_DATAGRAM_SIZE
+
+# the sensor readings of a state message, frame counting the state messages received and step the lockstep step number
+# or None
+SensorSnapshot = collections.namedtuple(
+    "SensorSnapshot",
+    "frame robot_name sonar_range left_line right_line ir_left ir_middle ir_right light_front_left light_front_right "
+    "light_back_right light_back_left switch step",
+)
+NOT_CONNECTED = SensorSnapshot(
+    0,
+    "Not Connected",
+    1700.0,
+    False,
+    False,
+    False,
+    False,
+    False,
+    0,
+    0,
+    0,
+    0,
+    False,
+    None,
+)
+
+
+def resolve(host=None, command_port=None, data_port=None, robot_id=0):
+    """Returns the (host, command_port, data_port) of the simulator for the client of robot robot_id, see
+    discovery.resolve()."""
+    if robot_id != 0 and data_port is None:
+        # the data port is left to the client of robot 0, the others receive their state where they say hello from
+        data_port = 0
+    return discovery.resolve(host, command_port, data_port)
+
+
+def open_shared_channels(command_port, robot_id=0):
+    """Attaches to the shared memory state and command channels of a robot of the simulator listening on
+    command_port and returns them, raises OSError or ValueError if they are not available."""
+    if not sharedmemory.is_available():
+        raise OSError("shared memory is not available on this host")
+    shared_state = sharedmemory.Channel(
+        sharedmemory.channel_name(command_port, "state", robot_id), writer=False
+    )
+    try:
+        shared_command = sharedmemory.Channel(
+            sharedmemory.channel_name(command_port, "command", robot_id), writer=True
+        )
+    except (OSError, ValueError):
+        shared_state.close()
+        raise
+    return shared_state, shared_command
+
+
+def decode_state(data_e, size=None, robot_id=0):
+    """Decodes a text or binary state message held by the first size bytes of data_e and returns
+    (robot_name, values, step), values in the order of the text message without the robot name and step the
+    lockstep step number or None, or None if the data holds no valid state message of the robot robot_id.
+    Binary messages are read in place."""
+    if protocol.is_binary(data_e, size):
+        for header, values in protocol.decode_batch(data_e, size) or ():
+            if header.kind == protocol.STATE and header.robot_id == robot_id:
+                step = None if header.step == protocol.NO_STEP else header.step
+                return protocol.MODEL_NAMES[header.model], values, step
+        return None
+    if robot_id != 0:
+        return None
+    if size is not None:
+        data_e = bytes(data_e[:size])
+    data = data_e.decode()
+    if not (data.startswith("<<") and data.endswith(">>")):
+        return None
+    values_list = data[2:-2].split(";")
+    robot_name = str(values_list[0])
+    num_values = NUM_INITIO_STATE_VALUES
+    if robot_name.startswith("PI2GO"):
+        num_values = NUM_PI2GO_STATE_VALUES
+    step = None
+    if len(values_list) > num_values:
+        step = int(values_list[num_values])
+    values = [float(values_list[1])] + [int(v) for v in values_list[2:num_values]]
+    return robot_name, values, step
+
+
+def sensor_snapshot(frame, robot_name, values, step):
+    """Returns the SensorSnapshot of a state message decoded by decode_state(), numbered frame, or None if the robot
+    is unknown."""
+    if robot_name.startswith("INITIO"):
+        (
+            sonar_range,
+            left_line,
+            right_line,
+            ir_left,
+            ir_right,
+            front_left,
+            front_right,
+            back_right,
+            back_left,
+            switch,
+        ) = values[:10]
+        ir_middle = False
+    elif robot_name.startswith("PI2GO"):
+        (
+            sonar_range,
+            left_line,
+            right_line,
+            ir_left,
+            ir_middle,
+            ir_right,
+            front_left,
+            front_right,
+            back_right,
+            back_left,
+        ) = values[:10]
+        # values[10:34] echo the leds, which are set by this client
+        switch = values[34]
+    else:
+        return None
+    return SensorSnapshot(
+        frame,
+        robot_name,
+        float(sonar_range),
+        left_line,
+        right_line,
+        ir_left,
+        ir_middle,
+        ir_right,
+        front_left,
+        front_right,
+        back_right,
+        back_left,
+        switch,
+        step,
+    )
 
 
 class SimulatorClient:
-    def __init__(self):
-        self.mutex = threading.Lock()
+    def __init__(
+        self,
+        binary=True,
+        transport="auto",
+        host=None,
+        command_port=None,
+        data_port=None,
+        robot_id=0,
+    ):
+        if robot_id != 0 and not binary:
+            raise ValueError("only robot 0 can be controlled with text messages")
+        self.binary = binary
+        self.robot_id = robot_id
+        self.host, self.command_port, self.data_port = resolve(
+            host, command_port, data_port, robot_id
+        )
+        # shared memory channels to the simulator, None when using the sockets
+        self.shared_state = None
+        self.shared_command = None
+        if transport != "udp":
+            self.attach_shared_memory(required=transport == "shm")
+        # number of commands sent, carried by binary commands
+        self.seq = 0
+        # the setters and the sending thread both send commands, one at a time, the values and time of the last one
+        # sent tell whether it changed and when to repeat it
+        self.send_lock = threading.Lock()
+        self.sent_values = None
+        self.sent_time = 0.0
+        # readings of the last state message, replaced as a whole by the receiving thread
+        self.sensors = NOT_CONNECTED
+        # notified of each new frame for wait_for_update(), and the last frame it returned
+        self.frame_condition = threading.Condition()
+        self.waited_seq = 0
         self.running = True
-        self.sonar_range = 1700.0
         self.sonar_angle = 0
-        self.left_line_sensor_triggered = False
-        self.right_line_sensor_triggered = False
-        self.ir_left_triggered = False
-        self.ir_middle_triggered = False
-        self.ir_right_triggered = False
         self.vx = 0
         self.vth = 0
         self.front_led1_red_value = 0
@@ -56,16 +256,33 @@ class SimulatorClient:
         self.back_led2_green_value = 0
         self.back_led2_blue_value = 0
 
-        self.fr_light_sensor = 0
-        self.fl_light_sensor = 0
-        self.br_light_sensor = 0
-        self.bl_light_sensor = 0
-
-        self.robot_control_switch_on = False
-
-        self.robot_name = "Not Connected"
+        # step number of the last lockstep state message, None if the simulator is not in lockstep mode, of the last one
+        # answered and the time the last one arrived, or the constructor returned if later
+        self.lockstep_step = None
+        self.answered_step = None
+        self.lockstep_time = 0.0
+        # whether the controller loops on wait_for_update(), which then answers the lockstep state messages, None until
+        # known and only known once the constructor has returned
+        self.controller_waits = None
+        self.created = False
+        # the state is received and the commands sent through the same socket, so that the simulator can answer the
+        # hello messages
+        self.sock = None
+        if self.shared_state is None:
+            try:
+                self.sock = socket.socket(
+                    socket.AF_INET, socket.SOCK_DGRAM  # Internet
+                )  # UDP
+                self.sock.bind((self.host, self.data_port))
+                self.data_port = self.sock.getsockname()[1]
+            except OSError:
+                print("Could not open socket - have you cleaned up last connection?\n")
+                self.running = False
 
-        self.update_thread = threading.Thread(target=self.update_state)
+        if self.shared_state is not None:
+            self.update_thread = threading.Thread(target=self.update_shared_state)
+        else:
+            self.update_thread = threading.Thread(target=self.update_state)
         self.update_thread.setDaemon(True)
         self.update_thread.start()
 
@@ -73,71 +290,119 @@ class SimulatorClient:
         self.cmd_thread.setDaemon(True)
         self.cmd_thread.start()
         time.sleep(1)
+        self.lockstep_time = time.time()
+        self.created = True
         print("initialisation complete")
 
+    def attach_shared_memory(self, required=False):
+        """Attaches to the shared memory channels of the simulator, raises an error if required is true and they are
+        not available, otherwise the client falls back to the sockets."""
+        try:
+            self.shared_state, self.shared_command = open_shared_channels(
+                self.command_port, self.robot_id
+            )
+        except (OSError, ValueError):
+            if required:
+                raise
+
+    @property
+    def robot_name(self):
+        return self.sensors.robot_name
+
+    @property
+    def frame_seq(self):
+        """The number of state messages received."""
+        return self.sensors.frame
+
+    def snapshot(self):
+        """Returns the SensorSnapshot holding all the readings of the last state message."""
+        return self.sensors
+
     def getRobotName(self):
         return self.robot_name
 
+    def wait_for_update(self, timeout=None, after=None):
+        """Waits for a state message newer than the frame numbered after, by default the last one returned by this
+        method, and returns the frame_seq of the newest state received. Returns None if timeout seconds passed first
+        or the client was cleaned up. In lockstep mode the last state returned is answered first, with the command set
+        since."""
+        with self.frame_condition:
+            if after is None:
+                after = self.waited_seq
+            self.controller_waits = True
+            if self.waited_seq == self.sensors.frame:
+                self.answer_lockstep()
+            if not self.frame_condition.wait_for(
+                lambda: self.sensors.frame > after or not self.running, timeout
+            ):
+                return None
+            if not self.running:
+                return None
+            self.waited_seq = self.sensors.frame
+            return self.waited_seq
+
     def setServo(self, servo, degrees):
         """Set the angle of the panning sonar on the robot."""
         if servo == PAN:
             self.sonar_angle = degrees
+            self.send_changes()
 
     def getDistance(self):
         """Returns the current range detected by the sonar sensor measurements are in centimetres."""
-        return self.sonar_range
+        return self.sensors.sonar_range
 
     def irLeft(self):
         """Returns the state of the LEFT IR sensor, returns True if an obstacle is detected."""
-        return self.ir_left_triggered
+        return self.sensors.ir_left
 
     def irRight(self):
         """Returns the state of the RIGHT IR sensor, returns True if an obstacle is detected."""
-        return self.ir_right_triggered
+        return self.sensors.ir_right
 
     def irCentre(self):
         """Returns the state of the CENTRE IR sensor, returns True if an obstacle is detected."""
-        return self.ir_middle_triggered
+        return self.sensors.ir_middle
 
     def irAll(self):
         """Returns the state of the ALL IR sensors, returns True if an obstacle is detected."""
-        if self.robot_name == "Initio":
-            return self.ir_left_triggered or self.ir_right_triggered
+        sensors = self.sensors
+        if sensors.robot_name == "Initio":
+            return sensors.ir_left or sensors.ir_right
         else:
-            return (
-                self.ir_left_triggered
-                or self.ir_right_triggered
-                or self.ir_middle_triggered
-            )
+            return sensors.ir_left or sensors.ir_right or sensors.ir_middle
 
     def irLeftLine(self):
         """Returns the state of the LEFT line sensor, returns True if a line is detected."""
-        return self.left_line_sensor_triggered
+        return self.sensors.left_line
 
     def irRightLine(self):
         """Returns the state of the RIGHT line sensor, returns True if a line is detected."""
-        return self.right_line_sensor_triggered
+        return self.sensors.right_line
 
     def forward(self, speed):
         """forward(speed): Sets both motors to move forward at speed. 0 <= speed <= 100"""
         self.vx = speed
         self.vth = 0
+        self.send_changes()
 
     def reverse(self, speed):
         """reverse(speed): Sets both motors to reverse at speed. 0 <= speed <= 100"""
         # print("A")
         self.vx = -speed
         self.vth = 0
+        self.send_changes()
 
     def spinLeft(self, speed):
         """spinLeft(speed): Sets motors to turn opposite directions at speed. 0 <= speed <= 100"""
         self.vx = 0
         self.vth = speed
+        self.send_changes()
 
     def spinRight(self, speed):
         """spinRight(speed): Sets motors to turn opposite directions at speed. 0 <= speed <= 100"""
         self.vx = 0
         self.vth = -speed
+        self.send_changes()
 
     #   def spinLeftBriefly(self, speed, spin_time):
     #         """spinLeft(speed): Sets motors to turn opposite directions at speed. 0 <= speed <= 100"""
@@ -154,21 +419,24 @@ class SimulatorClient:
         0 <= leftSpeed,rightSpeed <= 100"""
         self.vx = left_speed + right_speed / 2.0
         self.vth = right_speed - left_speed
+        self.send_changes()
 
     def turnReverse(self, left_speed, right_speed):
         """turnReverse(leftSpeed, rightSpeed): Moves backwards in an arc by setting different speeds.
         0 <= leftSpeed,rightSpeed <= 100"""
         self.vx = -(left_speed + right_speed / 2.0)
         self.vth = right_speed - left_speed
+        self.send_changes()
 
     def stop(self):
         """Stops both motors"""
         self.vx = 0
         self.vth = 0
+        self.send_changes()
 
     def getSwitch(self):
         """Returns the value of the tact switch: True==pressed"""
-        return self.robot_control_switch_on
+        return self.sensors.switch
 
     def getLight(self, sensor):
         """Returns the value 0..1023 for the selected sensor, 0 <= Sensor <= 3"""
@@ -185,24 +453,25 @@ class SimulatorClient:
 
     def getLightFL(self):
         """Returns the value 0..1023 for Front-Left light sensor"""
-        return self.fl_light_sensor
+        return self.sensors.light_front_left
 
     def getLightFR(self):
         """Returns the value 0..1023 for Front-Right light sensor."""
-        return self.fr_light_sensor
+        return self.sensors.light_front_right
 
     def getLightBL(self):
         """Returns the value 0..1023 for Back-Left light sensor"""
-        return self.bl_light_sensor
+        return self.sensors.light_back_left
 
     def getLightBR(self):
         """Returns the value 0..1023 for Back-Right light sensor"""
-        return self.br_light_sensor
+        return self.sensors.light_back_right
 
     def cmd_vel(self, vx, vth):
         """Control the robot by giving it a linear (vx) and angular velocity (vth)"""
         self.vx = vx
         self.vth = vth
+        self.send_changes()
 
     # ======================================================================
     # Pi2Go only functions - placeholders for now
@@ -210,6 +479,11 @@ class SimulatorClient:
 
     def setLED(self, LED, red, green, blue):
         """Sets the LED specified to required RGB value. 0 >= LED <= 7; 0 <= R,G,B <= 4095"""
+        self.store_led(LED, red, green, blue)
+        self.send_changes()
+
+    def store_led(self, LED, red, green, blue):
+        """Stores the RGB value of the LED specified, without sending the command."""
         # print ("setting leds")
         if LED == 0:  # first front led (front-left)
             self.front_led1_red_value = red
@@ -249,7 +523,8 @@ class SimulatorClient:
     def setAllLEDs(self, red, green, blue):
         """Sets all LEDs to required RGB. 0 <= R,G,B <= 4095"""
         for i in range(4):
-            self.setLED(i, red, green, blue)
+            self.store_led(i, red, green, blue)
+        self.send_changes()
 
     def getLED(self, LED):
         """Gets the RGB colour value of the LED specified. 0 >= LED <= 7; 0 <= R,G,B <= 4095"""
@@ -311,8 +586,8 @@ class SimulatorClient:
             all_led_values.append(getLED(i))
         return all_led_values
 
-    def send_commands(self):
-        """Thread function which sends commands to the simulator via a UDP socket.
+    def get_command_message(self):
+        """Returns the command message for the connected robot, or None if no robot is connected yet.
 
         Commands for the initio robot take the form:
 
@@ -330,53 +605,172 @@ class SimulatorClient:
               RIGHT_LED1_RED_VALUE;RIGHT_LED1_GREEN_VALUE;RIGHT_LED1_BLUE_VALUE;
               RIGHT_LED2_RED_VALUE;RIGHT_LED2_GREEN_VALUE;RIGHT_LED2_BLUE_VALUE>>
         """
+        values = self.get_command_values()
+        if values is None:
+            return None
+        if self.robot_name == "INITIO":
+            return "<<%f;%f;%f>>" % values
+        return (
+            "<<%f;%f;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d>>"
+            % values
+        )
+
+    def get_command_values(self):
+        """Returns the values of the command message described by get_command_message(), or None if no robot is
+        connected yet."""
+        if self.robot_name == "INITIO":
+            return (self.vx, self.vth, self.sonar_angle)
+        elif self.robot_name == "PI2GO":
+            return (
+                self.vx,
+                self.vth,
+                int(self.front_led1_red_value),
+                int(self.front_led1_green_value),
+                int(self.front_led1_blue_value),
+                int(self.front_led2_red_value),
+                int(self.front_led2_green_value),
+                int(self.front_led2_blue_value),
+                int(self.right_led1_red_value),
+                int(self.right_led1_green_value),
+                int(self.right_led1_blue_value),
+                int(self.right_led2_red_value),
+                int(self.right_led2_green_value),
+                int(self.right_led2_blue_value),
+                int(self.back_led1_red_value),
+                int(self.back_led1_green_value),
+                int(self.back_led1_blue_value),
+                int(self.back_led2_red_value),
+                int(self.back_led2_green_value),
+                int(self.back_led2_blue_value),
+                int(self.left_led1_red_value),
+                int(self.left_led1_green_value),
+                int(self.left_led1_blue_value),
+                int(self.left_led2_red_value),
+                int(self.left_led2_green_value),
+                int(self.left_led2_blue_value),
+            )
+        return None
+
+    def send_changes(self):
+        """Sends the current command straight away if it differs from the last one sent, called by the setters. In
+        lockstep mode commands are only sent in answer to the state messages."""
+        if not self.running or self.lockstep_step is not None:
+            return
+        if self.get_command_values() != self.sent_values:
+            try:
+                self.send_command()
+            except OSError:
+                pass
+
+    def send_command(self, step=None):
+        """Sends the current command to the simulator, tagged with the step number of a lockstep state message if
+        given."""
+        with self.send_lock:
+            self.sent_time = time.time()
+            self.send_command_message(step)
+
+    def send_command_message(self, step=None):
+        model = protocol.MODELS.get(self.robot_name)
+        self.sent_values = self.get_command_values()
+        if model is None:
+            # no state message yet, tell the simulator where to send them and that the commands start again
+            data = protocol.encode(
+                protocol.HELLO, protocol.NO_MODEL, robot_id=self.robot_id
+            )
+        elif self.binary or self.shared_command is not None:
+            # shared memory only carries binary messages
+            self.seq += 1
+            data = protocol.encode(
+                protocol.COMMAND,
+                model,
+                self.sent_values,
+                robot_id=self.robot_id,
+                seq=self.seq,
+                step=step,
+            )
+        else:
+            message = self.get_command_message()
+            if message is None:
+                return
+            if step is not None:
+                message = "%s;%d>>" % (message[:-2], step)
+            data = message.encode("utf-8")
+        if self.shared_command is not None:
+            self.shared_command.send(data)
+        else:
+            self.sock.sendto(data, (self.host, self.command_port))
+
+    def send_commands(self):
+        """Thread function which says hello to the simulator every PUBLISH_INTERVAL seconds until it answers, and then
+        repeats the command when none was sent for KEEPALIVE_INTERVAL seconds. The form of the commands is described in
+        get_command_message()."""
         # print("starting sending thread")
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)  # Internet  # UDP
         while self.running:
             try:
-                if self.robot_name == "INITIO":
-                    message = "<<%f;%f;%f>>" % (self.vx, self.vth, self.sonar_angle)
-                    sock.sendto(message.encode("utf-8"), (UDP_IP, UDP_COMMAND_PORT))
-                elif self.robot_name == "PI2GO":
-                    # print(self.front_led1_red_value)
-                    message = (
-                        "<<%f;%f;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d>>"
-                        % (
-                            self.vx,
-                            self.vth,
-                            int(self.front_led1_red_value),
-                            int(self.front_led1_green_value),
-                            int(self.front_led1_blue_value),
-                            int(self.front_led2_red_value),
-                            int(self.front_led2_green_value),
-                            int(self.front_led2_blue_value),
-                            int(self.right_led1_red_value),
-                            int(self.right_led1_green_value),
-                            int(self.right_led1_blue_value),
-                            int(self.right_led2_red_value),
-                            int(self.right_led2_green_value),
-                            int(self.right_led2_blue_value),
-                            int(self.back_led1_red_value),
-                            int(self.back_led1_green_value),
-                            int(self.back_led1_blue_value),
-                            int(self.back_led2_red_value),
-                            int(self.back_led2_green_value),
-                            int(self.back_led2_blue_value),
-                            int(self.left_led1_red_value),
-                            int(self.left_led1_green_value),
-                            int(self.left_led1_blue_value),
-                            int(self.left_led2_red_value),
-                            int(self.left_led2_green_value),
-                            int(self.left_led2_blue_value),
-                        )
-                    )
-                    # print("sending message")
-                    sock.sendto(message.encode("utf-8"), (UDP_IP, UDP_COMMAND_PORT))
-                time.sleep(PUBLISH_INTERVAL)
+                if self.robot_name not in protocol.MODELS:
+                    interval = PUBLISH_INTERVAL
+                else:
+                    interval = KEEPALIVE_INTERVAL
+                wait = self.sent_time + interval - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+                elif self.lockstep_step is None:
+                    # in lockstep mode commands are sent in answer to each state message instead
+                    self.send_command()
+                else:
+                    if (
+                        self.created
+                        and self.controller_waits is None
+                        and time.time() >= self.lockstep_time + KEEPALIVE_INTERVAL
+                    ):
+                        # the controller does not call wait_for_update(), answer the states as they arrive
+                        self.controller_waits = False
+                        self.answer_lockstep()
+                    time.sleep(interval)
             except:
                 self.running = False
         print("closed send socket\n")
 
+    def decode_state(self, data_e, size=None):
+        """Decodes a state message of the robot of this client, see decode_state()."""
+        return decode_state(data_e, size, self.robot_id)
+
+    def apply_state(self, robot_name, values, step):
+        """Replaces the sensor snapshot with the readings of a state message decoded by decode_state()."""
+        sensors = sensor_snapshot(self.sensors.frame + 1, robot_name, values, step)
+        if sensors is None:
+            return
+        if step is not None:
+            self.lockstep_step = step
+            self.lockstep_time = time.time()
+        self.sensors = sensors
+
+    def answer_lockstep(self):
+        """Answers the last lockstep state message with the current command, unless it has been answered already."""
+        step = self.lockstep_step
+        if step is not None and step != self.answered_step:
+            self.answered_step = step
+            self.send_command(step)
+
+    def receive_state(self, state):
+        """Applies a state message decoded by decode_state(), wakes up wait_for_update() and answers the message in
+        lockstep mode, see the module description. A lockstep state sent again is no new frame, its answer is sent
+        again if it was sent already."""
+        step = state[2]
+        if step is not None and step == self.sensors.step:
+            if step == self.answered_step:
+                self.send_command(step)
+            return
+        self.apply_state(*state)
+        with self.frame_condition:
+            self.frame_condition.notify_all()
+        if self.lockstep_step is not None:
+            if self.controller_waits is False:
+                self.answer_lockstep()
+        elif self.sent_values is None:
+            # the robot is known now, send the command set so far
+            self.send_changes()
+
     def update_state(self):
         """Thread function which receives the state of the robot from the simulator via a UDP socket.
 
@@ -394,78 +788,35 @@ class SimulatorClient:
              RED_LED_STATE; GREEN_LED_STATE; BLUE_LED_STATE; CONTROL_SWITCH>>
         """
         print("starting update thread")
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)  # Internet  # UDP
-            sock.bind((UDP_IP, UDP_DATA_PORT))
-            # sock.settimeout(1)
-        except:
-            print("Could not open socket - have you cleaned up last connection?\n")
-            self.running = False
+        sock = self.sock
+        # every datagram is received into the same buffer and decoded in place
+        buffer = bytearray(RECV_BUFFER_SIZE)
         while self.running:
             # print("getting data")
-            data_e, addr = sock.recvfrom(1024)  # buffer size is 1024 bytes
-            data = data_e.decode()
-            if data.startswith("<<") and data.endswith(">>"):
-                data = data.replace("<<", "")
-                data = data.replace(">>", "")
-                values_list = data.split(";")
-                # print("getting robot name")
-                self.robot_name = str(values_list[0])
-                if self.robot_name.startswith("INITIO"):
-                    self.sonar_range = float(values_list[1])
-                    self.left_line_sensor_triggered = int(values_list[2])
-                    self.right_line_sensor_triggered = int(values_list[3])
-                    self.ir_left_triggered = int(values_list[4])
-                    self.ir_right_triggered = int(values_list[5])
-                    self.fl_light_sensor = int(values_list[6])
-                    self.fr_light_sensor = int(values_list[7])
-                    self.br_light_sensor = int(values_list[8])
-                    self.bl_light_sensor = int(values_list[9])
-                    self.robot_control_switch_on = int(values_list[10])
-                elif self.robot_name.startswith("PI2GO"):
-                    self.sonar_range = float(values_list[1])
-                    self.left_line_sensor_triggered = int(values_list[2])
-                    self.right_line_sensor_triggered = int(values_list[3])
-                    self.ir_left_triggered = int(values_list[4])
-                    self.ir_middle_triggered = int(values_list[5])
-                    self.ir_right_triggered = int(values_list[6])
-                    self.fl_light_sensor = int(values_list[7])
-                    self.fr_light_sensor = int(values_list[8])
-                    self.br_light_sensor = int(values_list[9])
-                    self.bl_light_sensor = int(values_list[10])
-
-                    # self.front_led1_red_value = int(values_list[11])
-                    # self.front_led1_green_value = int(values_list[12])
-                    # self.front_led1_blue_value = int(values_list[13])
-                    # self.front_led2_red_value = int(values_list[14])
-                    # self.front_led2_green_value = int(values_list[15])
-                    # self.front_led2_blue_value = int(values_list[16])
-
-                    # self.right_led1_red_value = int(values_list[17])
-                    # self.right_led1_green_value = int(values_list[18])
-                    # self.right_led1_blue_value = int(values_list[19])
-                    # self.right_led2_red_value = int(values_list[20])
-                    # self.right_led2_green_value = int(values_list[21])
-                    # self.right_led2_blue_value = int(values_list[22])
-
-                    # self.back_led1_red_value = int(values_list[23])
-                    # self.back_led1_green_value = int(values_list[24])
-                    # self.back_led1_blue_value = int(values_list[25])
-                    # self.back_led2_red_value = int(values_list[26])
-                    # self.back_led2_green_value = int(values_list[27])
-                    # self.back_led2_blue_value = int(values_list[28])
-
-                    # self.left_led1_red_value = int(values_list[29])
-                    # self.left_led1_green_value = int(values_list[30])
-                    # self.left_led1_blue_value = int(values_list[31])
-                    # self.left_led2_red_value = int(values_list[32])
-                    # self.left_led2_green_value = int(values_list[33])
-                    # self.left_led2_blue_value = int(values_list[34])
-                    self.robot_control_switch_on = int(values_list[35])
-                    # print "received message:", data
-            time.sleep(PUBLISH_INTERVAL)
+            size = sock.recv_into(buffer)
+            state = self.decode_state(buffer, size)
+            if state is not None:
+                self.receive_state(state)
         sock.close()
         print("closed update socket\n")
 
+    def update_shared_state(self):
+        """Thread function which receives the state of the robot from the simulator through shared memory, waiting
+        for each new state message. The messages are the binary form of those described in update_state()."""
+        print("starting update thread")
+        buffer = bytearray(sharedmemory.MAX_MESSAGE_SIZE)
+        while self.running:
+            size = self.shared_state.receive(buffer, timeout=1)
+            if size is None:
+                continue
+            state = self.decode_state(buffer, size)
+            if state is not None:
+                self.receive_state(state)
+        self.shared_state.close()
+        self.shared_command.close()
+        print("closed shared memory\n")
+
     def cleanup(self):
         self.running = False
+        with self.frame_condition:
+            self.frame_condition.notify_all()
@@ -10,14 +10,17 @@ VERSION = 1
 sim = None
 
 
-def init():
-    """initializes the simulator client"""
+def init(host=None, command_port=None, data_port=None, **options):
+    """initializes the simulator client, connecting to the simulator started last unless the host and ports are given
+    here or in the environment. Other options are passed on to SimulatorClient."""
     try:
         cleanup()
     except:
         pass
     global sim
-    sim = SimulatorClient()
+    sim = SimulatorClient(
+        host=host, command_port=command_port, data_port=data_port, **options
+    )
 
 
 def cleanup():
@@ -63,6 +66,19 @@ def getRobotName():
     return sim.getRobotName()
 
 
+def wait_for_update(timeout=None):
+    """Waits for the next sensor reading from the simulator and returns its number, or None after timeout seconds.
+    Calling this at the top of the main loop runs the loop once per reading instead of spinning."""
+    global sim
+    return sim.wait_for_update(timeout)
+
+
+def frame_seq():
+    """Returns the number of sensor readings received from the simulator"""
+    global sim
+    return sim.frame_seq
+
+
 def setServo(servo, degrees):
     """Sets the servo to position in degrees -90 to +90"""
     global sim
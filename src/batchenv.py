@@ -0,0 +1,282 @@
+"""
+batchenv.py simulates many independent robots at once without a window, for parameter sweeps and learning. The state
+of all robots is held as arrays with one entry per robot (struct of arrays) and every step moves all robots and takes
+all their sensor readings with a handful of NumPy operations, see batchsensors.py.
+
+Robots do not see or collide with each other. They can share one world or each have their own copy of a world, in
+which case the worlds may differ. The motion model is the one used by Pi2Go and Initio, including the swept collisions
+with static objects. Light sensors are not modelled since they need the light ray placed in the simulator window.
+
+Example:
+    env = BatchEnv("maze1.xml", num_robots=100, robot="Pi2Go")
+    observations = env.reset()
+    for i in range(1000):
+        actions = np.column_stack((speeds, turn_rates))
+        observations = env.step(actions)
+"""
+import math
+
+import numpy as np
+
+from src import collision, kinematics
+from src.robots.robotspecs import ROBOT_SPECS
+from src.sensors import batchsensors
+from src.snapshot import Snapshot
+from src.world import World
+
+DEFAULT_DT = 1.0 / 30
+# maximum change of the panning sonar angle per step in degrees, as PanningDistanceSensor
+SONAR_PAN_STEP = 5.0
+SONAR_PAN_LIMIT = 90.0
+# the state of the robots recorded by snapshot()
+STATE_FIELDS = (
+    "x",
+    "y",
+    "theta",
+    "velocity_x",
+    "velocity_y",
+    "vx",
+    "vth",
+    "sonar_angle",
+    "sonar_angle_target",
+    "in_collision",
+)
+OBJECT_FIELDS = ("object_x", "object_y", "object_half_width", "object_half_height")
+
+
+class BatchEnv(object):
+    def __init__(self, worlds, num_robots=None, robot="Pi2Go", dt=DEFAULT_DT):
+        """worlds is a world file name or World shared by num_robots robots, one by default, or a list with one per
+        robot."""
+        if isinstance(worlds, (list, tuple)):
+            if num_robots is not None and num_robots != len(worlds):
+                raise ValueError(
+                    "%d robots given for %d worlds, give one world per robot"
+                    % (num_robots, len(worlds))
+                )
+            worlds = [w if isinstance(w, World) else World(w) for w in worlds]
+            world_ids = np.arange(len(worlds))
+        else:
+            if num_robots is None:
+                num_robots = 1
+            if num_robots < 1:
+                raise ValueError("a batch needs at least one robot")
+            worlds = [worlds if isinstance(worlds, World) else World(worlds)]
+            world_ids = np.zeros(num_robots, dtype=int)
+        self.worlds = worlds
+        self.world_ids = world_ids
+        self.num_robots = world_ids.size
+        self.spec = ROBOT_SPECS[robot]
+        self.distance_bank = self.spec["distance_bank"]
+        self.line_bank = self.spec["line_bank"]
+        self.dt = dt
+
+        def per_robot(values):
+            return np.array(values, dtype=float)[world_ids]
+
+        self.world_width = per_robot([w.width for w in worlds])
+        self.world_height = per_robot([w.height for w in worlds])
+
+        # occupancy grids
+        self.grids = batchsensors.stack_grids([w.get_occupancy_grid() for w in worlds])
+        self.resolution = per_robot([w.sonar_resolution for w in worlds])
+        self.grid_width = per_robot([w.sonar_map.width for w in worlds])
+        self.grid_height = per_robot([w.sonar_map.height for w in worlds])
+
+        # line maps, worlds without one get an empty map
+        empty = np.zeros((1, 1), dtype=np.uint8)
+        self.line_data = batchsensors.stack_grids(
+            [w.line_data if w.line_data is not None else empty for w in worlds]
+        )
+        self.line_width = per_robot(
+            [0 if w.line_data is None else w.line_data.shape[1] for w in worlds]
+        )
+        self.line_height = per_robot(
+            [0 if w.line_data is None else w.line_data.shape[0] for w in worlds]
+        )
+        offsets = [w.get_line_map_offset() for w in worlds]
+        self.line_offset_x = per_robot([o[0] for o in offsets])
+        self.line_offset_y = per_robot([o[1] for o in offsets])
+
+        # static objects as (world, object) arrays of box centres and half extents, padded with NaN
+        num_objects = max(1, max(len(w.objects) for w in worlds))
+        scale = self.spec["object_collision_scale"]
+        self.object_x = np.full((len(worlds), num_objects), np.nan)
+        self.object_y = np.full((len(worlds), num_objects), np.nan)
+        self.object_half_width = np.full((len(worlds), num_objects), np.nan)
+        self.object_half_height = np.full((len(worlds), num_objects), np.nan)
+        for i, w in enumerate(worlds):
+            count = len(w.objects)
+            self.object_x[i, :count] = w.objects[:, 0]
+            self.object_y[i, :count] = w.objects[:, 1]
+            self.object_half_width[i, :count] = w.objects[:, 2] * scale
+            self.object_half_height[i, :count] = w.objects[:, 3] * scale
+
+        # robot state, theta is the heading in radians (counter clockwise) and vth is in degrees per second as in the
+        # commands sent to the robots
+        n = self.num_robots
+        self.x = np.zeros(n)
+        self.y = np.zeros(n)
+        self.theta = np.zeros(n)
+        self.velocity_x = np.zeros(n)
+        self.velocity_y = np.zeros(n)
+        self.vx = np.zeros(n)
+        self.vth = np.zeros(n)
+        self.sonar_angle = np.zeros(n)
+        self.sonar_angle_target = np.zeros(n)
+        self.in_collision = np.zeros(n, dtype=bool)
+        self.step_count = 0
+
+    def reset(self):
+        """Puts every robot back at the start position of its world and returns the observations."""
+        start_x = [w.robot_position[0] for w in self.worlds]
+        start_y = [w.robot_position[1] for w in self.worlds]
+        # the rotation of a sprite is in degrees clockwise
+        start_theta = [-math.radians(w.robot_rotation) for w in self.worlds]
+        self.x[:] = np.array(start_x, dtype=float)[self.world_ids]
+        self.y[:] = np.array(start_y, dtype=float)[self.world_ids]
+        self.theta[:] = np.array(start_theta)[self.world_ids]
+        for state in (
+            self.velocity_x,
+            self.velocity_y,
+            self.vx,
+            self.vth,
+            self.sonar_angle,
+            self.sonar_angle_target,
+        ):
+            state[:] = 0.0
+        self.in_collision[:] = False
+        self.step_count = 0
+        return self.get_observations()
+
+    def snapshot(self):
+        """Returns a Snapshot of the state of all robots, see snapshot.py. The static objects are never modified so
+        they are shared with the snapshot rather than copied."""
+        fields = {name: getattr(self, name) for name in STATE_FIELDS}
+        fields["step_count"] = self.step_count
+        shared = {name: getattr(self, name) for name in OBJECT_FIELDS}
+        return Snapshot(fields, shared)
+
+    def restore(self, snapshot):
+        """Puts every robot back in the state of a snapshot taken by this environment, or by another one with the same
+        number of robots, and returns the observations."""
+        for name in STATE_FIELDS:
+            setattr(self, name, np.array(snapshot[name]))
+        self.step_count = int(snapshot["step_count"])
+        for name in OBJECT_FIELDS:
+            if not np.shares_memory(snapshot[name], getattr(self, name)):
+                setattr(self, name, np.array(snapshot[name]))
+        return self.get_observations()
+
+    def step(self, actions):
+        """Applies one command per robot and advances the simulation by one step. actions is an array of rows
+        (LINEAR_VELOCITY, ANGULAR_VELOCITY) as sent by the robot scripts, the Initio takes an optional third column
+        with the SONAR_SERVO_ANGLE. Returns the observations after the step."""
+        actions = np.asarray(actions, dtype=float).reshape(self.num_robots, -1)
+        self.vx[:] = actions[:, 0]
+        self.vth[:] = actions[:, 1]
+        if self.spec["panning_sonar"] and actions.shape[1] > 2:
+            self.sonar_angle_target[:] = np.clip(
+                actions[:, 2], -SONAR_PAN_LIMIT, SONAR_PAN_LIMIT
+            )
+
+        self.move(self.dt)
+        self.step_count += 1
+        return self.get_observations()
+
+    def move(self, dt):
+        """Moves all robots, following the update of the robots: each robot drives along the arc of its command over
+        the step, the chord of the arc is swept against the static objects, then the robot is turned."""
+        x, y, theta = kinematics.integrate_arcs(
+            self.x, self.y, self.theta, self.vx, np.radians(self.vth), dt
+        )
+        self.velocity_x = (x - self.x) / dt
+        self.velocity_y = (y - self.y) / dt
+        self.x, self.y, self.in_collision = collision.move_circles(
+            self.x,
+            self.y,
+            x - self.x,
+            y - self.y,
+            self.spec["collision_radius"],
+            self.object_x[self.world_ids],
+            self.object_y[self.world_ids],
+            self.object_half_width[self.world_ids],
+            self.object_half_height[self.world_ids],
+        )
+        radius = max(self.spec["width"], self.spec["height"]) / 2.0
+        np.clip(self.x, radius, self.world_width - radius, out=self.x)
+        np.clip(self.y, radius, self.world_height - radius, out=self.y)
+        self.theta = theta
+
+        pan = np.clip(
+            self.sonar_angle_target - self.sonar_angle, -SONAR_PAN_STEP, SONAR_PAN_STEP
+        )
+        self.sonar_angle += pan
+
+    def read_distance_sensors(self):
+        """Returns the ranges measured by all distance sensors of all robots as an (robots, sensors) array, every
+        sensor of the distance bank of the robot is cast in one pass."""
+        bank = self.distance_bank
+        heading = np.broadcast_to(self.theta[:, None], (self.num_robots, len(bank)))
+        if self.spec["panning_sonar"]:
+            # the whole sonar head turns with the servo
+            panning = np.array([t == "sonar" for t in bank.types])
+            heading = heading + np.where(
+                panning, np.radians(self.sonar_angle)[:, None], 0.0
+            )
+        sensor_x, sensor_y = batchsensors.transform_offsets(
+            self.x[:, None], self.y[:, None], heading, bank.offset_x, bank.offset_y
+        )
+
+        def per_sensor(values):
+            return np.repeat(values, len(bank))
+
+        ranges = batchsensors.cast_rays(
+            self.grids,
+            per_sensor(self.grid_width),
+            per_sensor(self.grid_height),
+            per_sensor(self.resolution),
+            per_sensor(self.world_ids),
+            sensor_x.reshape(-1),
+            sensor_y.reshape(-1),
+            (heading + bank.rotation).reshape(-1),
+            np.tile(bank.min_range, self.num_robots),
+            np.tile(bank.max_range, self.num_robots),
+            np.tile(bank.beam_angle, self.num_robots),
+        )
+        return ranges.reshape(self.num_robots, len(bank))
+
+    def read_line_sensors(self):
+        """Returns whether each line sensor of each robot is over the line as an (robots, sensors) array."""
+        bank = self.line_bank
+        sensor_x, sensor_y = batchsensors.transform_offsets(
+            self.x[:, None],
+            self.y[:, None],
+            self.theta[:, None],
+            bank.offset_x,
+            bank.offset_y,
+        )
+        shape = sensor_x.shape
+        return batchsensors.sample_line_maps(
+            self.line_data,
+            np.broadcast_to(self.line_width[:, None], shape),
+            np.broadcast_to(self.line_height[:, None], shape),
+            np.broadcast_to(self.world_ids[:, None], shape),
+            np.trunc(sensor_x) - self.line_offset_x[:, None],
+            np.trunc(sensor_y) - self.line_offset_y[:, None],
+        )
+
+    def get_observations(self):
+        """Returns the sensor readings of all robots as a dictionary of arrays with one row per robot."""
+        ranges = self.read_distance_sensors()
+        sonar = self.distance_bank.of_type("sonar")
+        ir = self.distance_bank.of_type("ir")
+        return {
+            "x": self.x.copy(),
+            "y": self.y.copy(),
+            "theta": self.theta.copy(),
+            "sonar": ranges[:, sonar[0]] if sonar.size else np.zeros(self.num_robots),
+            "ir": ranges[:, ir] < self.distance_bank.max_range[ir],
+            "line": self.read_line_sensors(),
+            "collision": self.in_collision.copy(),
+        }
@@ -0,0 +1,166 @@
+"""
+collision.py moves circles (the robots) through a set of axis aligned boxes (the static objects) without letting them
+pass through. Each move is swept: the time of impact with the first box in the way is found, the circle is advanced to
+the contact point and the rest of the move slides along the surface it hit. Circles which already overlap a box, for
+example because the robot was dragged onto it, are first pushed out along the shortest way.
+
+The shape swept against is the box grown by the circle radius with rounded corners, so the time of impact is the
+earliest entry through one of its four straight faces or four corner arcs. All functions work on arrays with one row
+per circle and one column per box, a single robot is a batch of one.
+"""
+import numpy as np
+
+# slide iterations per move, a circle pushed into a corner stops after this many contacts
+MAX_ITERATIONS = 3
+# overlap in pixels below which a circle resting on a surface is not pushed out of it
+CONTACT_EPSILON = 1e-6
+# distance in pixels within which a circle counts as touching a surface when sweeping, larger than CONTACT_EPSILON so
+# that no circle is left neither pushed out of nor blocked by a box
+CONTACT_SLOP = 1e-3
+
+
+def time_of_impact(x, y, dx, dy, radius, box_x, box_y, half_width, half_height):
+    """Returns the earliest time of impact t in [0, 1] of each circle moving by (dx, dy) with any of its boxes and the
+    contact normal. Circles are given as (N,) arrays, boxes as (N, M) arrays, missing boxes are given as NaN. Circles
+    which hit nothing get t = 1 and a zero normal."""
+    px = x[:, None] - box_x
+    py = y[:, None] - box_y
+    dx = np.broadcast_to(dx[:, None], px.shape)
+    dy = np.broadcast_to(dy[:, None], px.shape)
+    r = np.broadcast_to(np.asarray(radius, dtype=float).reshape(-1, 1), px.shape)
+
+    best_t = np.full(px.shape, np.inf)
+    best_nx = np.zeros(px.shape)
+    best_ny = np.zeros(px.shape)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # the four straight faces of the grown box
+        for axis in (0, 1):
+            if axis == 0:
+                p, d, q, dq = px, dx, py, dy
+                half, other_half = half_width, half_height
+            else:
+                p, d, q, dq = py, dy, px, dx
+                half, other_half = half_height, half_width
+            for side in (-1.0, 1.0):
+                plane = side * (half + r)
+                # moving towards the face from outside, or from resting on it
+                approaching = (side * d < 0) & (side * p >= half + r - CONTACT_SLOP)
+                t = np.maximum((plane - p) / d, 0.0)
+                along = q + t * dq
+                hit = approaching & (t <= 1) & (np.abs(along) <= other_half)
+                better = hit & (t < best_t)
+                best_t = np.where(better, t, best_t)
+                if axis == 0:
+                    best_nx = np.where(better, side, best_nx)
+                    best_ny = np.where(better, 0.0, best_ny)
+                else:
+                    best_nx = np.where(better, 0.0, best_nx)
+                    best_ny = np.where(better, side, best_ny)
+
+        # the four corner arcs, a circle of the robot radius around each corner of the box
+        a = dx * dx + dy * dy
+        for corner_x in (-1.0, 1.0):
+            for corner_y in (-1.0, 1.0):
+                cx = px - corner_x * half_width
+                cy = py - corner_y * half_height
+                b = 2 * (cx * dx + cy * dy)
+                c = cx * cx + cy * cy - r * r
+                disc = b * b - 4 * a * c
+                t = np.maximum((-b - np.sqrt(disc)) / (2 * a), 0.0)
+                # moving towards the corner from outside its circle, or from resting on it
+                hit = (a > 0) & (b < 0) & (c > -2 * r * CONTACT_SLOP) & (disc >= 0)
+                hit &= t <= 1
+                better = hit & (t < best_t)
+                best_t = np.where(better, t, best_t)
+                best_nx = np.where(better, (cx + t * dx) / r, best_nx)
+                best_ny = np.where(better, (cy + t * dy) / r, best_ny)
+
+    # the earliest contact of each circle
+    first = best_t.argmin(axis=1)
+    rows = np.arange(px.shape[0])
+    t = best_t[rows, first]
+    hit = np.isfinite(t)
+    return (
+        np.where(hit, t, 1.0),
+        np.where(hit, best_nx[rows, first], 0.0),
+        np.where(hit, best_ny[rows, first], 0.0),
+    )
+
+
+def penetration(x, y, radius, box_x, box_y, half_width, half_height):
+    """Returns the vector pushing each circle out of the box it overlaps most, zero if it overlaps none."""
+    px = x[:, None] - box_x
+    py = y[:, None] - box_y
+    r = np.asarray(radius, dtype=float).reshape(-1, 1)
+
+    # vector from the closest point of the box to the centre of the circle
+    vx = px - np.clip(px, -half_width, half_width)
+    vy = py - np.clip(py, -half_height, half_height)
+    distance = np.hypot(vx, vy)
+    outside = distance > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        depth = np.where(outside, r - distance, 0.0)
+        push_x = np.where(outside, vx / distance * depth, 0.0)
+        push_y = np.where(outside, vy / distance * depth, 0.0)
+
+    # a centre inside the box leaves along the axis with the smallest overlap
+    inside = ~outside & (half_width >= 0)
+    depth_x = half_width - np.abs(px) + r
+    depth_y = half_height - np.abs(py) + r
+    sign_x = np.where(px < 0, -1.0, 1.0)
+    sign_y = np.where(py < 0, -1.0, 1.0)
+    use_x = depth_x <= depth_y
+    push_x = np.where(inside & use_x, sign_x * depth_x, push_x)
+    push_y = np.where(inside & ~use_x, sign_y * depth_y, push_y)
+    depth = np.where(inside, np.minimum(depth_x, depth_y), depth)
+
+    depth = np.where(depth > CONTACT_EPSILON, depth, 0.0)
+    deepest = depth.argmax(axis=1)
+    rows = np.arange(px.shape[0])
+    overlapping = depth[rows, deepest] > 0
+    return (
+        np.where(overlapping, push_x[rows, deepest], 0.0),
+        np.where(overlapping, push_y[rows, deepest], 0.0),
+    )
+
+
+def move_circles(x, y, dx, dy, radius, box_x, box_y, half_width, half_height):
+    """Moves each circle by (dx, dy) through its boxes and returns the new positions and whether each circle touched a
+    box. Circles (N,) and boxes (N, M) are as for time_of_impact."""
+    x = np.array(x, dtype=float)
+    y = np.array(y, dtype=float)
+    dx = np.array(dx, dtype=float)
+    dy = np.array(dy, dtype=float)
+    touched = np.zeros(x.shape, dtype=bool)
+
+    # leave any box the circle starts in
+    for _ in range(MAX_ITERATIONS):
+        push_x, push_y = penetration(
+            x, y, radius, box_x, box_y, half_width, half_height
+        )
+        pushed = (push_x != 0) | (push_y != 0)
+        if not pushed.any():
+            break
+        x += push_x
+        y += push_y
+        touched |= pushed
+
+    for _ in range(MAX_ITERATIONS):
+        moving = (dx != 0) | (dy != 0)
+        if not moving.any():
+            break
+        t, nx, ny = time_of_impact(
+            x, y, dx, dy, radius, box_x, box_y, half_width, half_height
+        )
+        x += dx * t
+        y += dy * t
+        hit = t < 1
+        touched |= hit
+        # the rest of the move slides along the surface that was hit
+        dx *= 1 - t
+        dy *= 1 - t
+        into = np.minimum(dx * nx + dy * ny, 0.0)
+        dx = np.where(hit, dx - into * nx, 0.0)
+        dy = np.where(hit, dy - into * ny, 0.0)
+    return x, y, touched
@@ -0,0 +1,44 @@
+"""
+commandline.py parses the command line options of the simulator, shared by the pysim.py and pysimosx.py entry points.
+It only imports argparse, so pysimosx.py can parse its options before it loads tkinter or pyglet.
+"""
+import argparse
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description="PiRover simulator")
+    parser.add_argument(
+        "--fixed-step",
+        type=float,
+        default=None,
+        help="advance the simulation by fixed steps of this many seconds instead of the wall clock",
+    )
+    parser.add_argument(
+        "--fast",
+        action="store_true",
+        help="with --fixed-step, run the simulation as fast as possible instead of in real time",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=None, help="seed for the random number generator"
+    )
+    parser.add_argument(
+        "--lockstep",
+        action="store_true",
+        help="with --fixed-step, wait for the command of the external script at every step",
+    )
+    parser.add_argument(
+        "--host", default=None, help="address to listen on for the external script"
+    )
+    parser.add_argument(
+        "--command-port",
+        type=int,
+        default=None,
+        help="port to receive commands on, 0 for any free port",
+    )
+    parser.add_argument(
+        "--data-port",
+        type=int,
+        default=None,
+        help="port to send the state to, 0 to only answer clients which say hello",
+    )
+    return parser.parse_args(args)
@@ -0,0 +1,234 @@
+"""
+experiment.py runs batches of headless simulations in parallel. Every combination of world file, controller and set of
+run parameters is one run, the runs are spread over a pool of processes and the metrics of each run are appended to a
+results file (one JSON object per line) as soon as it finishes.
+
+Controllers run in process, bound to a BatchEnv rather than to a simulator over the network, so the robot scripts of
+the examples folder, which drive a simulator through simrobot or SimulatorClient, cannot run in the pool as they are.
+Their logic has to be written as a controller function instead, examples/BatchAvoider.py is IRAvoider.py rewritten so.
+The contract of a controller is:
+
+    controller(observation, memory) -> (LINEAR_VELOCITY, ANGULAR_VELOCITY[, SONAR_SERVO_ANGLE])
+
+It is called once per simulation step of dt seconds and must return at once, a controller cannot sleep or wait for
+sensors, it keeps whatever it needs between steps in memory instead. observation is a dictionary of plain python values
+with the readings of the robot at the start of the step (see BatchEnv.get_observations):
+    x, y         position of the robot in pixels
+    theta        heading in radians, counter clockwise
+    sonar        sonar range
+    ir           list of booleans, true if the IR sensor sees an obstacle, from left to right
+    line         list of booleans, true if the line sensor is over the line, left then right
+    collision    true if the robot is touching an object
+The velocities are those of the commands of the robot scripts, a positive angular velocity turning left. The servo angle
+is only read for the Initio. memory starts as a copy of the run parameters and is kept for the whole run, and only for
+that run. Controllers are given as functions, which must be defined at module level so that they can be sent to the
+worker processes, or as "module:function" / "path/to/file.py:function" strings, which are imported by each worker.
+
+Run parameters used by the runner itself (all others are only passed to the controller):
+    robot        name of a robot definition in the robots folder, "Pi2Go" or "Initio"
+    max_time     simulated seconds before the run is stopped
+    dt           simulation step in seconds
+    start        optional [x, y, rotation] overriding the robot position of the world file
+    goal         optional [x, y], the run stops once the robot is within goal_radius of it
+
+Example:
+    python -m src.experiment --worlds maze1.xml maze2.xml --controllers examples/BatchAvoider.py:controller
+        --params params.json --workers 4 --output results.jsonl
+"""
+import argparse
+import importlib
+import importlib.util
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.batchenv import BatchEnv, DEFAULT_DT
+from src.robots.robotspecs import ROBOT_SPECS
+
+DEFAULT_MAX_TIME = 60.0
+DEFAULT_GOAL_RADIUS = 30.0
+DEFAULT_RESULTS_FILE = "results.jsonl"
+
+
+def load_controller(controller):
+    """Returns the controller function for a controller or "module:function" / "file.py:function" string."""
+    if callable(controller):
+        return controller
+    module_name, function_name = controller.rsplit(":", 1)
+    if module_name.endswith(".py"):
+        spec = importlib.util.spec_from_file_location(
+            os.path.splitext(os.path.basename(module_name))[0], module_name
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(module_name)
+    return getattr(module, function_name)
+
+
+def controller_name(controller):
+    """Returns the name used for a controller in the results file."""
+    if callable(controller):
+        return "%s:%s" % (controller.__module__, controller.__qualname__)
+    return controller
+
+
+def robot_observation(observations, index=0):
+    """Returns the observations of a single robot of a BatchEnv as plain python values."""
+    return {key: value[index].tolist() for key, value in observations.items()}
+
+
+def run_simulation(world_file, controller, params):
+    """Runs a single simulation until the goal is reached or max_time elapses and returns its metrics."""
+    control = load_controller(controller)
+    dt = params.get("dt", DEFAULT_DT)
+    env = BatchEnv(world_file, num_robots=1, robot=params.get("robot", "Pi2Go"), dt=dt)
+    observations = env.reset()
+    if "start" in params:
+        start_x, start_y, rotation = params["start"]
+        env.x[0] = start_x
+        env.y[0] = start_y
+        env.theta[0] = -math.radians(rotation)
+        observations = env.get_observations()
+
+    goal = params.get("goal")
+    goal_radius = params.get("goal_radius", DEFAULT_GOAL_RADIUS)
+    memory = dict(params)
+    time_to_goal = None
+    collisions = 0
+    distance = 0.0
+    steps = 0
+    max_steps = int(round(params.get("max_time", DEFAULT_MAX_TIME) / dt))
+    while steps < max_steps:
+        observation = robot_observation(observations)
+        action = control(observation, memory)
+        observations = env.step([action])
+        steps += 1
+
+        distance += math.hypot(
+            observations["x"][0] - observation["x"],
+            observations["y"][0] - observation["y"],
+        )
+        # count each new contact once
+        if observations["collision"][0] and not observation["collision"]:
+            collisions += 1
+        if goal is not None and (
+            math.hypot(observations["x"][0] - goal[0], observations["y"][0] - goal[1])
+            <= goal_radius
+        ):
+            time_to_goal = steps * dt
+            break
+
+    return {
+        "time_to_goal": time_to_goal,
+        "collisions": collisions,
+        "distance": distance,
+        "time": steps * dt,
+        "final_pose": [
+            float(observations["x"][0]),
+            float(observations["y"][0]),
+            -math.degrees(observations["theta"][0]),
+        ],
+    }
+
+
+def run_experiments(
+    world_files, controllers, params_list=None, results_file=None, max_workers=None
+):
+    """Runs every combination of world file, controller and run parameters in a pool of max_workers processes.
+    Results are appended to results_file as each run finishes and are also returned, ordered by run number."""
+    if not params_list:
+        params_list = [{}]
+    runs = []
+    for world_file in world_files:
+        for controller in controllers:
+            for params in params_list:
+                runs.append((len(runs), world_file, controller, params))
+
+    results = [None] * len(runs)
+    output = open(results_file, "a") if results_file is not None else None
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for run in runs:
+                _, world_file, controller, params = run
+                future = executor.submit(run_simulation, world_file, controller, params)
+                futures[future] = run
+            for future in as_completed(futures):
+                run_id, world_file, controller, params = futures[future]
+                result = {
+                    "run": run_id,
+                    "world": world_file,
+                    "controller": controller_name(controller),
+                    "params": params,
+                }
+                try:
+                    result.update(future.result())
+                except Exception as e:
+                    # a failing run should not stop the others
+                    result["error"] = repr(e)
+                results[run_id] = result
+                if output is not None:
+                    output.write(json.dumps(result) + "\n")
+                    output.flush()
+    finally:
+        if output is not None:
+            output.close()
+    return results
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Run headless simulations of world files and controllers in parallel."
+    )
+    parser.add_argument(
+        "--worlds", nargs="+", required=True, help="world files in the worlds folder"
+    )
+    parser.add_argument(
+        "--controllers",
+        nargs="+",
+        required=True,
+        help='controllers as "module:function" or "path/to/file.py:function"',
+    )
+    parser.add_argument(
+        "--params",
+        help="JSON file holding a list of run parameter sets, each is run with every world and controller",
+    )
+    parser.add_argument("--robot", choices=sorted(ROBOT_SPECS), default="Pi2Go")
+    parser.add_argument(
+        "--max-time",
+        type=float,
+        default=DEFAULT_MAX_TIME,
+        help="simulated seconds per run",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="number of worker processes"
+    )
+    parser.add_argument("--output", default=DEFAULT_RESULTS_FILE)
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    params_list = [{}]
+    if args.params is not None:
+        with open(args.params) as params_file:
+            params_list = json.load(params_file)
+    # the command line values are defaults for each parameter set
+    params_list = [
+        dict({"robot": args.robot, "max_time": args.max_time}, **params)
+        for params in params_list
+    ]
+    results = run_experiments(
+        args.worlds, args.controllers, params_list, args.output, args.workers
+    )
+    failed = [result for result in results if "error" in result]
+    print(
+        "%d runs finished, %d failed, results in %s"
+        % (len(results), len(failed), args.output)
+    )
+
+
+if __name__ == "__main__":
+    main()
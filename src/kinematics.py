@@ -0,0 +1,42 @@
+"""
+kinematics.py moves differential drive robots along the exact arc driven by constant linear and angular velocities
+over a step, rather than along a straight line in the heading at the start of the step. The pose after a step then
+does not depend on the step size, a batch run at 10Hz follows the same path as the simulator window at 30Hz.
+
+Headings are in radians counter clockwise and the angular velocity in radians per second. integrate_arc works on
+single values, integrate_arcs on arrays with one entry per robot.
+"""
+import math
+
+import numpy as np
+
+
+def integrate_arc(x, y, theta, v, omega, dt):
+    """Returns the pose (x, y, theta) reached by moving for dt seconds from (x, y, theta) at linear velocity v and
+    angular velocity omega."""
+    half_turn = 0.5 * omega * dt
+    # length of the chord of the arc, sin(a) / a tends to 1 as the turn goes to zero
+    if abs(half_turn) > 1e-9:
+        chord = v * dt * math.sin(half_turn) / half_turn
+    else:
+        chord = v * dt
+    # the chord points half way between the start and end headings
+    chord_angle = theta + half_turn
+    return (
+        x + chord * math.cos(chord_angle),
+        y + chord * math.sin(chord_angle),
+        theta + 2.0 * half_turn,
+    )
+
+
+def integrate_arcs(x, y, theta, v, omega, dt):
+    """Vectorised integrate_arc, all arguments but dt are arrays with one entry per robot."""
+    half_turn = 0.5 * omega * dt
+    # np.sinc(a / pi) is sin(a) / a, including the limit at zero
+    chord = v * dt * np.sinc(half_turn / np.pi)
+    chord_angle = theta + half_turn
+    return (
+        x + chord * np.cos(chord_angle),
+        y + chord * np.sin(chord_angle),
+        theta + 2.0 * half_turn,
+    )
@@ -7,7 +7,9 @@ from tkinter.filedialog import *
 
 import pyglet
 import os
+from src.robots.robotspecs import INITIO, PI2GO
 from src.sensors.sonar import Map
+from src.spatialhash import SpatialHash
 from src.sprites.basicsprite import BasicSprite
 from src.sprites.basicsprite import SwitchSprite
 from . import util
@@ -15,19 +17,19 @@ from . import util
 NUM_LINE_MAPS = 10
 NUM_BACKGROUNDS = 4
 
-# Tell pyglet where to find the resources
-pyglet.resource.path = ["resources"]
+# Tell pyglet where to find the resources, wherever the script importing them lives
+pyglet.resource.path = [util.get_resource_path()]
 pyglet.resource.reindex()
 
 # Load the static resources
 robot_image = pyglet.resource.image("robot/rover.png")
-robot_image.width = 100
-robot_image.height = 80
+robot_image.width = INITIO["width"]
+robot_image.height = INITIO["height"]
 util.center_image(robot_image)
 
 pi2go_image = pyglet.resource.image("robot/pi2go.png")
-pi2go_image.width = 110
-pi2go_image.height = 90
+pi2go_image.width = PI2GO["width"]
+pi2go_image.height = PI2GO["height"]
 util.center_image(pi2go_image)
 # pi2go_image.anchor_x = 26
 
@@ -116,6 +118,8 @@ class DynamicAsssets:
         # setup some member variables
         self.background_sprite = None
         self.static_objects = []
+        # the static objects the robot can collide with, the menu buttons and the switch are never added
+        self.obstacles = SpatialHash()
         self.robot_position = [0, 0]
         self.robot_rotation = 0
         self.start_window = pyglet_sim_window
@@ -220,6 +224,7 @@ class DynamicAsssets:
                         image_grid[index], x, y, fg_batch, fg_subgroup, "object", index
                     )
                     self.static_objects.append(sprt_obj)
+                    self.obstacles.insert(sprt_obj)
 
             # elif child.tag == "switch":
             #     x = int(child.attrib['position_x'])
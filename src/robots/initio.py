@@ -1,14 +1,11 @@
 """
 initio.py is a subclass of BasicSprite and creates a simulated INITIO robot
-with appropriate sensros. This module also handles communication between
-the simulator and any external scripts. Communicate is done via simple
-string messeages passed via UDP socket.
+with appropriate sensros. Communication between the simulator and any
+external scripts is handled by robotlink.py, this module provides the state
+and command messages which are passed via UDP socket.
 """
 
 import math
-import socket
-import threading
-import time
 from src.sensors.linesensor import FixedLineSensor
 from src.sensors.lightsensor import FixedLightSensor
 from src.sensors.linesensor import LineSensorMap
@@ -16,34 +13,21 @@ from src.sensors.distancesensors import (
     FixedTransformDistanceSensor,
     PanningDistanceSensor,
 )
+from src.sensors.mounts import MountTransform
+from src.sensors.scheduler import SensorScheduler
+from src.simclock import SimClock
 from src.sprites import basicsprite
 import pyglet
+import src.kinematics
 import src.resources
 import src.util
-from .robotconstants import (
-    SONAR_BEAM_ANGLE,
-    SONAR_MAX_RANGE,
-    SONAR_MIN_RANGE,
-    IR_MAX_RANGE,
-    IR_MIN_RANGE,
-    UDP_COMMAND_PORT,
-    UDP_DATA_PORT,
-    UDP_IP,
-    IR_BEAM_ANGLE,
-)
-
-# Constants specific to the Initio robot.
-
-IR_SENSOR_ANGLE = 0.80
-IR_OFFSET_X = 40
-IR_OFFSET_Y = 18
-LINE_OFFSET_X = 40
-LINE_OFFSET_Y = 5
+from .robotconstants import LIGHT_SENSOR_COLOURS
+from .robotlink import RobotLink
+from .robotspecs import INITIO, state_values
 
-SONAR_OFFSET_X = 80
+# Constants specific to the Initio robot, the sensor layout is described in robotspecs.py.
 
-READ_INTERVAL = 0.01
-PUBLISH_INTERVAL = 0.03
+NUM_COMMAND_VALUES = 3
 
 
 class Initio(basicsprite.BasicSprite):
@@ -51,9 +35,15 @@ class Initio(basicsprite.BasicSprite):
         self.sonar_map = kwargs.pop("sonar_map")
         line_map_sprite = kwargs.pop("line_map_sprite")
         self.static_objects = kwargs.pop("static_objects")
+        # spatial hash of the objects the robot collides with
+        self.obstacles = kwargs.pop("obstacles", None)
         batch = kwargs.pop("batch")
         window_width = kwargs.pop("window_width")
         window_height = kwargs.pop("window_height")
+        self.clock = kwargs.pop("clock", None)
+        if self.clock is None:
+            self.clock = SimClock()
+        self.sensor_scheduler = SensorScheduler(self.clock, INITIO["sensor_rates"])
 
         robot_group = pyglet.graphics.Group(1)
 
@@ -72,85 +62,38 @@ class Initio(basicsprite.BasicSprite):
         self.group = robot_group
         self.robot_name = "INITIO"
         self.radius = max(self.image.width, self.image.height) / 2.0
-
-        x_light_offset = self.image.width / 2
-        y_light_offset = self.image.height / 2
-
-        self.sonar_sensor = PanningDistanceSensor(
-            batch=batch,
-            robot=self,
-            sonar_map=self.sonar_map,
-            offset_x=SONAR_OFFSET_X,
-            offset_y=0,
-            min_range=SONAR_MIN_RANGE,
-            max_range=SONAR_MAX_RANGE,
-            beam_angle=SONAR_BEAM_ANGLE,
-        )
-
-        self.ir_left_sensor = FixedTransformDistanceSensor(
-            self,
-            self.sonar_map,
-            IR_OFFSET_X,
-            IR_OFFSET_Y,
-            IR_SENSOR_ANGLE,
-            IR_MIN_RANGE,
-            IR_MAX_RANGE,
-            IR_BEAM_ANGLE,
-        )
-
-        self.ir_right_sensor = FixedTransformDistanceSensor(
-            self,
-            self.sonar_map,
-            IR_OFFSET_X,
-            -IR_OFFSET_Y,
-            -IR_SENSOR_ANGLE,
-            IR_MIN_RANGE,
-            IR_MAX_RANGE,
-            IR_BEAM_ANGLE,
-        )
-
-        self.light_frontleft_sensor = FixedLightSensor(
-            self,
-            x_light_offset,
-            y_light_offset - 10,
-            "FrontLeft",
-            drawing_colour=(255, 0, 0, 255),
-        )
-        self.light_frontright_sensor = FixedLightSensor(
-            self,
-            x_light_offset,
-            -y_light_offset + 10,
-            "FrontRight",
-            drawing_colour=(0, 255, 0, 255),
-        )
-        self.light_backleft_sensor = FixedLightSensor(
-            self,
-            -x_light_offset,
-            y_light_offset - 10,
-            "BackLeft",
-            drawing_colour=(0, 0, 255, 255),
-        )
-        self.light_backright_sensor = FixedLightSensor(
-            self,
-            -x_light_offset,
-            -y_light_offset + 10,
-            "BackRight",
-            drawing_colour=(255, 255, 255, 255),
-        )
-
-        self.light_sensors = []
-        self.light_sensors.append(self.light_frontleft_sensor)
-        self.light_sensors.append(self.light_frontright_sensor)
-        self.light_sensors.append(self.light_backleft_sensor)
-        self.light_sensors.append(self.light_backright_sensor)
+        self.collision_radius = INITIO["collision_radius"]
+        self.object_collision_scale = INITIO["object_collision_scale"]
+        # mount points of the sensors and LEDs, transformed once per pose of the robot
+        self.mounts = MountTransform()
 
         self.line_sensor_map = LineSensorMap(line_map_sprite)
-        self.left_line_sensor = FixedLineSensor(
-            self, self.line_sensor_map, LINE_OFFSET_X, LINE_OFFSET_Y
-        )
-        self.right_line_sensor = FixedLineSensor(
-            self, self.line_sensor_map, LINE_OFFSET_X, -LINE_OFFSET_Y
-        )
+        # the sensors of the robot definition keyed by their (type, name), as are the fields of the state message and
+        # the rates of the sensor scheduler, the sonars are mounted on the servo
+        self.sensors = {}
+        for (sensor_type, name), mount in INITIO["mounts"].items():
+            if sensor_type == "sonar":
+                offset_x, offset_y, _, min_range, max_range, beam_angle = mount
+                sensor = PanningDistanceSensor(
+                    batch=batch,
+                    robot=self,
+                    sonar_map=self.sonar_map,
+                    offset_x=offset_x,
+                    offset_y=offset_y,
+                    min_range=min_range,
+                    max_range=max_range,
+                    beam_angle=beam_angle,
+                )
+            elif sensor_type == "line":
+                sensor = FixedLineSensor(self, self.line_sensor_map, *mount)
+            elif sensor_type == "light":
+                colour = LIGHT_SENSOR_COLOURS.get(name, (255, 255, 255, 255))
+                sensor = FixedLightSensor(self, *mount, name, drawing_colour=colour)
+            else:
+                sensor = FixedTransformDistanceSensor(self, self.sonar_map, *mount)
+            self.sensors[(sensor_type, name)] = sensor
+        self.sonar_sensors = self.of_type("sonar")
+        self.light_sensors = self.of_type("light")
 
         self.mouse_move_state = False
         self.mouse_position = [0, 0]
@@ -162,9 +105,6 @@ class Initio(basicsprite.BasicSprite):
         # self.sock_recv = None
         # self.sock_publish = None
 
-        self.publish_continue = True
-        self.receive_continue = True
-
         # self.sonar_sensor.update(1)
         # self.sonar_sensor.update_sensor()
 
@@ -173,32 +113,32 @@ class Initio(basicsprite.BasicSprite):
 
         # pyglet.clock.schedule_interval(self.update_sensors, 1.0 / 30)
 
-        self.publish_thread = threading.Thread(target=self.publish_state_udp)
-        # self.publish_thread.setDaemon(True)
-        self.publish_thread.start()
-
-        self.cmd_thread = threading.Thread(target=self.recv_commands)
-        # self.cmd_thread.setDaemon(True)
-        self.cmd_thread.start()
+        # handles the UDP communication with the external script
+        self.link = RobotLink(self, self.clock, NUM_COMMAND_VALUES)
         # self.start_robot()
 
+    def of_type(self, sensor_type):
+        """Returns the sensors of a type, in the order of the robot definition."""
+        return [
+            sensor
+            for (other, _), sensor in self.sensors.items()
+            if other == sensor_type
+        ]
+
     def start_robot(self):
-        self.publish_continue = True
-        self.receive_continue = True
+        self.link.start()
         # this method is called when the robot control switch is switched ON
         self.control_switch_on = False
         # release the brakes on movement
         # pyglet.clock.unschedule(self.stop_robot_movement)
 
     def stop_robot(self):
-        # cause the publish and command threads to stop
-        self.publish_continue = False
-        self.receive_continue = False
+        # send the last state and close the link
         # this method is called when the robot control switch is switched ON
         self.control_switch_on = False
+        self.link.stop()
         # stop movement
         # pyglet.clock.unschedule(self.stop_robot_movement)
-        time.sleep(0.3)
         # stop robot movement using a background thread
         # stop_movement_thread = threading.Thread(target=pyglet.clock.schedule_interval, args=(self.stop_robot_movement, 1.0 / 30))
         # stop_movement_thread.setDaemon(True)
@@ -221,136 +161,60 @@ class Initio(basicsprite.BasicSprite):
             self.velocity_y = 0
             # self.sonar_sensor.update(1)
 
-    def recv_commands(self):
-        """Thread function which handles incomming commands for an external python script via a UDP socket.
+    def apply_command(self, values_list):
+        """Applies a command received from an external python script.
 
         Commands are strings and take the form: <<LINEAR_VELOCITY;ANGULAR_VELOCITY;SONAR_SERVO_ANGLE>>
         """
-        # Initialise the socket used by the command/receiving thread
-        self.sock_recv = socket.socket(
-            socket.AF_INET, socket.SOCK_DGRAM  # Internet
-        )  # UDP
-        self.sock_recv.bind((UDP_IP, UDP_COMMAND_PORT))
-        self.sock_recv.settimeout(1)
-
-        #  double loop is a hack - changing while True to while self.receive_continue while debugging
-        while self.receive_continue is True:
-            while self.receive_continue is True:
-                try:
-                    data_e, addr = self.sock_recv.recvfrom(
-                        1024
-                    )  # buffer size is 1024 bytes
-                    data = data_e.decode()
-                    if data.startswith("<<") and data.endswith(">>"):
-                        data = data.replace("<<", "")
-                        data = data.replace(">>", "")
-                        values_list = data.split(";")
-                        if len(values_list) == 3:
-                            self.sonar_sensor.set_target(float(values_list[2]))
-                            self.vx = float(values_list[0])
-                            # if spin_time > 0.0:
-                            #                             if self.schedule_lock == False:
-                            #                                 self.unschedule_angvelreset()  # unschedule any previous schedule made.
-                            #                                 self.vth = float(values_list[1])
-                            #                                 pyglet.clock.schedule_interval(self.reset_angular_velocity, spin_time)
-                            #                                 self.schedule_lock = True  # deny any new schedule to be made on reset_angular_velocity
-                            #                                 if self.vx == 0.0 and self.vth <> 0.0:
-                            #                                     self.is_rotating = True
-                            #                         else:
-                            self.vth = float(values_list[1])
-                            if self.vx == 0 and self.vth != 0:
-                                self.is_rotating = True
-                            else:
-                                self.is_rotating = False
-                except Exception:
-                    pass
-            time.sleep(READ_INTERVAL)
-
-            # we need to call stop_robot() again since the values for vx and vth and velocities may
-            # already have been reinstated by an update from the client just before the inner while loop
-            # above stopped (due to self.receive_continue being set to false)
-            # self.stop_robot()
-        print("closing receive socket")
-        self.sock_recv.close()
-
-    def publish_state_udp(self):
-        """Thread function which publishes the state of the robot to an external python script via UDP socket.
-
-        State strings take the form: <<ROBOT_NAME;SONAR_RANGE;LEFT_LINE;RIGHT_LINE;LEFT_IR;RIGHT_IR;
+        for sonar in self.sonar_sensors:
+            sonar.set_target(float(values_list[2]))
+        self.vx = float(values_list[0])
+        self.vth = float(values_list[1])
+        if self.vx == 0 and self.vth != 0:
+            self.is_rotating = True
+        else:
+            self.is_rotating = False
+
+    def get_state_values(self):
+        """Returns the values of the state message published to an external python script, in the order described by
+        get_state_message() and without the robot name."""
+        return state_values(
+            INITIO["state_fields"], self.sensors, self.control_switch_on
+        )
+
+    def get_state_message(self, values=None):
+        """Returns the state message published to an external python script, built from values as returned by
+        get_state_values(), the current state if values is None.
+
+        State strings take the form <<ROBOT_NAME;...>> with the fields of INITIO["state_fields"], by default:
+                                        <<ROBOT_NAME;SONAR_RANGE;LEFT_LINE;RIGHT_LINE;LEFT_IR;RIGHT_IR;
                                         FRONT_LEFT_LIGHTSENSOR, FRONT_RIGHT_LIGHTSENSOR,
-                                        BACK_LEFT_LIGHTSENSOR, BACK_RIGHT_LIGHTSENSOR; CONTROL_SWITCH>>
+                                        BACK_RIGHT_LIGHTSENSOR, BACK_LEFT_LIGHTSENSOR; CONTROL_SWITCH>>
         """
-        # Initialise the socket used by the publish thread
-        self.sock_publish = socket.socket(
-            socket.AF_INET, socket.SOCK_DGRAM  # Internet
-        )  # UDP
-        while self.publish_continue is True:
-            while self.publish_continue is True:
-                try:
-                    ir_left = self.ir_left_sensor.get_fixed_triggered(IR_MAX_RANGE)
-                    ir_right = self.ir_right_sensor.get_fixed_triggered(IR_MAX_RANGE)
-                    line_left = self.left_line_sensor.get_triggered()
-                    line_right = self.right_line_sensor.get_triggered()
-
-                    light_fl = int(self.light_frontleft_sensor.value)
-                    light_fr = int(self.light_frontright_sensor.value)
-                    light_bl = int(self.light_backleft_sensor.value)
-                    light_br = int(self.light_backright_sensor.value)
-
-                    message = "<<%s;%f;%d;%d;%d;%d;%d;%d;%d;%d;%d>>" % (
-                        self.robot_name,
-                        self.sonar_sensor.sonar_range,
-                        line_left,
-                        line_right,
-                        ir_left,
-                        ir_right,
-                        light_fl,
-                        light_fr,
-                        light_br,
-                        light_bl,
-                        self.control_switch_on,
-                    )
-                    self.sock_publish.sendto(
-                        message.encode("utf-8"), (UDP_IP, UDP_DATA_PORT)
-                    )
-                    updated_switch_finally = False
-                    time.sleep(PUBLISH_INTERVAL)
-                except Exception:
-                    pass
-            try:
-                # send again, once, to update the control switch
-                if updated_switch_finally is False:
-                    message = "<<%s;%f;%d;%d;%d;%d;%d;%d;%d;%d;%d>>" % (
-                        self.robot_name,
-                        self.sonar_sensor.sonar_range,
-                        line_left,
-                        line_right,
-                        ir_left,
-                        ir_right,
-                        light_fl,
-                        light_fr,
-                        light_br,
-                        light_bl,
-                        self.control_switch_on,
-                    )
-                    self.sock_publish.sendto(
-                        message.encode("utf-8"), (UDP_IP, UDP_DATA_PORT)
-                    )
-                    updated_switch_finally = True
-                    time.sleep(PUBLISH_INTERVAL)
-            except Exception:
-                pass
-        print("closing publish socket")
-        self.sock_publish.close()
-
-    def update_sensors(self, dt):
-        """Take a new reading for each sensor."""
-        self.sonar_sensor.update_sensor()
-        self.sonar_sensor.update(dt)
-        self.ir_left_sensor.update_sensor()
-        self.ir_right_sensor.update_sensor()
-        self.left_line_sensor.update_sensor()
-        self.right_line_sensor.update_sensor()
+        if values is None:
+            values = self.get_state_values()
+        return INITIO["state_message"] % ((self.robot_name,) + tuple(values))
+
+    def update_sensors(self, dt, due=None):
+        """Move the sonar servo and take a new reading for each sensor in due, the (type, name) of the sensors given by
+        the sensor scheduler, or for every sensor if due is None. The others keep their last reading, as do the sensors
+        for which neither the pose of the robot (and sonar servo) nor their map changed."""
+        for sonar in self.sonar_sensors:
+            sonar.update(dt)
+        pose = (self.x, self.y, self.rotation)
+        map_state = (pose, self.sonar_map.version)
+        line_state = (pose, self.line_sensor_map.get_state())
+        for (sensor_type, name), sensor in self.sensors.items():
+            if sensor_type == "sonar":
+                state = (map_state, sensor.rotation)
+            elif sensor_type == "ir":
+                state = map_state
+            elif sensor_type == "line":
+                state = line_state
+            else:
+                continue
+            if self.sensor_scheduler.needs_reading(due, (sensor_type, name), state):
+                sensor.update_sensor()
 
     #     def reset_angular_velocity(self, st):
     #         self.velocity_x = 0.0
@@ -392,13 +256,26 @@ class Initio(basicsprite.BasicSprite):
         """Update the state of the robot. This updates the velocity of the robot based on the current velocity commands
         self.vx and self.vth. Also updates the position of the sonar sensor sprite accordingly. This function will not
         update the robots state if the robot is currently being moved by the user (via mouse drag)."""
-        super(Initio, self).update(dt)
+        sensors_due = self.sensor_scheduler.due()
+        if not self.mouse_move_state and dt > 0:
+            # drive along the arc of the current commands, the velocity is the chord of the arc over the step
+            x, y, _ = src.kinematics.integrate_arc(
+                self.x,
+                self.y,
+                -math.radians(self.rotation),
+                self.vx,
+                math.radians(self.vth),
+                dt,
+            )
+            self.velocity_x = (x - self.x) / dt
+            self.velocity_y = (y - self.y) / dt
+        super(Initio, self).update(dt, self.obstacles)
         if not self.mouse_move_state:
-            angle_radians = -math.radians(self.rotation)
-            self.velocity_x = self.vx * math.cos(angle_radians)
-            self.velocity_y = self.vx * math.sin(angle_radians)
             self.rotation -= self.vth * dt
-            self.update_sensors(dt)
+            self.mounts.update_from(self)
+            self.update_sensors(dt, sensors_due)
+        # consume commands and publish the state when they are due in simulated time
+        self.link.update()
         # self.sonar_sensor.update(dt)
         # self.ir_left_sensor.update_sensor()
         # self.ir_right_sensor.update_sensor()
@@ -428,16 +305,6 @@ class Initio(basicsprite.BasicSprite):
         #         py = self.y + self.image.height / 2
         #    simulator.light_follow_mouse(px, py)
 
-    def robot_collides_with(self, other_object):
-        """Collision checking between the robot and another object. This function uses ver simple radius based collision
-        detection."""
-        # Calculate distance between object centers that would be a collision,
-        # assuming square resources
-        collision_distance = self.image.width / 2.0 + other_object.image.width / 3.0
-        # Get distance using position tuples
-        actual_distance = src.util.distance(self.position, other_object.position)
-        return actual_distance <= collision_distance
-
     def get_shining_light(self):
         """Checks if there is a light source in the world and returns it"""
         if self.static_objects is not None:
@@ -0,0 +1,62 @@
+"""
+linkserver.py runs the single asyncio event loop which does the networking of every robot link of the simulator. The
+loop runs on one daemon thread, started when the first link is opened, and serves all robots through their datagram
+endpoints and shared memory channels, so hosting more robots adds no threads.
+
+The simulation thread hands work to the loop with call() and submit(), the loop itself must never block. stop() closes
+every link still open and then stops the loop.
+"""
+import asyncio
+import threading
+
+
+class LinkServer(object):
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        # links opened and not yet closed, closed by stop()
+        self.links = set()
+        # endpoints shared by the links, by host and ports, see robotlink.py
+        self.endpoints = {}
+        self.thread = threading.Thread(target=self.run, name="link-server")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        """Thread function running the event loop until stop() is called."""
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def call(self, callback, *args):
+        """Schedules a plain function to run on the loop, from any thread."""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def submit(self, coroutine):
+        """Schedules a coroutine to run on the loop, from any thread, and returns a concurrent.futures.Future of its
+        result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def stop(self, timeout=1.0):
+        """Closes the links still open and stops the loop, waiting up to timeout seconds for it to finish."""
+        if not self.thread.is_alive():
+            return
+        self.submit(self.close_links()).result(timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+
+    async def close_links(self):
+        for link in list(self.links):
+            link.close()
+
+
+server = None
+
+
+def get_server():
+    """Returns the link server of the process, starting it on first use."""
+    global server
+    if server is None or not server.thread.is_alive():
+        server = LinkServer()
+    return server
@@ -1,15 +1,13 @@
 """
 pi2go.py is a subclass of BasicSprite and creates a simulated PI2GO robot
-with appropriate sensros. This module also handles communication between
-the simulator and any external scripts. Communicate is done via simple
-string messeages passed via UDP socket.
+with appropriate sensros. Communication between the simulator and any
+external scripts is handled by robotlink.py, this module provides the state
+and command messages which are passed via UDP socket.
 """
 
 import math
-import random
-import socket
-import time
 import pyglet
+import src.kinematics
 import src.resources
 import src.util
 import src.sensors.led as theled
@@ -17,33 +15,29 @@ from src.sensors.lightsensor import FixedLightSensor
 from src.sensors.led import FixedLED
 from src.sensors.distancesensors import FixedTransformDistanceSensor
 from src.sensors.linesensor import LineSensorMap, FixedLineSensor
+from src.sensors.mounts import MountTransform
+from src.sensors.scheduler import SensorScheduler
+from src.simclock import SimClock
 from src.sprites import basicsprite
-from .robotconstants import (
-    SONAR_BEAM_ANGLE,
-    SONAR_MAX_RANGE,
-    SONAR_MIN_RANGE,
-    IR_MAX_RANGE,
-    IR_MIN_RANGE,
-    UDP_COMMAND_PORT,
-    UDP_DATA_PORT,
-    UDP_IP,
-)
-
-import threading
+from .robotlink import RobotLink
+from .robotconstants import LIGHT_SENSOR_COLOURS
+from .robotspecs import PI2GO, state_values
 
-# Constants specific to the PI2GO robot.
+# Constants specific to the PI2GO robot, the sensor layout is described in robotspecs.py.
 
-IR_SENSOR_ANGLE = 0.785
-IR_OFFSET_X_MIDDLE = 52
-IR_OFFSET_X = 33
-IR_OFFSET_Y = 21
-LINE_OFFSET_X = 40
-LINE_OFFSET_Y = 14
-SONAR_OFFSET_X = 50
 LED_INIT_FLASH_COUNT = 5
-
-READ_INTERVAL = 0.01
-PUBLISH_INTERVAL = 0.03
+NUM_COMMAND_VALUES = 26
+# the LEDs in the order of their red, green and blue values in the command message, which is fixed by the protocol
+COMMAND_LEDS = (
+    "front1",
+    "front2",
+    "right1",
+    "right2",
+    "back1",
+    "back2",
+    "left1",
+    "left2",
+)
 
 
 class Pi2Go(basicsprite.BasicSprite):
@@ -51,9 +45,15 @@ class Pi2Go(basicsprite.BasicSprite):
         self.sonar_map = kwargs.pop("sonar_map")
         line_map_sprite = kwargs.pop("line_map_sprite")
         self.static_objects = kwargs.pop("static_objects")
+        # spatial hash of the objects the robot collides with
+        self.obstacles = kwargs.pop("obstacles", None)
         batch = kwargs.pop("batch")
         window_width = kwargs.pop("window_width")
         window_height = kwargs.pop("window_height")
+        self.clock = kwargs.pop("clock", None)
+        if self.clock is None:
+            self.clock = SimClock()
+        self.sensor_scheduler = SensorScheduler(self.clock, PI2GO["sensor_rates"])
 
         robot_group = pyglet.graphics.Group(1)
 
@@ -72,123 +72,28 @@ class Pi2Go(basicsprite.BasicSprite):
         self.group = robot_group
         self.robot_name = "PI2GO"
         self.radius = max(self.image.width, self.image.height) / 2.0
-
-        x_light_offset = self.image.width / 2
-        y_light_offset = self.image.height / 2
-
-        self.sonar_sensor = FixedTransformDistanceSensor(
-            self,
-            self.sonar_map,
-            SONAR_OFFSET_X,
-            0,
-            0,
-            SONAR_MIN_RANGE,
-            SONAR_MAX_RANGE,
-            SONAR_BEAM_ANGLE,
-        )
-
-        self.ir_left_sensor = FixedTransformDistanceSensor(
-            self,
-            self.sonar_map,
-            IR_OFFSET_X,
-            IR_OFFSET_Y,
-            IR_SENSOR_ANGLE,
-            IR_MIN_RANGE,
-            IR_MAX_RANGE,
-            0.25,
-        )
-
-        self.ir_middle_sensor = FixedTransformDistanceSensor(
-            self,
-            self.sonar_map,
-            IR_OFFSET_X_MIDDLE,
-            0,
-            0,
-            IR_MIN_RANGE,
-            IR_MAX_RANGE,
-            0.25,
-        )
-
-        self.ir_right_sensor = FixedTransformDistanceSensor(
-            self,
-            self.sonar_map,
-            IR_OFFSET_X,
-            -IR_OFFSET_Y,
-            -IR_SENSOR_ANGLE,
-            IR_MIN_RANGE,
-            IR_MAX_RANGE,
-            0.25,
-        )
-
-        self.light_frontleft_sensor = FixedLightSensor(
-            self,
-            x_light_offset,
-            y_light_offset - 10,
-            "FrontLeft",
-            drawing_colour=(255, 0, 0, 255),
-        )
-        self.light_frontright_sensor = FixedLightSensor(
-            self,
-            x_light_offset,
-            -y_light_offset + 10,
-            "FrontRight",
-            drawing_colour=(0, 255, 0, 255),
-        )
-        self.light_backleft_sensor = FixedLightSensor(
-            self,
-            -x_light_offset,
-            y_light_offset - 10,
-            "BackLeft",
-            drawing_colour=(0, 0, 255, 255),
-        )
-        self.light_backright_sensor = FixedLightSensor(
-            self,
-            -x_light_offset,
-            -y_light_offset + 10,
-            "BackRight",
-            drawing_colour=(255, 255, 255, 255),
-        )
-
-        self.light_sensors = []
-        self.light_sensors.append(self.light_frontleft_sensor)
-        self.light_sensors.append(self.light_frontright_sensor)
-        self.light_sensors.append(self.light_backleft_sensor)
-        self.light_sensors.append(self.light_backright_sensor)
-
-        # add the LEDs - radius of the light is 10, a gap of 3 is added between neighbouring leds
-        # left side leds
-        self.left_led1 = FixedLED(self, 1, y_light_offset - 22, "left_led1")
-        self.left_led2 = FixedLED(self, 12, y_light_offset - 22, "left_led2")
-
-        # right side leds
-        self.right_led1 = FixedLED(self, 1, -y_light_offset + 22, "right_led1")
-        self.right_led2 = FixedLED(self, 12, -y_light_offset + 22, "right_led2")
-
-        # front side leds
-        self.front_led1 = FixedLED(self, x_light_offset - 17, -15, "front_led1")
-        self.front_led2 = FixedLED(self, x_light_offset - 17, +15, "front_led2")
-
-        # back side leds
-        self.back_led1 = FixedLED(self, -x_light_offset + 10, -10, "back_led1")
-        self.back_led2 = FixedLED(self, -x_light_offset + 10, +10, "back_led2")
-
-        self.leds = []
-        self.leds.append(self.left_led1)
-        self.leds.append(self.left_led2)
-        self.leds.append(self.right_led1)
-        self.leds.append(self.right_led2)
-        self.leds.append(self.front_led1)
-        self.leds.append(self.front_led2)
-        self.leds.append(self.back_led1)
-        self.leds.append(self.back_led2)
+        self.collision_radius = PI2GO["collision_radius"]
+        self.object_collision_scale = PI2GO["object_collision_scale"]
+        # mount points of the sensors and LEDs, transformed once per pose of the robot
+        self.mounts = MountTransform()
 
         self.line_sensor_map = LineSensorMap(line_map_sprite)
-        self.left_line_sensor = FixedLineSensor(
-            self, self.line_sensor_map, LINE_OFFSET_X, LINE_OFFSET_Y
-        )
-        self.right_line_sensor = FixedLineSensor(
-            self, self.line_sensor_map, LINE_OFFSET_X, -LINE_OFFSET_Y
-        )
+        # the sensors and LEDs of the robot definition keyed by their (type, name), as are the fields of the state
+        # message and the rates of the sensor scheduler
+        self.sensors = {}
+        for (sensor_type, name), mount in PI2GO["mounts"].items():
+            if sensor_type == "line":
+                sensor = FixedLineSensor(self, self.line_sensor_map, *mount)
+            elif sensor_type == "light":
+                colour = LIGHT_SENSOR_COLOURS.get(name, (255, 255, 255, 255))
+                sensor = FixedLightSensor(self, *mount, name, drawing_colour=colour)
+            elif sensor_type == "led":
+                sensor = FixedLED(self, *mount, name)
+            else:
+                sensor = FixedTransformDistanceSensor(self, self.sonar_map, *mount)
+            self.sensors[(sensor_type, name)] = sensor
+        self.light_sensors = self.of_type("light")
+        self.leds = self.of_type("led")
 
         self.mouse_move_state = False
         self.mouse_position = [0, 0]
@@ -196,9 +101,6 @@ class Pi2Go(basicsprite.BasicSprite):
         self.vx = 0.0
         self.vth = 0.0
 
-        self.publish_continue = True
-        self.receive_continue = True
-
         self.led_init_anim_on = True
         self.led_init_anim_count = 0
         self.leds_prev_values = []
@@ -208,19 +110,21 @@ class Pi2Go(basicsprite.BasicSprite):
 
         self.event_handlers = [self, self.on_mouse_release, self.on_mouse_drag]
 
-        self.publish_thread = threading.Thread(target=self.publish_state_udp)
-        # self.publish_thread.setDaemon(True)
-        self.publish_thread.start()
-
-        self.cmd_thread = threading.Thread(target=self.recv_commands)
-        # self.cmd_thread.setDaemon(True)
-        self.cmd_thread.start()
+        # handles the UDP communication with the external script
+        self.link = RobotLink(self, self.clock, NUM_COMMAND_VALUES)
 
         # pyglet.clock.schedule_interval(self.update_sensors, 1.0 / 30)
 
+    def of_type(self, sensor_type):
+        """Returns the sensors or LEDs of a type, in the order of the robot definition."""
+        return [
+            sensor
+            for (other, _), sensor in self.sensors.items()
+            if other == sensor_type
+        ]
+
     def start_robot(self):
-        self.publish_continue = True
-        self.receive_continue = True
+        self.link.start()
         # reset the movement values
         self.velocity_x = 0.0
         self.velocity_y = 0.0
@@ -232,14 +136,12 @@ class Pi2Go(basicsprite.BasicSprite):
         # pyglet.clock.unschedule(self.stop_robot_movement)
 
     def stop_robot(self):
-        # cause the publish and command threads to stop
-        self.publish_continue = False
-        self.receive_continue = False
+        # send the last state and close the link
         self.control_switch_on = False
+        self.link.stop()
         self.turn_off_leds()
         # stop movement
         # pyglet.clock.unschedule(self.stop_robot_movement)
-        time.sleep(0.3)
         # # stop robot movement using a background thread - the target method is called continually when the robot control switch is OFF
         # stop_movement_thread = threading.Thread(target=pyglet.clock.schedule_interval, args=(self.stop_robot_movement, 1.0 / 30))
         # stop_movement_thread.setDaemon(True)
@@ -285,9 +187,9 @@ class Pi2Go(basicsprite.BasicSprite):
                     [led.red_value, led.green_value, led.blue_value]
                 )
                 # animate the leds with random values of light
-                led.red_value = int(random.uniform(0, theled.MAX_VALUE))
-                led.green_value = int(random.uniform(0, theled.MAX_VALUE))
-                led.blue_value = int(random.uniform(0, theled.MAX_VALUE))
+                led.red_value = int(self.clock.rng.uniform(0, theled.MAX_VALUE))
+                led.green_value = int(self.clock.rng.uniform(0, theled.MAX_VALUE))
+                led.blue_value = int(self.clock.rng.uniform(0, theled.MAX_VALUE))
             self.light_leds()
         elif self.led_init_anim_on == False:
             for id, led in enumerate(self.leds):
@@ -321,8 +223,8 @@ class Pi2Go(basicsprite.BasicSprite):
     #    self.perform_led_init_animation()
     #    self.light_leds()
 
-    def recv_commands(self):
-        """Thread function which handles incomming commands for an external python script via a UDP socket.
+    def apply_command(self, values_list):
+        """Applies a command received from an external python script.
 
         Commands are strings and take the form: <<LINEAR_VELOCITY;ANGULAR_VELOCITY;
         FRONT_LED1_RED_VALUE;FRONT_LED1_GREEN_VALUE;FRONT_LED1_BLUE_VALUE;
@@ -334,214 +236,58 @@ class Pi2Go(basicsprite.BasicSprite):
         RIGHT_LED1_RED_VALUE;RIGHT_LED1_GREEN_VALUE;RIGHT_LED1_BLUE_VALUE;
         RIGHT_LED2_RED_VALUE;RIGHT_LED2_GREEN_VALUE;RIGHT_LED2_BLUE_VALUE>>
         """
-        self.sock_recv = socket.socket(
-            socket.AF_INET, socket.SOCK_DGRAM  # Internet
-        )  # UDP
-        self.sock_recv.bind((UDP_IP, UDP_COMMAND_PORT))
-        self.sock_recv.settimeout(1)
-
-        #  double loop is a hack - changing while True to while self.receive_continue while debugging
-        while self.receive_continue is True:
-            while self.receive_continue is True:
-                try:
-                    data_e, addr = self.sock_recv.recvfrom(
-                        1024
-                    )  # buffer size is 1024 bytes
-                    data = data_e.decode()
-                    if data.startswith("<<") and data.endswith(">>"):
-                        data = data.replace("<<", "")
-                        data = data.replace(">>", "")
-                        values_list = data.split(";")
-                        #  print (data);
-                        if len(values_list) == 26:
-                            self.vx = float(values_list[0])
-                            self.vth = float(values_list[1])
-                            if self.vx == 0 and self.vth != 0:
-                                self.is_rotating = True
-                            else:
-                                self.is_rotating = False
-
-                            self.front_led1.red_value = values_list[2]
-                            self.front_led1.green_value = values_list[3]
-                            self.front_led1.blue_value = values_list[4]
-                            self.front_led2.red_value = values_list[5]
-                            self.front_led2.green_value = values_list[6]
-                            self.front_led2.blue_value = values_list[7]
-
-                            self.right_led1.red_value = values_list[8]
-                            self.right_led1.green_value = values_list[9]
-                            self.right_led1.blue_value = values_list[10]
-                            self.right_led2.red_value = values_list[11]
-                            self.right_led2.green_value = values_list[12]
-                            self.right_led2.blue_value = values_list[13]
-
-                            self.back_led1.red_value = values_list[14]
-                            self.back_led1.green_value = values_list[15]
-                            self.back_led1.blue_value = values_list[16]
-                            self.back_led2.red_value = values_list[17]
-                            self.back_led2.green_value = values_list[18]
-                            self.back_led2.blue_value = values_list[19]
-
-                            self.left_led1.red_value = values_list[20]
-                            self.left_led1.green_value = values_list[21]
-                            self.left_led1.blue_value = values_list[22]
-                            self.left_led2.red_value = values_list[23]
-                            self.left_led2.green_value = values_list[24]
-                            self.left_led2.blue_value = values_list[25]
-                except Exception:
-                    pass
-            time.sleep(READ_INTERVAL)
-            # we need to call stop_robot() again since the values for vx and vth and velocities may
-            # already have been reinstated by an update from the client just before the inner while loop
-            # above stopped (due to self.receive_continue being set to false)
-            # self.stop_robot()
-        print("closing receive socket\n")
-        self.sock_recv.close()
-
-    def publish_state_udp(self):
-        """Thread function which publishes the state of the robot to an external python script via UDP socket.
-
-        State strings take the form:
-        <<ROBOT_NAME;SONAR_RANGE;LEFT_LINE;RIGHT_LINE;LEFT_IR;RIGHT_IR;
+        self.vx = float(values_list[0])
+        self.vth = float(values_list[1])
+        if self.vx == 0 and self.vth != 0:
+            self.is_rotating = True
+        else:
+            self.is_rotating = False
+
+        for i, name in enumerate(COMMAND_LEDS):
+            self.sensors[("led", name)].set_colour(*values_list[2 + 3 * i : 5 + 3 * i])
+
+    def get_state_values(self):
+        """Returns the values of the state message published to an external python script, in the order described by
+        get_state_message() and without the robot name."""
+        return state_values(PI2GO["state_fields"], self.sensors, self.control_switch_on)
+
+    def get_state_message(self, values=None):
+        """Returns the state message published to an external python script, built from values as returned by
+        get_state_values(), the current state if values is None.
+
+        State strings take the form <<ROBOT_NAME;...>> with the fields of PI2GO["state_fields"], by default:
+        <<ROBOT_NAME;SONAR_RANGE;LEFT_LINE;RIGHT_LINE;LEFT_IR;MIDDLE_IR;RIGHT_IR;
           FRONT_LEFT_LIGHTSENSOR; FRONT_RIGHT_LIGHTSENSOR;
           BACK_RIGHT_LIGHTSENSOR; BACK_LEFT_LIGHTSENSOR;
           FRONT_LED1_RED_VALUE;FRONT_LED1_GREEN_VALUE;FRONT_LED1_BLUE_VALUE;
           FRONT_LED2_RED_VALUE;FRONT_LED2_GREEN_VALUE;FRONT_LED2_BLUE_VALUE;
           BACK_LED1_RED_VALUE;BACK_LED1_GREEN_VALUE;BACK_LED1_BLUE_VALUE;
           BACK_LED2_RED_VALUE;BACK_LED2_GREEN_VALUE;BACK_LED2_BLUE_VALUE;
-          LEFT_LED1_RED_VALUE;LEFT_LED1_GREEN_VALUE;LEFT_LED1_BLUE_VALUE;
-          LEFT_LED2_RED_VALUE;LEFT_LED2_GREEN_VALUE;LEFT_LED2_BLUE_VALUE;
           RIGHT_LED1_RED_VALUE;RIGHT_LED1_GREEN_VALUE;RIGHT_LED1_BLUE_VALUE;
-          RIGHT_LED2_RED_VALUE;RIGHT_LED2_GREEN_VALUE;RIGHT_LED2_BLUE_VALUE; CONTROL_SWITCH>>
+          RIGHT_LED2_RED_VALUE;RIGHT_LED2_GREEN_VALUE;RIGHT_LED2_BLUE_VALUE;
+          LEFT_LED1_RED_VALUE;LEFT_LED1_GREEN_VALUE;LEFT_LED1_BLUE_VALUE;
+          LEFT_LED2_RED_VALUE;LEFT_LED2_GREEN_VALUE;LEFT_LED2_BLUE_VALUE; CONTROL_SWITCH>>
         """
-        self.sock_publish = socket.socket(
-            socket.AF_INET, socket.SOCK_DGRAM  # Internet
-        )  # UDP
-        while self.publish_continue is True:
-            while self.publish_continue is True:
-                ir_left = self.ir_left_sensor.get_fixed_triggered(IR_MAX_RANGE)
-                ir_mid = self.ir_middle_sensor.get_fixed_triggered(IR_MAX_RANGE)
-                ir_right = self.ir_right_sensor.get_fixed_triggered(IR_MAX_RANGE)
-                line_left = self.left_line_sensor.get_triggered()
-                line_right = self.right_line_sensor.get_triggered()
-
-                light_fl = int(self.light_frontleft_sensor.value)
-                light_fr = int(self.light_frontright_sensor.value)
-                light_bl = int(self.light_backleft_sensor.value)
-                light_br = int(self.light_backright_sensor.value)
-
-                message = (
-                    "<<%s;%f;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d>>"
-                    % (
-                        self.robot_name,
-                        self.sonar_sensor.get_distance(),
-                        line_left,
-                        line_right,
-                        ir_left,
-                        ir_mid,
-                        ir_right,
-                        light_fl,
-                        light_fr,
-                        light_br,
-                        light_bl,
-                        int(self.front_led1.red_value),
-                        int(self.front_led1.green_value),
-                        int(self.front_led1.blue_value),
-                        int(self.front_led2.red_value),
-                        int(self.front_led2.green_value),
-                        int(self.front_led2.blue_value),
-                        int(self.back_led1.red_value),
-                        int(self.back_led1.green_value),
-                        int(self.back_led1.blue_value),
-                        int(self.back_led2.red_value),
-                        int(self.back_led2.green_value),
-                        int(self.back_led2.blue_value),
-                        int(self.right_led1.red_value),
-                        int(self.right_led1.green_value),
-                        int(self.right_led1.blue_value),
-                        int(self.right_led2.red_value),
-                        int(self.right_led2.green_value),
-                        int(self.right_led2.blue_value),
-                        int(self.left_led1.red_value),
-                        int(self.left_led1.green_value),
-                        int(self.left_led1.blue_value),
-                        int(self.left_led2.red_value),
-                        int(self.left_led2.green_value),
-                        int(self.left_led2.blue_value),
-                        int(self.control_switch_on),
-                    )
-                )
-                try:
-                    self.sock_publish.sendto(
-                        message.encode("utf-8"), (UDP_IP, UDP_DATA_PORT)
-                    )
-                    updated_switch_finally = False
-                    time.sleep(PUBLISH_INTERVAL)
-                except Exception:
-                    pass
-            # send again, once, to update the control switch
-            if updated_switch_finally is False:
-                message = (
-                    "<<%s;%f;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d;%d>>"
-                    % (
-                        self.robot_name,
-                        self.sonar_sensor.get_distance(),
-                        line_left,
-                        line_right,
-                        ir_left,
-                        ir_mid,
-                        ir_right,
-                        light_fl,
-                        light_fr,
-                        light_br,
-                        light_bl,
-                        int(self.front_led1.red_value),
-                        int(self.front_led1.green_value),
-                        int(self.front_led1.blue_value),
-                        int(self.front_led2.red_value),
-                        int(self.front_led2.green_value),
-                        int(self.front_led2.blue_value),
-                        int(self.back_led1.red_value),
-                        int(self.back_led1.green_value),
-                        int(self.back_led1.blue_value),
-                        int(self.back_led2.red_value),
-                        int(self.back_led2.green_value),
-                        int(self.back_led2.blue_value),
-                        int(self.right_led1.red_value),
-                        int(self.right_led1.green_value),
-                        int(self.right_led1.blue_value),
-                        int(self.right_led2.red_value),
-                        int(self.right_led2.green_value),
-                        int(self.right_led2.blue_value),
-                        int(self.left_led1.red_value),
-                        int(self.left_led1.green_value),
-                        int(self.left_led1.blue_value),
-                        int(self.left_led2.red_value),
-                        int(self.left_led2.green_value),
-                        int(self.left_led2.blue_value),
-                        int(self.control_switch_on),
-                    )
-                )
-                try:
-                    print(message)
-                    self.sock_publish.sendto(
-                        message.encode("utf-8"), (UDP_IP, UDP_DATA_PORT)
-                    )
-                    updated_switch_finally = True
-                    time.sleep(PUBLISH_INTERVAL)
-                except Exception:
-                    pass
-        print("closing publish socket\n")
-        self.sock_publish.close()
-
-    def update_sensors(self):
-        """Take a new reading for each sensor."""
-        self.sonar_sensor.update_sensor()
-        self.ir_left_sensor.update_sensor()
-        self.ir_middle_sensor.update_sensor()
-        self.ir_right_sensor.update_sensor()
-        self.left_line_sensor.update_sensor()
-        self.right_line_sensor.update_sensor()
+        if values is None:
+            values = self.get_state_values()
+        return PI2GO["state_message"] % ((self.robot_name,) + tuple(values))
+
+    def update_sensors(self, due=None):
+        """Take a new reading for each sensor in due, the (type, name) of the sensors given by the sensor scheduler, or
+        for every sensor if due is None. The others keep their last reading, as do the sensors for which neither the
+        pose of the robot nor their map changed."""
+        pose = (self.x, self.y, self.rotation)
+        map_state = (pose, self.sonar_map.version)
+        line_state = (pose, self.line_sensor_map.get_state())
+        for (sensor_type, name), sensor in self.sensors.items():
+            if sensor_type in ("sonar", "ir"):
+                state = map_state
+            elif sensor_type == "line":
+                state = line_state
+            else:
+                continue
+            if self.sensor_scheduler.needs_reading(due, (sensor_type, name), state):
+                sensor.update_sensor()
 
     def update_light_sensors(self, simulator):
         """Updates the light sensors"""
@@ -565,19 +311,37 @@ class Pi2Go(basicsprite.BasicSprite):
         """Update the state of the robot. This updates the velocity of the robot based on the current velocity commands
         self.vx and self.vth. Also updates the position of the sonar sensor sprite accordingly. This function will not
         update the robots state if the robot is currently being moved by the user (via mouse drag)."""
+        sensors_due = self.sensor_scheduler.due()
+        if not self.mouse_move_state and dt > 0:
+            # drive along the arc of the current commands, the velocity is the chord of the arc over the step
+            x, y, _ = src.kinematics.integrate_arc(
+                self.x,
+                self.y,
+                -math.radians(self.rotation),
+                self.vx,
+                math.radians(self.vth),
+                dt,
+            )
+            self.velocity_x = (x - self.x) / dt
+            self.velocity_y = (y - self.y) / dt
         # Do all the normal physics stuff
-        super(Pi2Go, self).update(dt)
+        super(Pi2Go, self).update(dt, self.obstacles)
         if not self.mouse_move_state:
-            angle_radians = -math.radians(self.rotation)
-            self.velocity_x = self.vx * math.cos(angle_radians)
-            self.velocity_y = self.vx * math.sin(angle_radians)
             self.rotation -= self.vth * dt
-            self.update_sensors()
+            self.mounts.update_from(self)
+            self.update_sensors(sensors_due)
         # src.util.circle(self.left_line_sensor.sensor_x, self.left_line_sensor.sensor_y, 10, 10)
         # src.util.circle(30, 30, 30)
         # self.update_sensors
-        self.update_light_sensors(simulator)
+        light_state = self.get_light_state(simulator)
+        for sensor in self.light_sensors:
+            if self.sensor_scheduler.needs_reading(
+                sensors_due, ("light", sensor.name), light_state
+            ):
+                sensor.update_sensor(simulator)
         self.light_leds()
+        # consume commands and publish the state when they are due in simulated time
+        self.link.update()
         # self.left_line_sensor.make_circle()
         # self.right_line_sensor.make_circle()
         # self.sonar_sensor.make_circle()
@@ -595,15 +359,19 @@ class Pi2Go(basicsprite.BasicSprite):
         #     else: py = self.y + self.image.height/2
         #     simulator.light_follow_mouse(px, py)
 
-    def robot_collides_with(self, other_object):
-        """Collision checking between the robot and another object. This function uses ver simple radius based collision
-        detection."""
-        # Calculate distance between object centers that would be a collision,
-        # assuming square resources
-        collision_distance = self.radius + other_object.image.width / 2.0
-        # Get distance using position tuples
-        actual_distance = src.util.distance(self.position, other_object.position)
-        return actual_distance <= collision_distance
+    def get_light_state(self, simulator):
+        """Returns everything the light sensor readings depend on, they only need a new reading when this changed."""
+        light = self.get_shining_light()
+        return (
+            self.x,
+            self.y,
+            self.rotation,
+            self.receiving_light_focus,
+            None if light is None else (light.x, light.y),
+            simulator.x_ray_end,
+            simulator.y_ray_end,
+            simulator.is_ray_being_dragged,
+        )
 
     def get_shining_light(self):
         """Checks if there is a light source in the world and returns it"""
@@ -3,9 +3,22 @@
 UDP_IP = "127.0.0.1"
 UDP_DATA_PORT = 5000
 UDP_COMMAND_PORT = 5001
+# also serve controllers on the same host through shared memory where available, see simclient/sharedmemory.py
+SHARED_MEMORY = True
 IR_MIN_RANGE = 5
 IR_MAX_RANGE = 35
 IR_BEAM_ANGLE = 0.25
 SONAR_MIN_RANGE = 5
 SONAR_MAX_RANGE = 1700
 SONAR_BEAM_ANGLE = 0.36
+READ_INTERVAL = 0.01
+PUBLISH_INTERVAL = 0.03
+# rates in readings per second at which the sensors are sampled, the last reading is kept in between
+SENSOR_RATES = {"sonar": 10.0, "ir": 50.0, "line": 100.0, "light": 50.0}
+# colours the light sensors of the robot definitions are drawn in, others are drawn in white
+LIGHT_SENSOR_COLOURS = {
+    "FrontLeft": (255, 0, 0, 255),
+    "FrontRight": (0, 255, 0, 255),
+    "BackLeft": (0, 0, 255, 255),
+    "BackRight": (255, 255, 255, 255),
+}
@@ -0,0 +1,642 @@
+"""
+robotlink.py handles the communication between a simulated robot and an external python script. The state of the
+robot is published to the script and commands are received from it as messages passed via UDP. The robot itself only
+has to provide get_state_message(), get_state_values() and apply_command(values_list).
+
+All the links of a simulator share one RobotEndpoint: a single socket, a datagram endpoint of the event loop run by
+linkserver.py, so hosting more robots adds neither sockets nor threads. Every link is given a robot id, 0 for the first
+one, and binary commands are passed to the link of the robot id in their header. Commands are decoded and handled on
+the loop as they arrive, the simulation thread hands the messages to send over to it.
+
+At the end of every simulation step each link reports the snapshot it publishes to the endpoint, which sends the states
+of all its robots together once every link has reported: the binary state messages going to the same client are batched
+into as few datagrams of at most protocol.MAX_DATAGRAM_SIZE as they fit in.
+
+The host and ports come from robotconstants, the environment or configure(), see simclient/discovery.py. The endpoint
+binds its command port, 0 picking a free one, and announces the port it bound for clients to discover. The state of a
+robot is sent to the address its client said hello from. The state of robot 0 is also sent on its own to the data port,
+unless that is 0, for clients which never say hello.
+
+Messages are either simple strings of the form <<VALUE1;VALUE2;...>> or their binary form defined by
+simclient/protocol.py. The state is published as text until the script sends a binary command, from then on it is
+published in binary too, so scripts using an older client which only speaks text keep working. Text messages carry no
+robot id, so they only ever address robot 0, the other robots always publish binary messages.
+
+Where shared memory is available each link also serves the shared memory transport of simclient/sharedmemory.py, with
+channels of its own named by the command port and robot id: the event loop reads commands from the command channel
+when it is woken up, and once a client has said hello through it every state message is written to the state channel
+in binary as well. Clients on the same host use it instead of the sockets.
+
+The robot calls update() at the end of every simulation step, which takes a snapshot of its state: an immutable
+StateSnapshot holding the values of get_state_values(). Messages are only ever built from a snapshot, never from the
+sensors themselves, so a message cannot mix readings from two different steps.
+
+Commands are never queued. Each command received replaces the one waiting to be applied, so after a hitch only the
+newest is applied rather than a backlog of outdated ones, and a binary command older by its sequence number than one
+already received is discarded, until a client says hello again. The link counts the commands received, dropped
+unapplied and discarded as stale.
+
+In real time mode each new snapshot is sent once, as soon as it is taken, and the newest command is applied at the end
+of every step. In fixed step mode both are driven by simulated time instead: the newest command is applied at every
+command interval and the snapshot is published every PUBLISH_INTERVAL of simulated time.
+
+In lockstep mode every step ends with an exchange with the controller: the state is published tagged with the step
+number as an extra last value, <<...;STEP>>, and the simulation does not advance to the next step until the controller
+answers with a command tagged with the same step number, which is applied before that step. Binary messages carry the
+step number in their header instead. The state of step 0 is exchanged before the first step, so the simulation waits
+for a controller to start. A state left unanswered for LOCKSTEP_TIMEOUT is sent again, for a controller which only
+just said hello or whose answer was lost, the simulation never steps without an answer. Lockstep states are sent by
+each link straight away rather than batched, as the simulation waits for the answer before the next link reports.
+"""
+
+import asyncio
+import collections
+import threading
+import time
+
+from simclient import discovery, protocol, sharedmemory
+from . import linkserver
+from .robotconstants import (
+    PUBLISH_INTERVAL,
+    READ_INTERVAL,
+    SHARED_MEMORY,
+    UDP_COMMAND_PORT,
+    UDP_DATA_PORT,
+    UDP_IP,
+)
+
+LOCKSTEP_TIMEOUT = 1.0  # seconds after which an unanswered lockstep state is sent again
+# seconds the simulation thread waits for a lockstep answer at a time, so the window stays responsive meanwhile
+LOCKSTEP_WAIT = 0.05
+STOP_TIMEOUT = 1.0  # seconds to wait for the last state to be sent on stop
+# commands up to this many behind the newest are stale, those further behind come from a client which restarted
+STALE_WINDOW = 64
+
+# the state of a robot at the end of a simulation step, tick counts the snapshots taken by a link
+StateSnapshot = collections.namedtuple("StateSnapshot", "tick values")
+
+# host and ports used by the links opened from now on
+settings = {
+    "host": UDP_IP,
+    "command_port": UDP_COMMAND_PORT,
+    "data_port": UDP_DATA_PORT,
+}
+
+
+def configure(host=None, command_port=None, data_port=None):
+    """Sets the host and ports of the links opened from now on, None keeps the current value. A command port of 0 lets
+    the operating system pick a free port, a data port of 0 sends the state only to clients which said hello."""
+    for name, value in (
+        ("host", host),
+        ("command_port", command_port),
+        ("data_port", data_port),
+    ):
+        if value is not None:
+            settings[name] = value
+
+
+configure(*discovery.environment_settings())
+
+
+def decode_message(data_e, size=None):
+    """Decodes a message of the form <<VALUE1;VALUE2;...>> and returns the list of values, or None if the data is not
+    a valid message. size is the number of bytes of data holding the message, all of them if None."""
+    if size is not None:
+        data_e = bytes(data_e[:size])
+    data = data_e.decode()
+    if data.startswith("<<") and data.endswith(">>"):
+        data = data.replace("<<", "")
+        data = data.replace(">>", "")
+        return data.split(";")
+    return None
+
+
+def tag_message(message, step):
+    """Appends the step number to a message of the form <<VALUE1;VALUE2;...>>."""
+    return "%s;%d>>" % (message[:-2], step)
+
+
+class CommandProtocol(asyncio.DatagramProtocol):
+    def __init__(self, endpoint):
+        """Receives the commands for the links of an endpoint on the event loop."""
+        self.endpoint = endpoint
+
+    def datagram_received(self, data, addr):
+        try:
+            self.endpoint.receive(data, addr)
+        except Exception:
+            pass
+
+
+class RobotEndpoint(object):
+    def __init__(self, server, host, command_port, data_port):
+        """The socket shared by the links of a simulator, see the module description. Endpoints are created and used by
+        the links on the event loop, see get_endpoint()."""
+        self.server = server
+        self.host = host
+        self.command_port = command_port
+        # command port asked for by the settings, which the endpoint is found by, command_port is the one bound
+        self.requested_port = command_port
+        self.data_port = data_port
+        # links served, by robot id
+        self.links = {}
+        self.transport = None
+        self.announcement = None
+        self.opening = None
+        self.closed = False
+
+        # links which have reported since the states were last sent, and the (link, snapshot, step) they publish
+        self.report_lock = threading.Lock()
+        self.reported = set()
+        self.pending = []
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: CommandProtocol(self), local_addr=(self.host, self.command_port)
+        )
+        # the port actually bound, when asked for any free one
+        self.command_port = self.transport.get_extra_info("sockname")[1]
+
+    def add(self, link, robot_id=None):
+        """Serves a link as the robot robot_id, the lowest free id if None, and returns its id."""
+        if robot_id is None:
+            robot_id = 0
+            while robot_id in self.links:
+                robot_id += 1
+        elif robot_id in self.links:
+            raise ValueError("robot id %d is already in use" % robot_id)
+        self.links[robot_id] = link
+        self.announce()
+        return robot_id
+
+    def remove(self, link):
+        """Stops serving a link, the endpoint closes along with its last link."""
+        self.links.pop(link.robot_id, None)
+        with self.report_lock:
+            self.reported.discard(link)
+            if self.reported and len(self.reported) >= len(self.links):
+                self.flush_reported()
+        if self.links:
+            self.announce()
+        else:
+            self.close()
+
+    def announce(self):
+        robots = {
+            str(robot_id): link.robot.robot_name
+            for robot_id, link in self.links.items()
+        }
+        self.announcement = discovery.announce(
+            self.host, self.command_port, self.data_port, robots
+        )
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.server.endpoints.get(self.key()) is self:
+            del self.server.endpoints[self.key()]
+        if self.announcement is not None:
+            discovery.withdraw(self.announcement)
+        print("closing socket\n")
+        if self.transport is not None:
+            self.transport.close()
+
+    def key(self):
+        return (self.host, self.requested_port, self.data_port)
+
+    def receive(self, data, addr):
+        """Passes a datagram to the link of the robot it addresses, text commands address robot 0."""
+        link = self.links.get(protocol.message_robot_id(data))
+        if link is not None:
+            link.handle_command(link.read_command(data, addr=addr))
+
+    def addresses(self, link):
+        """Returns the addresses the state of a link is sent to."""
+        addresses = []
+        if link.client_address is not None:
+            addresses.append(link.client_address)
+        if (
+            link.robot_id == 0
+            and self.data_port
+            and (self.host, self.data_port) not in addresses
+        ):
+            # clients which never say hello listen on the data port, they only know of robot 0
+            addresses.append((self.host, self.data_port))
+        return addresses
+
+    def report(self, link, snapshot=None, step=None):
+        """Called by every link at the end of each simulation step with the snapshot it publishes, if any. Once every
+        link has reported, or one reports twice, the snapshots reported are sent together by the event loop."""
+        with self.report_lock:
+            if link in self.reported:
+                self.flush_reported()
+            self.reported.add(link)
+            if snapshot is not None:
+                self.pending.append((link, snapshot, step))
+            if len(self.reported) >= len(self.links):
+                self.flush_reported()
+
+    def flush_reported(self):
+        pending = self.pending
+        self.pending = []
+        self.reported = set()
+        if pending:
+            self.server.call(self.send, pending)
+
+    def send(self, items):
+        """Sends the state snapshots of links given as (link, snapshot, step), on the event loop. Binary messages going
+        to a client which said hello are batched, the other messages are sent on their own."""
+        if self.closed or self.transport is None:
+            return
+        batches = {}
+        for link, snapshot, step in items:
+            if link.closed:
+                continue
+            link.published_tick = snapshot.tick
+            addresses = self.addresses(link)
+            try:
+                if addresses:
+                    data = link.encode_state(snapshot, step)
+                    for address in addresses:
+                        if link.binary and address == link.client_address:
+                            batches.setdefault(address, []).append(data)
+                        else:
+                            self.sendto(data, address)
+                link.send_shared(snapshot, step)
+            except ValueError as e:
+                # a state which cannot be encoded is not sent, the states of the other robots still are
+                print("could not send the state of robot %d: %s\n" % (link.robot_id, e))
+        for address, messages in batches.items():
+            for datagram in protocol.batch(messages):
+                self.sendto(datagram, address)
+
+    def sendto(self, data, address):
+        try:
+            self.transport.sendto(data, address)
+        except Exception:
+            pass
+
+
+async def get_endpoint(server):
+    """Returns the endpoint serving the host and ports of the settings, opening it for the first link, on the event
+    loop."""
+    key = (settings["host"], settings["command_port"], settings["data_port"])
+    endpoint = server.endpoints.get(key)
+    if endpoint is None:
+        endpoint = RobotEndpoint(server, *key)
+        endpoint.opening = asyncio.ensure_future(endpoint.open())
+        server.endpoints[key] = endpoint
+    try:
+        await endpoint.opening
+    except OSError:
+        if server.endpoints.get(key) is endpoint:
+            del server.endpoints[key]
+        raise
+    return endpoint
+
+
+class RobotLink(object):
+    def __init__(self, robot, clock, num_command_values, robot_id=None):
+        """Links a robot to its script, as the robot robot_id of the endpoint, the lowest free id if None."""
+        self.robot = robot
+        self.clock = clock
+        self.num_command_values = num_command_values
+        self.model = protocol.MODELS.get(robot.robot_name)
+        self.robot_id = robot_id
+
+        # publish binary state messages, set once the script sends a binary command
+        self.binary = False
+        self.seq = 0
+
+        self.publish_continue = True
+        self.receive_continue = True
+
+        # latest state snapshot, replaced as a whole at the end of every step while the event loop sends the previous
+        # one, and the tick of the last snapshot sent
+        self.snapshot = None
+        self.published_tick = 0
+
+        # newest command received but not yet applied, the sequence number of the newest binary command received and
+        # the counts of commands received, replaced before they were applied and discarded as stale
+        self.command_lock = threading.Lock()
+        self.pending_command = None
+        self.command_seq = None
+        self.commands_received = 0
+        self.commands_dropped = 0
+        self.commands_stale = 0
+        self.command_interval = clock.interval(READ_INTERVAL)
+        self.publish_interval = clock.interval(PUBLISH_INTERVAL)
+
+        # newest command answering a lockstep frame as (step, values_list), the lockstep state published and not yet
+        # answered as (snapshot, step) and the time.monotonic() it was last sent
+        self.lockstep_condition = threading.Condition()
+        self.lockstep_command = None
+        self.lockstep_pending = None
+        self.lockstep_sent = 0.0
+
+        # address the client said hello from, where the state is sent, and whether a client said hello through the
+        # shared memory command channel, which has the state written to the state channel
+        self.client_address = None
+        self.shared_client = False
+        self.endpoint = None
+        self.shared_state = None
+        self.shared_command = None
+        self.shared_buffer = bytearray(sharedmemory.MAX_MESSAGE_SIZE)
+        self.closed = False
+
+        self.server = linkserver.get_server()
+        try:
+            self.server.submit(self.open()).result()
+        except OSError as e:
+            print("Could not open socket - is another simulator running? (%s)\n" % e)
+        else:
+            print(
+                "%s %d listening for commands on %s:%d\n"
+                % (
+                    robot.robot_name,
+                    self.robot_id,
+                    self.endpoint.host,
+                    self.endpoint.command_port,
+                )
+            )
+
+    async def open(self):
+        """Joins the endpoint and opens the shared memory channels of the link on the event loop."""
+        loop = asyncio.get_running_loop()
+        self.endpoint = await get_endpoint(self.server)
+        self.robot_id = self.endpoint.add(self, self.robot_id)
+        self.server.links.add(self)
+        # text messages have no robot id, the other robots only speak binary
+        self.binary = self.robot_id != 0
+        if SHARED_MEMORY and sharedmemory.is_available():
+            port = self.endpoint.command_port
+            self.shared_state = sharedmemory.Channel(
+                sharedmemory.channel_name(port, "state", self.robot_id),
+                writer=True,
+                create=True,
+            )
+            self.shared_command = sharedmemory.Channel(
+                sharedmemory.channel_name(port, "command", self.robot_id),
+                writer=False,
+                create=True,
+            )
+            loop.add_reader(self.shared_command.fileno(), self.read_shared_command)
+
+    def start(self):
+        self.publish_continue = True
+        self.receive_continue = True
+
+    def stop(self):
+        """Sends the state once more, to update the control switch, then closes the link. Returns once the event loop
+        has done both, or after STOP_TIMEOUT."""
+        if self.closed:
+            return
+        self.take_snapshot()
+        self.publish_continue = False
+        self.receive_continue = False
+        self.lockstep_pending = None
+        try:
+            self.server.submit(self.shutdown()).result(STOP_TIMEOUT)
+        except Exception:
+            pass
+
+    async def shutdown(self):
+        self.publish_latest()
+        self.close()
+
+    def close(self):
+        """Leaves the endpoint and closes the shared memory channels of the link, on the event loop."""
+        if self.closed:
+            return
+        self.closed = True
+        self.server.links.discard(self)
+        if self.endpoint is not None:
+            self.endpoint.remove(self)
+        if self.shared_command is not None:
+            self.server.loop.remove_reader(self.shared_command.fileno())
+            self.shared_command.close()
+        if self.shared_state is not None:
+            self.shared_state.close()
+
+    def read_shared_command(self):
+        """Handles the command written to the shared memory command channel, called by the event loop when the client
+        signals a new one. The first client to say hello is sent the latest state straight away, or the lockstep state
+        waiting for an answer."""
+        try:
+            size = self.shared_command.poll(self.shared_buffer)
+            if size is not None:
+                greeted = self.shared_client
+                self.handle_command(
+                    self.read_command(self.shared_buffer, size, shared=True)
+                )
+                if not greeted and self.shared_client:
+                    pending = self.lockstep_pending
+                    if pending is not None:
+                        self.send_shared(*pending)
+                    elif self.snapshot is not None:
+                        self.send_shared(self.snapshot)
+        except Exception:
+            pass
+
+    def handle_command(self, command):
+        """Passes on a command returned by read_command(): answers to a lockstep frame go to the waiting simulation
+        step, other commands replace the command waiting to be applied unless they are stale."""
+        if command is None:
+            return
+        step, values_list, seq = command
+        if step is not None:
+            # a command answering a lockstep frame, a late repeat of an older answer is ignored
+            with self.lockstep_condition:
+                if self.lockstep_command is None or step > self.lockstep_command[0]:
+                    self.lockstep_command = (step, values_list)
+                    self.lockstep_condition.notify_all()
+            return
+        with self.command_lock:
+            self.commands_received += 1
+            if seq is not None:
+                if self.command_seq is not None:
+                    behind = protocol.seq_difference(self.command_seq, seq)
+                    if 0 <= behind <= STALE_WINDOW:
+                        self.commands_stale += 1
+                        return
+                self.command_seq = seq
+            if self.pending_command is not None:
+                self.commands_dropped += 1
+            self.pending_command = values_list
+
+    def apply_pending_command(self):
+        """Applies the newest command received since the last one applied, if any, on the simulation thread."""
+        with self.command_lock:
+            command = self.pending_command
+            self.pending_command = None
+        if command is not None:
+            self.robot.apply_command(command)
+
+    def read_command(self, data_e, size=None, addr=None, shared=False):
+        """Decodes a text or binary command held by the first size bytes of data_e and returns (step, values, seq), the
+        values converted to numbers and clamped to the range of their field by protocol.clamp(), the step number being
+        None unless the command answers a lockstep frame and the sequence number None for text commands, or None if
+        the data is not a valid command for the robot. The format of the command also sets the
+        format of the state messages published from then on. A hello message sets the address the state is sent to,
+        addr being where it came from, or has the state written to the shared memory channel if shared is true, and
+        starts a new sequence of commands."""
+        if protocol.is_binary(data_e, size):
+            message = protocol.decode(data_e, size)
+            if message is None:
+                return None
+            header, values = message
+            if header.kind == protocol.HELLO:
+                if addr is not None:
+                    self.client_address = addr
+                if shared:
+                    self.shared_client = True
+                with self.command_lock:
+                    # a new client, which numbers its commands from the start
+                    self.command_seq = None
+                return None
+            if (
+                header.kind != protocol.COMMAND
+                or header.model != self.model
+                or header.robot_id != self.robot_id
+            ):
+                return None
+            try:
+                values = protocol.clamp(protocol.COMMAND, self.model, values)
+            except ValueError:
+                return None
+            self.binary = True
+            step = None if header.step == protocol.NO_STEP else header.step
+            return step, values, header.seq
+        values_list = decode_message(data_e, size)
+        if values_list is None or self.robot_id != 0:
+            return None
+        step = None
+        if len(values_list) == self.num_command_values + 1:
+            step = values_list.pop()
+        try:
+            if step is not None:
+                step = int(step)
+            values = protocol.clamp(protocol.COMMAND, self.model, values_list)
+        except ValueError:
+            return None
+        self.binary = False
+        return step, values, None
+
+    def take_snapshot(self):
+        """Records the state of the robot as a new snapshot. This is called by the simulation thread, between steps, so
+        all values come from the same step."""
+        values = tuple(self.robot.get_state_values())
+        tick = self.snapshot.tick + 1 if self.snapshot is not None else 1
+        self.snapshot = StateSnapshot(tick, values)
+        return self.snapshot
+
+    def encode_state(self, snapshot, step=None):
+        """Returns a state snapshot as a message in the format used by the script, tagged with the step number if
+        given."""
+        self.seq += 1
+        if self.binary:
+            return self.encode_binary_state(snapshot, step)
+        message = self.robot.get_state_message(snapshot.values)
+        if step is not None:
+            message = tag_message(message, step)
+        return message.encode("utf-8")
+
+    def publish_state(self, snapshot, step=None):
+        """Sends a state snapshot to the external script straight away, tagged with the step number if given. The
+        message is sent by the event loop, this can be called from any thread."""
+        self.server.call(self.endpoint.send, [(self, snapshot, step)])
+
+    def publish_latest(self):
+        """Sends the latest snapshot unless it has been sent already, on the event loop."""
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.tick != self.published_tick:
+            self.endpoint.send([(self, snapshot, None)])
+
+    def encode_binary_state(self, snapshot, step=None):
+        """Returns a state snapshot as a binary message, its values clamped to the range of their field."""
+        return protocol.encode(
+            protocol.STATE,
+            self.model,
+            protocol.clamp(protocol.STATE, self.model, snapshot.values),
+            robot_id=self.robot_id,
+            seq=self.seq,
+            step=step,
+        )
+
+    def send_shared(self, snapshot, step=None):
+        """Writes a state snapshot to the shared memory state channel once a client said hello through it, on the event
+        loop."""
+        if self.shared_state is not None and self.shared_client:
+            self.shared_state.send(self.encode_binary_state(snapshot, step))
+
+    def update(self):
+        """Applies the newest command, takes a snapshot of the state of the robot and has the event loop send it, or in
+        fixed step mode does both when they are due in simulated time. This is called at the end of every simulation
+        step."""
+        if self.endpoint is None:
+            return
+        if not self.clock.is_fixed_step():
+            self.apply_pending_command()
+            if self.publish_continue:
+                self.endpoint.report(self, self.take_snapshot())
+            return
+        if self.clock.is_lockstep() and self.publish_continue:
+            # the state is sent straight away and only the answer to it is applied, see exchange_lockstep()
+            self.endpoint.report(self)
+            self.exchange_lockstep(self.take_snapshot())
+            return
+        elif self.publish_continue and self.publish_interval.due():
+            self.endpoint.report(self, self.take_snapshot())
+        else:
+            self.endpoint.report(self)
+        if self.command_interval.due():
+            self.apply_pending_command()
+
+    def holds_step(self):
+        """Returns true while the simulation must not advance in lockstep mode, because the controller has not answered
+        the state of the last step yet. Before the first step the state of step 0 is published by the first call. The
+        simulator calls this before every step, each call waits up to LOCKSTEP_WAIT for the answer."""
+        if (
+            self.endpoint is None
+            or not self.publish_continue
+            or not self.clock.is_lockstep()
+        ):
+            return False
+        if self.lockstep_pending is not None:
+            return not self.await_lockstep()
+        if self.clock.step_count == 0:
+            return not self.exchange_lockstep(self.take_snapshot())
+        return False
+
+    def exchange_lockstep(self, snapshot):
+        """Publishes the snapshot tagged with the current step and waits for the matching command from the controller,
+        which is applied before the next step. Returns false if the controller has not answered yet, see
+        holds_step()."""
+        step = self.clock.step_count
+        self.lockstep_pending = (snapshot, step)
+        self.lockstep_sent = time.monotonic()
+        self.publish_state(snapshot, step)
+        return self.await_lockstep()
+
+    def await_lockstep(self):
+        """Waits up to LOCKSTEP_WAIT for the answer to the pending lockstep state and applies it, returning true once
+        it has been. The state is sent again if it has not been answered for LOCKSTEP_TIMEOUT."""
+        snapshot, step = self.lockstep_pending
+        with self.lockstep_condition:
+            answered = self.lockstep_condition.wait_for(
+                lambda: self.lockstep_command is not None
+                and self.lockstep_command[0] == step,
+                LOCKSTEP_WAIT,
+            )
+            command = self.lockstep_command[1] if answered else None
+        if not answered:
+            if time.monotonic() - self.lockstep_sent >= LOCKSTEP_TIMEOUT:
+                print("waiting for the lockstep controller to answer step %d\n" % step)
+                self.lockstep_sent = time.monotonic()
+                self.publish_state(snapshot, step)
+            return False
+        self.lockstep_pending = None
+        self.robot.apply_command(command)
+        return True
@@ -0,0 +1,207 @@
+"""
+robotspecs.py loads the robot definition files in the robots folder, which describe the body and sensor layout of each
+robot as plain data, shared by the pyglet robots and the headless batch environment. Offsets are in pixels from the
+centre of the robot with x pointing forwards, sensor rotations are in radians (counter clockwise).
+
+Each definition is also compiled into the sensor banks of the kinds of sensor the batch environment models, distance and
+line sensors, each holding the mounts of all sensors of that kind as arrays with one entry per sensor (struct of arrays) so that the batch sensor models can read all of them in one
+pass. A robot added to the robots folder is picked up by ROBOT_SPECS, and so by BatchEnv, without any code changes.
+
+Distance sensor mounts are (offset_x, offset_y, rotation, min_range, max_range, beam_angle), the same order as the
+arguments of FixedTransformDistanceSensor. Line sensor, light sensor and LED mounts are (offset_x, offset_y).
+
+The definition also sets the layout of the state message of the robot, see state_fields(), and the rate each sensor
+is sampled at, keyed by the (type, name) of the sensor like the state fields. The clients decode the state of the
+robots known to simclient/protocol.py with its fixed STATE_BODIES, so loading a definition of such a robot whose
+sensors give a different layout fails with a ValueError naming both layouts: a sensor added to it needs the protocol
+and the clients updated as well.
+"""
+import os
+import struct
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from simclient import protocol
+from src import util
+from .robotconstants import IR_MAX_RANGE, SENSOR_RATES
+
+DISTANCE_FIELDS = (
+    "offset_x",
+    "offset_y",
+    "rotation",
+    "min_range",
+    "max_range",
+    "beam_angle",
+    "rate",
+)
+MOUNT_FIELDS = ("offset_x", "offset_y", "rate")
+LED_FIELDS = ("offset_x", "offset_y")
+# the state message holds the readings of each type of sensor in this order, the sensors of a type in the order of the
+# definition file, followed by the control switch
+STATE_TYPES = ("sonar", "line", "ir", "light", "led")
+# struct format and text message format of the values of each type of state field
+STATE_FORMATS = {
+    "sonar": ("f", "%f"),
+    "line": ("B", "%d"),
+    "ir": ("B", "%d"),
+    "light": ("h", "%d"),
+    "led": ("HHH", "%d;%d;%d"),
+    "switch": ("B", "%d"),
+}
+
+
+class SensorBank(object):
+    def __init__(self, sensors, fields):
+        """sensors is a list of dictionaries holding the name, type and each of the fields of a sensor."""
+        self.names = [sensor["name"] for sensor in sensors]
+        self.types = [sensor["type"] for sensor in sensors]
+        self.fields = fields
+        for field in fields:
+            setattr(
+                self,
+                field,
+                np.array([sensor[field] for sensor in sensors], dtype=float),
+            )
+
+    def __len__(self):
+        return len(self.names)
+
+    def of_type(self, sensor_type):
+        """Returns the indices of the sensors of a type, in the order of the definition file."""
+        return np.array(
+            [i for i, other in enumerate(self.types) if other == sensor_type], dtype=int
+        )
+
+
+def parse_sensor(element, fields):
+    """Returns the attributes of a sensor element, the rate defaults to the one of its type in SENSOR_RATES."""
+    sensor_type = element.attrib.get("type", element.tag.replace("_sensor", ""))
+    sensor = {"name": element.attrib["name"], "type": sensor_type}
+    for field in fields:
+        if field == "rate":
+            sensor[field] = float(element.attrib.get("rate", SENSOR_RATES[sensor_type]))
+        else:
+            sensor[field] = float(element.attrib.get(field, 0.0))
+    return sensor
+
+
+def state_fields(sensors):
+    """Returns the (type, name) of each field of the state message of a robot with the given sensors, as parsed by
+    parse_sensor(), in the order of STATE_TYPES. The last field is the control switch."""
+    fields = [
+        (sensor_type, sensor["name"])
+        for sensor_type in STATE_TYPES
+        for sensor in sensors
+        if sensor["type"] == sensor_type
+    ]
+    return fields + [("switch", "switch")]
+
+
+def state_values(fields, sensors, switch_on):
+    """Returns the values of the state message with the given fields, read from sensors, the sensors and LEDs of a
+    robot keyed by their (type, name)."""
+    values = []
+    for sensor_type, name in fields:
+        if sensor_type == "switch":
+            values.append(int(switch_on))
+            continue
+        sensor = sensors[(sensor_type, name)]
+        if sensor_type == "sonar":
+            values.append(sensor.get_distance())
+        elif sensor_type == "ir":
+            values.append(int(sensor.get_fixed_triggered(IR_MAX_RANGE)))
+        elif sensor_type == "line":
+            values.append(int(sensor.get_triggered()))
+        elif sensor_type == "light":
+            values.append(int(sensor.value))
+        else:
+            values.extend(int(value) for value in sensor.get_colour())
+    return tuple(values)
+
+
+def check_state_layout(robot_file, spec):
+    """Raises ValueError if the state message of a robot known to the protocol has other fields than the binary state
+    body the clients decode it with."""
+    model = protocol.MODELS.get(spec["name"])
+    if model is None:
+        return
+    layout = protocol.field_types(struct.Struct("<" + spec["state_format"]))
+    expected = protocol.FIELD_TYPES[protocol.STATE][model]
+    if layout != expected:
+        raise ValueError(
+            "the sensors of %s give %s a state message of %d fields (%s) but simclient/protocol.py and its clients "
+            "expect %d (%s)"
+            % (
+                robot_file,
+                spec["name"],
+                len(layout),
+                "".join(layout),
+                len(expected),
+                "".join(expected),
+            )
+        )
+
+
+def load_robot_spec(robot_file):
+    """Loads a robot definition file from the robots folder, see check_state_layout() for the errors raised."""
+    root = ET.parse(os.path.join(util.get_robot_path(), robot_file)).getroot()
+    distance = [parse_sensor(e, DISTANCE_FIELDS) for e in root.iter("distance_sensor")]
+    line = [parse_sensor(e, MOUNT_FIELDS) for e in root.iter("line_sensor")]
+    light = [parse_sensor(e, MOUNT_FIELDS) for e in root.iter("light_sensor")]
+    leds = [parse_sensor(e, LED_FIELDS) for e in root.iter("led")]
+
+    def mount(sensor, fields):
+        return tuple(sensor[field] for field in fields if field != "rate")
+
+    fields = state_fields(distance + line + light + leds)
+
+    spec = {
+        "name": root.attrib["name"],
+        "width": int(root.attrib["width"]),
+        "height": int(root.attrib["height"]),
+        # the robot collides as a circle of collision_radius, objects as boxes whose half extents are their size
+        # scaled by object_collision_scale
+        "collision_radius": float(root.attrib["collision_radius"]),
+        "object_collision_scale": float(root.attrib["object_collision_scale"]),
+        "panning_sonar": root.attrib.get("panning_sonar", "false") == "true",
+        # the mount of every sensor and LED keyed by its (type, name)
+        "mounts": {
+            (s["type"], s["name"]): mount(s, sensor_fields)
+            for sensors, sensor_fields in (
+                (distance, DISTANCE_FIELDS),
+                (line, MOUNT_FIELDS),
+                (light, MOUNT_FIELDS),
+                (leds, LED_FIELDS),
+            )
+            for s in sensors
+        },
+        "sensor_rates": {
+            (s["type"], s["name"]): s["rate"] for s in distance + line + light
+        },
+        # the fields of the state message, its struct format without the byte order and its text format
+        "state_fields": fields,
+        "state_format": "".join(STATE_FORMATS[t][0] for t, _ in fields),
+        "state_message": "<<%s;"
+        + ";".join(STATE_FORMATS[t][1] for t, _ in fields)
+        + ">>",
+        "distance_bank": SensorBank(distance, DISTANCE_FIELDS),
+        "line_bank": SensorBank(line, MOUNT_FIELDS),
+    }
+    check_state_layout(robot_file, spec)
+    return spec
+
+
+def load_robot_specs():
+    """Loads every robot definition in the robots folder, keyed by file name without the extension."""
+    return {
+        os.path.splitext(file_name)[0]: load_robot_spec(file_name)
+        for file_name in sorted(os.listdir(util.get_robot_path()))
+        if file_name.endswith(".xml")
+    }
+
+
+# keyed by the robot names used by the start window and the simulator
+ROBOT_SPECS = load_robot_specs()
+PI2GO = ROBOT_SPECS["Pi2Go"]
+INITIO = ROBOT_SPECS["Initio"]
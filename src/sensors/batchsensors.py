@@ -0,0 +1,125 @@
+"""
+batchsensors.py contains vectorised versions of the sensor models, used to take the readings of many robots at once.
+Every function works on arrays with one entry per robot and gives the same readings as the per robot classes: cast_rays
+follows Sonar.update_sonar and sample_line_maps follows LineSensorMap.check_triggered.
+
+Robots may be in different worlds, the occupancy grids and line maps of all worlds are stacked (padded to the largest
+world) and each robot refers to its world by index.
+"""
+import numpy as np
+
+from .sonar import SONAR_BEAM_STEP
+
+# number of cells each ray is advanced by at a time
+RAY_BLOCK = 32
+
+
+def transform_offsets(x, y, theta, offset_x, offset_y):
+    """Returns the screen position of a sensor mounted at (offset_x, offset_y) on robots at (x, y) with heading theta
+    in radians."""
+    cos_theta = np.cos(theta)
+    sin_theta = np.sin(theta)
+    return (
+        x + offset_x * cos_theta - offset_y * sin_theta,
+        y + offset_x * sin_theta + offset_y * cos_theta,
+    )
+
+
+def stack_grids(grids):
+    """Stacks 2D arrays of different sizes into a single zero padded 3D array."""
+    height = max(grid.shape[0] for grid in grids)
+    width = max(grid.shape[1] for grid in grids)
+    stacked = np.zeros((len(grids), height, width), dtype=grids[0].dtype)
+    for i, grid in enumerate(grids):
+        stacked[i, : grid.shape[0], : grid.shape[1]] = grid
+    return stacked
+
+
+def cast_rays(
+    grids,
+    grid_width,
+    grid_height,
+    resolution,
+    world_ids,
+    x,
+    y,
+    theta,
+    min_range,
+    max_range,
+    cone_angle,
+):
+    """Returns the range measured by a sonar beam for each robot. grids is the stacked occupancy grids indexed by
+    [world, y, x], grid_width, grid_height and resolution are the size of the grid and cell size of each robot's world
+    and (x, y, theta) is the pose of each sensor. min_range, max_range and cone_angle are single values or one per
+    sensor, so the sensors of different kinds of all robots can be cast together. All rays of all robots are marched
+    together RAY_BLOCK cells at a time, rays are dropped as soon as they are blocked."""
+    min_range = np.broadcast_to(np.asarray(min_range, dtype=float), x.shape)
+    max_range = np.broadcast_to(np.asarray(max_range, dtype=float), x.shape)
+    cone_angle = np.broadcast_to(np.asarray(cone_angle, dtype=float), x.shape)
+    max_steps = (max_range / resolution).astype(int)
+
+    # one entry per ray of every robot, the sensors with the same cone have the same sweep of rays
+    ray_robot = []
+    ray_sweep = []
+    for cone in np.unique(cone_angle):
+        robots = np.flatnonzero(cone_angle == cone)
+        sweep = np.arange(-cone / 2.0, cone / 2.0, SONAR_BEAM_STEP)
+        ray_robot.append(np.repeat(robots, sweep.size))
+        ray_sweep.append(np.tile(sweep, robots.size))
+    ray_robot = np.concatenate(ray_robot)
+    ray_angle = theta[ray_robot] + np.concatenate(ray_sweep)
+    ray_cos = np.cos(ray_angle)
+    ray_sin = np.sin(ray_angle)
+    # a ray which is never blocked ends one step past its last distance
+    steps = max_steps[ray_robot] + 1
+
+    active = np.arange(ray_robot.size)
+    for start in range(1, max_steps.max() + 1, RAY_BLOCK):
+        robot = ray_robot[active]
+        distance = np.arange(start, start + RAY_BLOCK)
+        res = resolution[robot][:, None]
+        xmap = np.trunc(
+            x[robot][:, None] / res + distance * ray_cos[active][:, None]
+        ).astype(int)
+        ymap = np.trunc(
+            y[robot][:, None] / res + distance * ray_sin[active][:, None]
+        ).astype(int)
+
+        blocked = (
+            (xmap < 1)
+            | (ymap < 1)
+            | (xmap > grid_width[robot][:, None] - 1)
+            | (ymap > grid_height[robot][:, None] - 1)
+            # rays of worlds with a coarser grid end earlier
+            | (distance > max_steps[robot][:, None])
+        )
+        inside = ~blocked
+        blocked[inside] = grids[
+            np.broadcast_to(world_ids[robot][:, None], xmap.shape)[inside],
+            ymap[inside],
+            xmap[inside],
+        ]
+
+        hit = blocked.any(axis=1)
+        steps[active[hit]] = start + blocked[hit].argmax(axis=1)
+        active = active[~hit]
+        if active.size == 0:
+            break
+
+    ray_range = steps * resolution[ray_robot]
+    shortest = np.full(x.shape, np.inf)
+    np.minimum.at(shortest, ray_robot, ray_range)
+    shortest = np.where(shortest < max_range, shortest, max_range)
+    return np.clip(shortest, min_range, max_range).astype(float)
+
+
+def sample_line_maps(line_data, line_width, line_height, world_ids, px, py):
+    """Returns true for each robot whose line sensor at (px, py), in line map image coordinates, is over the line.
+    line_data is the stacked alpha values of the line maps indexed by [world, y, x], worlds without a line map have a
+    width of 0."""
+    px = np.trunc(px).astype(int)
+    py = np.trunc(py).astype(int)
+    inside = (px >= 0) & (py >= 0) & (px < line_width) & (py < line_height)
+    triggered = np.zeros(px.shape, dtype=bool)
+    triggered[inside] = line_data[world_ids[inside], py[inside], px[inside]] > 0
+    return triggered
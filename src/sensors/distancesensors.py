@@ -12,6 +12,7 @@ import pyglet
 import src.resources
 import src.sprites.basicsprite
 import src.util
+from .mounts import robot_mounts
 from .sonar import Sonar
 
 
@@ -32,6 +33,8 @@ class FixedTransformDistanceSensor(object):
         self.sensor_offset_x = offset_x
         self.sensor_offset_y = offset_y
         self.sensor_rotation = sensor_rot
+        self.mounts = robot_mounts(parent_robot)
+        self.mount = self.mounts.add(offset_x, offset_y)
         self.sensor_range = 0
         self.sensor_x = 0
         self.sensor_y = 0
@@ -39,17 +42,9 @@ class FixedTransformDistanceSensor(object):
     def update_sensor(self):
         """Calculates the XY position of the sensor origin based on the current position of the robot and
         then takes a reading."""
-        angle_radians = -math.radians(self.parent_robot.rotation)
-        beam_angle = angle_radians + self.sensor_rotation
-        beam_angle = src.util.wrap_angle(beam_angle)
-        self.sensor_x = self.parent_robot.x + (
-            self.sensor_offset_x * math.cos(angle_radians)
-            - (self.sensor_offset_y * math.sin(angle_radians))
-        )
-        self.sensor_y = self.parent_robot.y + (
-            self.sensor_offset_x * math.sin(angle_radians)
-            + (self.sensor_offset_y * math.cos(angle_radians))
-        )
+        self.mounts.update_from(self.parent_robot)
+        self.sensor_x, self.sensor_y = self.mounts.position(self.mount)
+        beam_angle = src.util.wrap_angle(self.mounts.heading + self.sensor_rotation)
         self.sensor_range = self.sensor.update_sonar(
             self.sensor_x, self.sensor_y, beam_angle
         )
@@ -156,7 +151,8 @@ class PanningDistanceSensor(src.sprites.basicsprite.BasicSprite):
         return self.sonar_range
 
     def update(self, dt):
-        """Updates the position of the sprite representing the panning servo head."""
+        """Updates the position of the sprite representing the panning servo head and moves the servo towards its
+        target, update_sensor takes the reading."""
         angle_radians = -math.radians(self.parent_robot.rotation)
         self.sensor_x = self.parent_robot.x + (
             self.sensor_offset_x * math.cos(angle_radians)
@@ -182,7 +178,6 @@ class PanningDistanceSensor(src.sprites.basicsprite.BasicSprite):
             else:
                 self.sonar_angle = self.sonar_angle_target
         self.rotation = self.parent_robot.rotation - self.sonar_angle
-        self.update_sensor()
 
     def draw_sensor_position(self):
         """Draws a circle at the origin of the sensor."""
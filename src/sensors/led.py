@@ -9,6 +9,7 @@ linesensor.py defines a map and sensor class to simulate a typical line sensor o
 import math
 import src.util
 import pyglet
+from .mounts import robot_mounts
 
 LED_RADIUS = 4
 LED_NUMPOINTS_CIRCLE = 100
@@ -20,6 +21,8 @@ class FixedLED(object):
         self.parent_robot = parent_robot
         self.offset_x = offset_x
         self.offset_y = offset_y
+        self.mounts = robot_mounts(parent_robot)
+        self.mount = self.mounts.add(offset_x, offset_y)
         self.x = self.sensor_x = 0.0
         self.y = self.sensor_y = 0.0
         self.name = name
@@ -31,23 +34,10 @@ class FixedLED(object):
 
     def update_position(self):
         """Computes the xy position of the LED based on the position of the robot."""
-        angle_radians = -math.radians(self.parent_robot.rotation)
-
-        self.set_xvalue(
-            self.parent_robot.x
-            + (
-                self.offset_x * math.cos(angle_radians)
-                - (self.offset_y * math.sin(angle_radians))
-            )
-        )
-
-        self.set_yvalue(
-            self.parent_robot.y
-            + (
-                self.offset_x * math.sin(angle_radians)
-                + (self.offset_y * math.cos(angle_radians))
-            )
-        )
+        self.mounts.update_from(self.parent_robot)
+        x, y = self.mounts.position(self.mount)
+        self.set_xvalue(x)
+        self.set_yvalue(y)
 
     def set_colour(self, red, green, blue):
         """Accepts RGB value and sets the colour of this LED"""
@@ -11,6 +11,7 @@ linesensor.py defines a map and sensor class to simulate a typical line sensor o
 import math
 import src.util
 import pyglet
+from .mounts import robot_mounts
 
 LIGHT_INTENSITY_MEAN_ANGLE = 0.0
 LIGHT_INTENSITY_STDDEV_ANGLE = math.pi / 3.0  # 60 deg
@@ -33,6 +34,8 @@ class FixedLightSensor(object):
         self.light_sensor_triggered = False
         self.offset_x = offset_x
         self.offset_y = offset_y
+        self.mounts = robot_mounts(parent_robot)
+        self.mount = self.mounts.add(offset_x, offset_y)
         self.value = 0
         self.x = self.sensor_x = 0.0
         self.y = self.sensor_y = 0.0
@@ -52,23 +55,10 @@ class FixedLightSensor(object):
         line sensor map.
         Determines the sensor value using angular distance and a guassian distribution over angular distances
         """
-        angle_radians = -math.radians(self.parent_robot.rotation)
-
-        self.set_xvalue(
-            self.parent_robot.x
-            + (
-                self.offset_x * math.cos(angle_radians)
-                - (self.offset_y * math.sin(angle_radians))
-            )
-        )
-
-        self.set_yvalue(
-            self.parent_robot.y
-            + (
-                self.offset_x * math.sin(angle_radians)
-                + (self.offset_y * math.cos(angle_radians))
-            )
-        )
+        self.mounts.update_from(self.parent_robot)
+        x, y = self.mounts.position(self.mount)
+        self.set_xvalue(x)
+        self.set_yvalue(y)
 
         # ask dynamic asset's static object list whether it's holding a source of light; and, ask host
         # robot whether this sensor is the one closest to the source of that ray.
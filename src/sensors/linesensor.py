@@ -9,11 +9,14 @@ linesensor.py defines a map and sensor class to simulate a typical line sensor o
 import math
 import src.util
 import pyglet
+from .mounts import robot_mounts
 
 
 class LineSensorMap(object):
     def __init__(self, line_map_sprite):
         self.pixel_cache = {}
+        # incremented every time the line map is set, sensors only need a new reading when it changed
+        self.version = 0
         if line_map_sprite is None:
             self.line_map_sprite = None
             self.line_data = None
@@ -33,6 +36,7 @@ class LineSensorMap(object):
         """Update the line sensor map with a new image."""
         # print("setting  line map")
         self.pixel_cache = {}
+        self.version += 1
         if line_map_sprite is None:
             self.line_map_sprite = None
             self.line_data = None
@@ -48,6 +52,16 @@ class LineSensorMap(object):
             )
             self.line_data = self.line_map_sprite.image_data
 
+    def get_state(self):
+        """Returns the version and transform of the line map, a line sensor reading only changes when this or the
+        position of the sensor changes."""
+        if self.line_map_sprite is None:
+            return self.version, None
+        return (
+            self.version,
+            (self.x_offset, self.y_offset, self.line_map_sprite.rotation),
+        )
+
     def check_triggered(self, x, y):
         """Takes as input the current xy position of the line sensor in screen coordinates, this function will then
         translate those to the coordinate system of the image (which may be arbitrarily positioned/rotated) so the
@@ -120,6 +134,8 @@ class FixedLineSensor(object):
         self.sensor_map = sensor_map
         self.offset_x = offset_x
         self.offset_y = offset_y
+        self.mounts = robot_mounts(parent_robot)
+        self.mount = self.mounts.add(offset_x, offset_y)
         self.line_sensor_triggered = False
         self.sensor_x = 0
         self.sensor_y = 0
@@ -131,16 +147,8 @@ class FixedLineSensor(object):
     def update_sensor(self):
         """Computes the xy position of the line sensor based on the position of the robot and queries the
         line sensor map."""
-        angle_radians = -math.radians(self.parent_robot.rotation)
-
-        self.sensor_x = self.parent_robot.x + (
-            self.offset_x * math.cos(angle_radians)
-            - (self.offset_y * math.sin(angle_radians))
-        )
-        self.sensor_y = self.parent_robot.y + (
-            self.offset_x * math.sin(angle_radians)
-            + (self.offset_y * math.cos(angle_radians))
-        )
+        self.mounts.update_from(self.parent_robot)
+        self.sensor_x, self.sensor_y = self.mounts.position(self.mount)
 
         # print(self.sensor_x)
         self.line_sensor_triggered = self.sensor_map.check_triggered(
@@ -0,0 +1,56 @@
+"""
+mounts.py places the sensors and LEDs mounted on a robot. The offsets of all mount points of a robot are kept in one
+array and transformed to screen coordinates together, with a single matrix multiply, whenever the pose of the robot
+changed. Sensors and LEDs then read their position and the heading of the robot from the shared result instead of each
+doing its own trigonometry.
+"""
+import math
+
+import numpy as np
+
+
+class MountTransform(object):
+    def __init__(self):
+        # offsets of the mount points from the centre of the robot, one row per mount
+        self.offsets = np.zeros((0, 2))
+        self.positions = np.zeros((0, 2))
+        # pose the positions were computed for
+        self.pose = None
+        self.heading = 0.0
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def add(self, offset_x, offset_y):
+        """Adds a mount point and returns its index."""
+        self.offsets = np.vstack((self.offsets, [[offset_x, offset_y]]))
+        self.pose = None
+        return len(self.offsets) - 1
+
+    def update(self, x, y, rotation):
+        """Transforms all mount points to the pose of the robot, rotation is the sprite rotation in degrees clockwise.
+        Nothing is computed if the pose did not change since the last call."""
+        pose = (x, y, rotation)
+        if pose == self.pose:
+            return
+        self.pose = pose
+        self.heading = -math.radians(rotation)
+        cos_heading = math.cos(self.heading)
+        sin_heading = math.sin(self.heading)
+        rotate = np.array([[cos_heading, sin_heading], [-sin_heading, cos_heading]])
+        self.positions = self.offsets @ rotate + (x, y)
+
+    def update_from(self, robot):
+        """Transforms all mount points to the current pose of a robot sprite."""
+        self.update(robot.x, robot.y, robot.rotation)
+
+    def position(self, index):
+        """Returns the screen position of a mount point as of the last update."""
+        x, y = self.positions[index]
+        return float(x), float(y)
+
+
+def robot_mounts(robot):
+    """Returns the MountTransform shared by the mounts of a robot, a robot without one gets a new transform."""
+    mounts = getattr(robot, "mounts", None)
+    return mounts if mounts is not None else MountTransform()
@@ -0,0 +1,38 @@
+"""
+scheduler.py decides which sensors of a robot take a new reading on a step. Each sensor is sampled at its own rate in
+simulated time, like the real hardware where the sonar is far slower than the IR and line sensors, and keeps its last
+reading in between. Sensors sampled faster than the simulation steps simply read on every step.
+
+A due sensor is also skipped when nothing its reading depends on changed since its last reading, for example the pose
+of a parked robot and the map, so a simulator left idle does not recompute the same readings.
+"""
+
+
+class SensorScheduler(object):
+    def __init__(self, clock, rates):
+        """rates maps the name of each sensor, the (type, name) of the sensors of a robot definition, to its readings
+        per second."""
+        self.clock = clock
+        self.rates = dict(rates)
+        # every sensor reads on the first step so there is always a last reading
+        self.intervals = {
+            name: clock.interval(1.0 / rate, immediate=True)
+            for name, rate in self.rates.items()
+        }
+        # the state each sensor was last read in
+        self.states = {}
+
+    def due(self):
+        """Returns the set of the sensors due to read on this step, call once per step."""
+        return {name for name, interval in self.intervals.items() if interval.due()}
+
+    def needs_reading(self, due, name, state):
+        """Returns true if the sensor name is in due and state, anything its reading depends on, differs from the
+        state of its last reading. If due is None the sensor is read regardless."""
+        if due is not None:
+            if name not in due:
+                return False
+            if name in self.states and self.states[name] == state:
+                return False
+        self.states[name] = state
+        return True
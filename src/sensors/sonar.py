@@ -26,10 +26,13 @@ class Map(object):
         self.height = int(window_height / cell_size)
         self.width = int(window_width / cell_size)
         self.grid = [[0 for x in range(self.width)] for y in range(self.height)]
+        # incremented on every change of the grid, sensors only need a new reading when it changed
+        self.version = 0
 
     def clear_map(self):
         """Removes all obstacles from the Grid Map."""
         self.grid = [[0 for x in range(self.width)] for y in range(self.height)]
+        self.version += 1
 
     def insert_rectangle(self, ctr_x, ctr_y, size_x, size_y, cell_value=1):
         """Insert a rectangle into the Grid Map at position defined by (ctr_x, ctr_y) and
@@ -55,6 +58,7 @@ class Map(object):
         """Set the value of a grid cell (x, y)."""
         if 0 <= x < self.width and 0 <= y < self.height:
             self.grid[y][x] = val
+            self.version += 1
 
     def draw(self):
         """Draw the Grid Map."""
@@ -0,0 +1,70 @@
+"""
+simclock.py defines the clock used to drive the simulation. In real time mode the clock simply follows the wall clock
+dt passed in by pyglet. In fixed step mode simulated time is a step counter advanced by a constant dt, which makes a
+run independent of the speed of the host so it can be run faster than real time and reproduced exactly.
+
+The clock also owns the random number generator used by the simulation so that a run can be repeated for a given seed.
+
+In lockstep mode (which requires fixed steps) each step additionally waits for the external controller to answer the
+state published at the end of the previous step, see robotlink.py.
+"""
+import random
+
+# small tolerance used when comparing simulated times, avoids missing a period due to floating point rounding
+TIME_EPSILON = 1e-9
+
+
+class SimClock(object):
+    def __init__(self, fixed_dt=None, seed=None, lockstep=False):
+        self.fixed_dt = fixed_dt
+        self.seed = seed
+        self.lockstep = lockstep
+        self.rng = random.Random(seed)
+        self.step_count = 0
+        self.elapsed = 0.0
+
+    def is_fixed_step(self):
+        """Returns true if the clock is advanced by fixed steps rather than by the wall clock."""
+        return self.fixed_dt is not None
+
+    def is_lockstep(self):
+        """Returns true if every step waits for the command of the external controller."""
+        return self.lockstep and self.fixed_dt is not None
+
+    def tick(self, dt=None):
+        """Advances the clock by one step and returns the dt to use for that step. In fixed step mode the given wall
+        clock dt is ignored."""
+        if self.fixed_dt is not None:
+            dt = self.fixed_dt
+        self.step_count += 1
+        self.elapsed += dt
+        return dt
+
+    def now(self):
+        """Returns the current simulated time in seconds."""
+        if self.fixed_dt is not None:
+            # computed from the step counter so the time does not accumulate rounding errors
+            return self.step_count * self.fixed_dt
+        return self.elapsed
+
+    def interval(self, period, immediate=False):
+        """Returns an Interval which becomes due every period seconds of simulated time, starting with the current
+        step if immediate is true."""
+        return Interval(self, period, immediate)
+
+
+class Interval(object):
+    def __init__(self, clock, period, immediate=False):
+        self.clock = clock
+        self.period = period
+        self.next_time = clock.now() if immediate else clock.now() + period
+
+    def due(self):
+        """Returns true (once) if the period has elapsed since the interval was last due. If several periods elapsed
+        during a single step the interval is still only due once."""
+        now = self.clock.now()
+        if now + TIME_EPSILON < self.next_time:
+            return False
+        while self.next_time <= now + TIME_EPSILON:
+            self.next_time += self.period
+        return True
@@ -0,0 +1,194 @@
+"""
+snapshot.py records the state of a simulation in memory so that it can be restored later, for example to try out
+several actions from the same state in a search based controller, to start every batch episode from the same state
+without reading the world file again, or to reproduce a bug from a known state.
+
+A Snapshot is a read only mapping from field names to NumPy arrays. The changing state (poses, velocities, LED colours,
+sensor readings) is copied when the snapshot is taken, data which is only ever replaced and never modified in place,
+such as the static objects of a BatchEnv, is shared with the owner instead of being copied. Snapshots can be written to
+and read from a compact binary form with to_bytes() and Snapshot.from_bytes().
+
+BatchEnv has snapshot() and restore() methods, the functions below capture and restore the robot and static objects of
+the simulator window.
+"""
+import struct
+
+import numpy as np
+
+MAGIC = b"PSNP"
+FORMAT_VERSION = 1
+# magic, format version, number of fields
+HEADER = struct.Struct("<4sHH")
+# length of the field name, length of the dtype string, number of dimensions
+FIELD_HEADER = struct.Struct("<HHB")
+
+# plain attributes of a robot sprite
+ROBOT_ATTRIBUTES = ("x", "y", "rotation", "velocity_x", "velocity_y", "vx", "vth")
+# flags of a robot sprite
+ROBOT_FLAGS = ("in_collision", "control_switch_on")
+# attributes of the sensors and LEDs of a robot holding their last reading or state
+PART_ATTRIBUTES = (
+    "sensor_range",
+    "sonar_range",
+    "sonar_angle",
+    "sonar_angle_target",
+    "line_sensor_triggered",
+    "light_sensor_triggered",
+    "value",
+    "red_value",
+    "green_value",
+    "blue_value",
+)
+
+
+def read_only(array):
+    """Returns a read only view of an array, the data is not copied."""
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class Snapshot(object):
+    def __init__(self, fields, shared=None):
+        """fields maps names to values or arrays which are copied, shared maps names to arrays which are kept by
+        reference and must not be modified in place by their owner."""
+        self.fields = {}
+        for name, value in fields.items():
+            self.fields[name] = read_only(np.array(value))
+        for name, value in (shared or {}).items():
+            self.fields[name] = read_only(np.asarray(value))
+
+    def __getitem__(self, name):
+        return self.fields[name]
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Snapshot)
+            and set(self.fields) == set(other.fields)
+            and all(np.array_equal(self[name], other[name]) for name in self.fields)
+        )
+
+    def __ne__(self, other):
+        return not self == other
+
+    def to_bytes(self):
+        """Returns the snapshot in its binary form: a header followed by the name, dtype, shape and raw data of each
+        field, all little endian."""
+        parts = [HEADER.pack(MAGIC, FORMAT_VERSION, len(self.fields))]
+        for name, array in self.fields.items():
+            array = array.astype(array.dtype.newbyteorder("<"), order="C", copy=False)
+            name_bytes = name.encode("utf-8")
+            dtype_bytes = array.dtype.str.encode("ascii")
+            parts.append(
+                FIELD_HEADER.pack(len(name_bytes), len(dtype_bytes), array.ndim)
+            )
+            parts.append(name_bytes)
+            parts.append(dtype_bytes)
+            parts.append(struct.pack("<%dQ" % array.ndim, *array.shape))
+            parts.append(array.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Reads a snapshot written by to_bytes."""
+        data = memoryview(data)
+        magic, version, count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("not a snapshot")
+        if version != FORMAT_VERSION:
+            raise ValueError("unsupported snapshot version %d" % version)
+        offset = HEADER.size
+        fields = {}
+        for _ in range(count):
+            name_length, dtype_length, ndim = FIELD_HEADER.unpack_from(data, offset)
+            offset += FIELD_HEADER.size
+            name = bytes(data[offset : offset + name_length]).decode("utf-8")
+            offset += name_length
+            dtype = np.dtype(
+                bytes(data[offset : offset + dtype_length]).decode("ascii")
+            )
+            offset += dtype_length
+            shape = struct.unpack_from("<%dQ" % ndim, data, offset)
+            offset += 8 * ndim
+            size = dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+            fields[name] = np.frombuffer(
+                data[offset : offset + size], dtype=dtype
+            ).reshape(shape)
+            offset += size
+        return cls(fields)
+
+
+def robot_parts(robot):
+    """Returns the sensors and LEDs of a robot, found in its sensors dict keyed by (type, name), by "type.name"."""
+    return {
+        "%s.%s" % key: part
+        for key, part in sorted(getattr(robot, "sensors", {}).items())
+    }
+
+
+def take_robot_fields(robot):
+    """Returns the fields recording the pose, commands, flags, sensor readings and LED colours of a robot, the
+    readings of a part under "robot.type.name.attribute"."""
+    fields = {"robot." + name: getattr(robot, name) for name in ROBOT_ATTRIBUTES}
+    for name in ROBOT_FLAGS:
+        fields["robot." + name] = getattr(robot, name)
+    for part_name, part in robot_parts(robot).items():
+        for attribute in PART_ATTRIBUTES:
+            if attribute in vars(part):
+                fields["robot.%s.%s" % (part_name, attribute)] = getattr(
+                    part, attribute
+                )
+    return fields
+
+
+def restore_robot(robot, snapshot):
+    """Puts a robot back in the state recorded by take_robot_fields."""
+    for name in ROBOT_ATTRIBUTES:
+        setattr(robot, name, snapshot["robot." + name].item())
+    for name in ROBOT_FLAGS:
+        setattr(robot, name, bool(snapshot["robot." + name]))
+    for part_name, part in robot_parts(robot).items():
+        for attribute in PART_ATTRIBUTES:
+            key = "robot.%s.%s" % (part_name, attribute)
+            if key in snapshot:
+                setattr(part, attribute, snapshot[key].item())
+    # the restored readings are the ones for the restored pose
+    if hasattr(robot, "sensor_scheduler"):
+        robot.sensor_scheduler.states.clear()
+    if hasattr(robot, "mounts"):
+        robot.mounts.update_from(robot)
+
+
+def take_object_fields(objects):
+    """Returns the fields recording the type, image index and position of the static objects of a world."""
+    return {
+        "objects.type": [str(obj.object_type) for obj in objects],
+        "objects.index": [obj.idx for obj in objects],
+        "objects.position": np.array(
+            [(obj.x, obj.y, obj.rotation) for obj in objects], dtype=float
+        ).reshape(-1, 3),
+    }
+
+
+def restore_objects(objects, snapshot):
+    """Moves the static objects back to the positions recorded by take_object_fields. Objects can only be moved, not
+    created or deleted, so the objects must be the ones of the snapshot."""
+    types = [str(obj.object_type) for obj in objects]
+    indices = [obj.idx for obj in objects]
+    if types != list(snapshot["objects.type"]) or indices != list(
+        snapshot["objects.index"]
+    ):
+        raise ValueError("the objects of the world differ from those of the snapshot")
+    for obj, (x, y, rotation) in zip(objects, snapshot["objects.position"]):
+        obj.x = float(x)
+        obj.y = float(y)
+        obj.rotation = float(rotation)
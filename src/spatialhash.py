@@ -0,0 +1,120 @@
+"""
+spatialhash.py defines a uniform grid spatial hash used as the broad phase of collision checking. Objects are stored in
+every cell their bounding box overlaps so a query only has to look at the cells around the query box, the cost of a
+query depends on how crowded that area is rather than on the number of objects in the world.
+
+Objects are anything with x, y (the centre), width and height, such as the sprites of the static objects. The hash
+does not watch the objects: move() has to be called after an object changes position.
+"""
+
+DEFAULT_CELL_SIZE = 64
+
+
+class SpatialHash(object):
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        # cell (column, row) -> list of the objects overlapping it
+        self.cells = {}
+        # id of the object -> (object, cells it was inserted in), objects are kept by identity
+        self.object_cells = {}
+        # largest width and height of the objects inserted since the hash was cleared, for collides()
+        self.max_width = 0.0
+        self.max_height = 0.0
+
+    def __len__(self):
+        return len(self.object_cells)
+
+    def __contains__(self, obj):
+        return id(obj) in self.object_cells
+
+    def __iter__(self):
+        return iter([obj for obj, _ in self.object_cells.values()])
+
+    def cells_for_box(self, min_x, min_y, max_x, max_y):
+        """Returns the cells overlapped by an axis aligned box."""
+        first_column = int(min_x // self.cell_size)
+        last_column = int(max_x // self.cell_size)
+        first_row = int(min_y // self.cell_size)
+        last_row = int(max_y // self.cell_size)
+        return [
+            (column, row)
+            for column in range(first_column, last_column + 1)
+            for row in range(first_row, last_row + 1)
+        ]
+
+    def cells_for_object(self, obj):
+        """Returns the cells overlapped by the bounding box of an object."""
+        half_width = obj.width / 2.0
+        half_height = obj.height / 2.0
+        return self.cells_for_box(
+            obj.x - half_width,
+            obj.y - half_height,
+            obj.x + half_width,
+            obj.y + half_height,
+        )
+
+    def insert(self, obj):
+        """Adds an object at its current position."""
+        if id(obj) in self.object_cells:
+            self.move(obj)
+            return
+        self.max_width = max(self.max_width, obj.width)
+        self.max_height = max(self.max_height, obj.height)
+        cells = self.cells_for_object(obj)
+        for cell in cells:
+            self.cells.setdefault(cell, []).append(obj)
+        self.object_cells[id(obj)] = (obj, cells)
+
+    def remove(self, obj):
+        """Removes an object, objects which are not in the hash are ignored."""
+        entry = self.object_cells.pop(id(obj), None)
+        if entry is None:
+            return
+        for cell in entry[1]:
+            cell_objects = [other for other in self.cells[cell] if other is not obj]
+            if cell_objects:
+                self.cells[cell] = cell_objects
+            else:
+                del self.cells[cell]
+
+    def move(self, obj):
+        """Updates the cells of an object after its position changed."""
+        entry = self.object_cells.get(id(obj))
+        if entry is None:
+            return
+        if self.cells_for_object(obj) != entry[1]:
+            self.remove(obj)
+            self.insert(obj)
+
+    def clear(self):
+        """Removes all objects."""
+        self.cells = {}
+        self.object_cells = {}
+        self.max_width = 0.0
+        self.max_height = 0.0
+
+    def query(self, x, y, half_width, half_height):
+        """Returns the objects whose cells overlap the box centred at (x, y), each object once. These are candidates
+        only, the caller still has to do the exact collision test."""
+        found = {}
+        for cell in self.cells_for_box(
+            x - half_width, y - half_height, x + half_width, y + half_height
+        ):
+            for obj in self.cells.get(cell, ()):
+                found[id(obj)] = obj
+        return list(found.values())
+
+    def collides(self, obj):
+        """Returns true if obj overlaps any other object of the hash by obj.collides_with(), which the sprites compare
+        from the corner of one object to the other, using the size of obj on one side and the size of the other object
+        on the other. Only the objects near obj are tested: the query box reaches the size of obj and half the size of
+        the largest object of the hash to either side of obj, which covers every object that comparison can report."""
+        for other_obj in self.query(
+            obj.x,
+            obj.y,
+            max(obj.width, self.max_width / 2.0),
+            max(obj.height, self.max_height / 2.0),
+        ):
+            if obj is not other_obj and obj.collides_with(other_obj):
+                return True
+        return False
@@ -2,8 +2,10 @@
 basicsprite.py is a subclass of pyglets sprite class and adds some additional data members and convenience functions
 in particular it adds a velocity model, window bounds checking, mouse handlers and AABB collision checking.
 """
+import numpy as np
 from pyglet import math, sprite
 
+import src.collision
 import src.resources
 from pyglet.event import EVENT_HANDLED
 
@@ -32,6 +34,9 @@ class BasicSprite(sprite.Sprite):
         self.velocity_y = 0.0
         self.mouse_move_state = False
         self.min_rad_sq = (0.5 * min(self.width, self.height)) ** 2
+        # circle swept against the obstacles in update() and the fraction of an obstacle's size used as its half extent
+        self.collision_radius = max(self.width, self.height) / 2.0
+        self.object_collision_scale = 0.5
         self.in_collision = False
         self.event_handlers = [
             self,
@@ -51,10 +56,43 @@ class BasicSprite(sprite.Sprite):
         )
         self.image_data = image_data
 
-    def update(self, dt):
-        """Update position based on current velocity also check window bounds."""
-        self.setx(self.x + self.velocity_x * dt)
-        self.sety(self.y + self.velocity_y * dt)
+    def update(self, dt, obstacles=None):
+        """Update position based on current velocity also check window bounds. If a SpatialHash of obstacles is given
+        the move is swept against the obstacles near the sprite, the sprite stops at the first contact and slides along
+        it for the rest of the move (see collision.py)."""
+        dx = self.velocity_x * dt
+        dy = self.velocity_y * dt
+        if obstacles is not None:
+            reach = self.collision_radius + abs(dx) + abs(dy)
+            nearby = [
+                obj
+                for obj in obstacles.query(self.x, self.y, reach, reach)
+                if obj is not self
+            ]
+            if nearby:
+                box = np.array(
+                    [(obj.x, obj.y, obj.width, obj.height) for obj in nearby],
+                    dtype=float,
+                )
+                half = box[None, :, 2:] * self.object_collision_scale
+                x, y, touched = src.collision.move_circles(
+                    [self.x],
+                    [self.y],
+                    [dx],
+                    [dy],
+                    self.collision_radius,
+                    box[None, :, 0],
+                    box[None, :, 1],
+                    half[:, :, 0],
+                    half[:, :, 1],
+                )
+                dx = x[0] - self.x
+                dy = y[0] - self.y
+                self.in_collision = bool(touched[0])
+            else:
+                self.in_collision = False
+        self.setx(self.x + dx)
+        self.sety(self.y + dy)
         self.check_bounds()
 
     def is_rotating(self):
@@ -29,6 +29,12 @@ def get_world_path():
     return resource_path(resource_folder)
 
 
+def get_robot_path():
+    """Get the path to the robot definition folder."""
+    resource_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), "robots")
+    return resource_path(resource_folder)
+
+
 def rotate(point, angle):
     """Rotate a point around a given angle"""
     px, py = point
@@ -2,28 +2,40 @@
 simulator.py contains the main class for the simulator. It handles rendering the main window together with the main
 user interaction code.
 """
-import itertools
 import math
+import time
 
 import pyglet
 import src.sensors.lightsensor
+import src.snapshot
 import src.util as util
 from pyglet.window import key
 from pyglet.window import mouse
 from src.resources import DynamicAsssets
 from src.robots.initio import Initio
 from src.robots.pi2go import Pi2Go
+from src.simclock import SimClock
 from src.sprites.basicsprite import BasicSprite
 from src.windows.objectwindow import ObjectWindow
 
 LIGHT_BEAM_ANGWIDTH = src.sensors.lightsensor.LIGHT_BEAM_ANGWIDTH
 PADDING = 5
+FAST_FORWARD_FRAME_TIME = (
+    1.0 / 30
+)  # wall clock time spent stepping between two rendered frames
 
 
 class Simulator(pyglet.window.Window):
     def __init__(
-        self, world_file="default.xml", selected_robot="Initio", tk_start_window=None
+        self,
+        world_file="default.xml",
+        selected_robot="Initio",
+        tk_start_window=None,
+        clock=None,
     ):
+        # the clock drives the simulation, by default it follows the wall clock
+        self.clock = clock if clock is not None else SimClock()
+
         # create the rendering batches and groups
         self.sprites = {}
         self.batches = {}
@@ -63,18 +75,22 @@ class Simulator(pyglet.window.Window):
         # decide which type of robot to load
         if selected_robot == "Initio":
             self.robot = Initio(
+                clock=self.clock,
                 line_map_sprite=self.dyn_assets.line_map_sprite,
                 sonar_map=self.dyn_assets.sonar_map,
                 static_objects=self.dyn_assets.static_objects,
+                obstacles=self.dyn_assets.obstacles,
                 batch=self.batches["fg_batch"],
                 window_width=self.dyn_assets.background_image.width,
                 window_height=self.dyn_assets.background_image.height,
             )
         elif selected_robot == "Pi2Go":
             self.robot = Pi2Go(
+                clock=self.clock,
                 line_map_sprite=self.dyn_assets.line_map_sprite,
                 sonar_map=self.dyn_assets.sonar_map,
                 static_objects=self.dyn_assets.static_objects,
+                obstacles=self.dyn_assets.obstacles,
                 batch=self.batches["fg_batch"],
                 window_width=self.dyn_assets.background_image.width,
                 window_height=self.dyn_assets.background_image.height,
@@ -164,15 +180,11 @@ class Simulator(pyglet.window.Window):
     def print_lightsensor_values(self, dt):
         # print("printing light sensor values:\n")
         print(
-            (
-                "FL = %f; FR = %f; BL = %f; BR = %f\n\n"
-                % (
-                    self.robot.light_frontleft_sensor.value,
-                    self.robot.light_frontright_sensor.value,
-                    self.robot.light_backleft_sensor.value,
-                    self.robot.light_backright_sensor.value,
-                )
+            "; ".join(
+                "%s = %f" % (sensor.name, sensor.value)
+                for sensor in self.robot.light_sensors
             )
+            + "\n\n"
         )
 
     def switch_handlers(self):
@@ -472,6 +484,7 @@ class Simulator(pyglet.window.Window):
 
                         # add it to the list of dynamic objects and update the object handlers
                         self.dyn_assets.static_objects.append(sprt_obj)
+                        self.dyn_assets.obstacles.insert(sprt_obj)
                         for handler in sprt_obj.event_handlers:
                             self.edit_mode_handlers.append(handler)
                         self.switch_handlers()
@@ -487,6 +500,7 @@ class Simulator(pyglet.window.Window):
                                 x, y, selected_obj.width, selected_obj.height
                             )
                             self.dyn_assets.static_objects.remove(selected_obj)
+                            self.dyn_assets.obstacles.remove(selected_obj)
 
                         # remove the object handlers
                         for handler in selected_obj.event_handlers:
@@ -535,8 +549,6 @@ class Simulator(pyglet.window.Window):
             pyglet.app.exit()
             # close sockets
             # First setup the robots to stop send/receive routine
-            self.robot.publish_continue = False
-            self.robot.receive_continue = False
             # self.robot.sock_recv.shutdown(socket.SHUT_RD)
             # self.robot.sock_recv.close()
             # self.robot.sock_publish.shutdown(socket.SHUT_WR)
@@ -550,6 +562,11 @@ class Simulator(pyglet.window.Window):
         if symbol == key.S:
             self.dyn_assets.save_to_file()
 
+    def dragged_object_collides(self, obj):
+        """Returns true if an object being dragged in edit mode overlaps another obstacle, only the obstacles near the
+        object are tested."""
+        return self.dyn_assets.obstacles.collides(obj)
+
     def redraw_sonar_map(self):
         """This function updates the sonar map ensuring all new objects are added."""
         self.dyn_assets.sonar_map.clear_map()
@@ -558,6 +575,22 @@ class Simulator(pyglet.window.Window):
                 obj.x, obj.y, obj.width, obj.height
             )
 
+    def take_snapshot(self):
+        """Returns a Snapshot of the robot (pose, commands, sensor readings and LEDs) and of the positions of the static
+        objects, which restore_snapshot can later return to. See snapshot.py."""
+        fields = src.snapshot.take_robot_fields(self.robot)
+        fields.update(src.snapshot.take_object_fields(self.dyn_assets.static_objects))
+        return src.snapshot.Snapshot(fields)
+
+    def restore_snapshot(self, snapshot):
+        """Puts the robot and static objects back in the state of a snapshot. Objects added or deleted since the
+        snapshot was taken cannot be restored, a ValueError is raised in that case."""
+        src.snapshot.restore_objects(self.dyn_assets.static_objects, snapshot)
+        for obj in self.dyn_assets.static_objects:
+            self.dyn_assets.obstacles.move(obj)
+        self.redraw_sonar_map()
+        src.snapshot.restore_robot(self.robot, snapshot)
+
     def delete_light_source_any(self):
         """delete any already existing light source
         (for now we assume there can only be one light source in the world at a time)
@@ -582,6 +615,7 @@ class Simulator(pyglet.window.Window):
             )
             # remove it from the static objects data structure
             self.dyn_assets.static_objects.remove(obj_to_delete)
+            self.dyn_assets.obstacles.remove(obj_to_delete)
             # remove the object from the rendering batches and order
             obj_to_delete.batch = None
             obj_to_delete.group = None
@@ -611,6 +645,7 @@ class Simulator(pyglet.window.Window):
 
             # add it to the list of dynamic objects and update the object handlers
             self.dyn_assets.static_objects.append(light_sprite_obj)
+            self.dyn_assets.obstacles.insert(light_sprite_obj)
             for handler in light_sprite_obj.event_handlers:
                 self.edit_mode_handlers.append(handler)
             self.switch_handlers()
@@ -686,7 +721,13 @@ class Simulator(pyglet.window.Window):
         In edit mode this function also handles the destruction of the edit mode toolbar, allows static objects to
         be dragged around the screen using the mouse. Allows the line map to be moved using the mouse. And finally
          does collision checking between the static objects (which can be moved as we are in edit mode).
+
+        In fixed step mode the wall clock dt is ignored and the simulation advances by the fixed step of the clock. In
+        lockstep mode it does not advance until the external script has answered the state of the last step.
         """
+        if self.robot.link.holds_step():
+            return
+        dt = self.clock.tick(dt)
         try:
             self.update_background_image_transform()  # useful for when the window is resized or maximised.
             self.update_menu_buttons_transform()
@@ -758,25 +799,19 @@ class Simulator(pyglet.window.Window):
 
                             sensor_angles = self.robot.update_light_sensors(self)
 
-                        for other_obj in self.dyn_assets.static_objects:
-                            if obj is not other_obj and obj.collides_with(other_obj):
-                                obj.mouse_target_x = obj.prev_x
-                                obj.mouse_target_y = obj.prev_y
+                        if self.dragged_object_collides(obj):
+                            obj.mouse_target_x = obj.prev_x
+                            obj.mouse_target_y = obj.prev_y
 
                         obj.x = obj.mouse_target_x
                         obj.y = obj.mouse_target_y
+                        # an object may not be dropped onto another one
+                        if self.dragged_object_collides(obj):
+                            obj.x = obj.prev_x
+                            obj.y = obj.prev_y
+                        self.dyn_assets.obstacles.move(obj)
                         self.redraw_sonar_map()
 
-                # collision checking for static objects
-                for pair in itertools.combinations(self.dyn_assets.static_objects, 2):
-                    if pair[0].collides_with(pair[1]):
-                        if pair[0].mouse_move_state:
-                            pair[0].x = pair[0].prev_x
-                            pair[0].y = pair[0].prev_y
-                        elif pair[1].mouse_move_state:
-                            pair[1].x = pair[1].prev_x
-                            pair[1].y = pair[1].prev_y
-
                 # mouse move for the line map
                 if (
                     self.dyn_assets.line_map_sprite is not None
@@ -797,25 +832,21 @@ class Simulator(pyglet.window.Window):
                         )
                         # print("moving line map" + str(self.objects_detected_for_move))
 
-            # update the robot position
+            # update the robot position, the move is swept against the static objects so the robot stops at them
             self.robot.update(dt, self)
             # self.robot.indicate_position()
 
-            # robot to static object collision checking
-            for obj in self.dyn_assets.static_objects:
-                if obj is not self.dyn_assets.switch_sprite:
-                    if obj is not self.dyn_assets.close_menu_button_sprite:
-                        if obj is not self.dyn_assets.save_menu_button_sprite:
-                            if obj is not self.dyn_assets.edit_menu_button_sprite:
-                                if self.robot.robot_collides_with(obj):
-                                    vec_x = self.robot.x - obj.x
-                                    vec_y = self.robot.y - obj.y
-                                    self.robot.velocity_x += vec_x * 2
-                                    self.robot.velocity_y += vec_y * 2
-
         except AttributeError:
             pass
 
+    def fast_forward(self, dt):
+        """Runs as many simulation steps as fit into the wall clock time of one rendered frame. Scheduled instead of
+        update() to run a fixed step simulation faster than real time."""
+        deadline = time.perf_counter() + FAST_FORWARD_FRAME_TIME
+        self.update(dt)
+        while time.perf_counter() < deadline:
+            self.update(dt)
+
     def update_switch_sprite_transform(self):
         self.dyn_assets.switch_sprite.setx(self.width / 2.0)
         self.dyn_assets.switch_sprite.sety(35.0)
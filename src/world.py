@@ -0,0 +1,92 @@
+"""
+world.py loads a world description file without creating any pyglet sprites or windows, so that worlds can be used
+where no display is available. The XML format is the one read by DynamicAsssets in resources.py: the sonar map is built
+in the same way and the line map is kept as an array of alpha values with rows ordered bottom to top, like pyglet image
+data.
+"""
+import os
+import xml.etree.ElementTree as ET
+
+import numpy as np
+from pyglet.extlibs import png
+
+from src import util
+from src.sensors.sonar import Map
+
+OBJECT_SHEET = "static_objects/boxesv2.png"
+OBJECT_SHEET_COLUMNS = 9
+LINE_MAP_FILE = "line_maps/map%d.png"
+
+
+def load_png_alpha(path):
+    """Returns the alpha channel of a PNG image as a (height, width) array, row 0 being the bottom row."""
+    width, height, rows, _ = png.Reader(filename=path).asRGBA8()
+    pixels = np.vstack([np.frombuffer(bytes(row), dtype=np.uint8) for row in rows])
+    return pixels.reshape(height, width, 4)[::-1, :, 3].copy()
+
+
+class World(object):
+    def __init__(self, world_file):
+        self.world_file = world_file
+        root = ET.parse(os.path.join(util.get_world_path(), world_file)).getroot()
+
+        self.width = int(root.attrib["width"])
+        self.height = int(root.attrib["height"])
+        self.sonar_resolution = int(root.attrib["sonar_resolution"])
+        self.sonar_map = Map(self.width, self.height, self.sonar_resolution)
+
+        self.robot_position = [0, 0]
+        self.robot_rotation = 0
+
+        self.line_map_index = -1
+        self.line_map_position = [0, 0]
+        self.line_data = None
+
+        # every object in the sheet has the same size
+        sheet_width, sheet_height, _, _ = png.Reader(
+            filename=os.path.join(util.get_resource_path(), OBJECT_SHEET)
+        ).read()
+        object_width = sheet_width // OBJECT_SHEET_COLUMNS
+        object_height = sheet_height
+
+        # static objects as rows of (x, y, width, height, index)
+        objects = []
+        for child in root:
+            if child.tag == "robot":
+                self.robot_position = [
+                    int(child.attrib["position_x"]),
+                    int(child.attrib["position_y"]),
+                ]
+                self.robot_rotation = int(child.attrib["rotation"])
+            elif child.tag == "line_map":
+                index = int(child.attrib["index"])
+                path = os.path.join(util.get_resource_path(), LINE_MAP_FILE % index)
+                if index >= 0 and os.path.exists(path):
+                    self.line_map_index = index
+                    self.line_map_position = [
+                        int(child.attrib["position_x"]),
+                        int(child.attrib["position_y"]),
+                    ]
+                    self.line_data = load_png_alpha(path)
+            elif child.tag == "static_object":
+                index = int(child.attrib["index"])
+                if 0 <= index < OBJECT_SHEET_COLUMNS:
+                    x = int(child.attrib["position_x"])
+                    y = int(child.attrib["position_y"])
+                    self.sonar_map.insert_rectangle(x, y, object_width, object_height)
+                    objects.append((x, y, object_width, object_height, index))
+        self.objects = np.array(objects, dtype=float).reshape(-1, 5)
+
+    def get_occupancy_grid(self):
+        """Returns the sonar map as a boolean array indexed by [y, x] cell."""
+        return np.array(self.sonar_map.grid, dtype=bool)
+
+    def get_line_map_offset(self):
+        """Returns the screen position of the bottom left corner of the line map, as used by LineSensorMap."""
+        if self.line_data is None:
+            return 0, 0
+        height, width = self.line_data.shape
+        return (
+            self.line_map_position[0] - int(width / 2.0),
+            self.line_map_position[1] - int(height / 2.0),
+        )
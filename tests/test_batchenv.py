@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from src.batchenv import BatchEnv
+from src.world import World
+
+
+def test_world_loads_headless():
+    world = World("line_following.xml")
+    assert world.line_data is not None
+    assert world.line_data.max() > 0
+    assert len(World("maze1.xml").objects) == 29
+
+
+def test_step_shapes_and_independence():
+    env = BatchEnv("maze1.xml", num_robots=8, robot="Pi2Go")
+    observations = env.reset()
+    assert observations["ir"].shape == (8, 3)
+    assert observations["line"].shape == (8, 2)
+    actions = np.zeros((8, 2))
+    actions[::2, 0] = 100
+    for _ in range(30):
+        observations = env.step(actions)
+    assert np.all(observations["x"][1::2] == observations["x"][1])
+    assert np.all(observations["x"][::2] != observations["x"][1])
+
+
+def test_robots_stop_at_objects():
+    env = BatchEnv("maze1.xml", num_robots=1, robot="Pi2Go")
+    env.reset()
+    env.x[:] = 400
+    env.y[:] = 300
+    env.theta[:] = np.pi / 2
+    collided = False
+    for _ in range(120):
+        observations = env.step([[100, 0]])
+        collided = collided or observations["collision"][0]
+    assert collided
+    assert observations["y"][0] < 383
+    # resting against the bottom face of the box at y = 383
+    assert observations["y"][0] == pytest.approx(383 - 47 / 2.0 - 55)
+
+
+def test_worlds_per_robot():
+    env = BatchEnv(["maze1.xml", "line_following.xml"], robot="Initio")
+    observations = env.step([[0, 0, 45], [0, 0, -45]])
+    assert observations["ir"].shape == (2, 2)
+    assert list(env.sonar_angle) == [5, -5]
+
+
+def test_number_of_robots():
+    assert BatchEnv("maze1.xml").num_robots == 1
+    assert BatchEnv(["maze1.xml", "maze1.xml"]).num_robots == 2
+    with pytest.raises(ValueError):
+        BatchEnv(["maze1.xml", "maze1.xml"], num_robots=3)
+    with pytest.raises(ValueError):
+        BatchEnv("maze1.xml", num_robots=0)
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from src import collision
+
+
+def boxes(*rows):
+    """Boxes (x, y, half_width, half_height) shared by a single circle."""
+    box = np.array(rows, dtype=float)
+    return box[None, :, 0], box[None, :, 1], box[None, :, 2], box[None, :, 3]
+
+
+def move(x, y, dx, dy, radius, box):
+    new_x, new_y, touched = collision.move_circles([x], [y], [dx], [dy], radius, *box)
+    return new_x[0], new_y[0], touched[0]
+
+
+def test_free_move_is_unchanged():
+    assert move(0, 0, 30, 40, 10, boxes((500, 500, 20, 20))) == (30, 40, False)
+
+
+def test_large_step_does_not_tunnel_through_thin_wall():
+    x, y, touched = move(0, 0, 1000, 0, 10, boxes((100, 0, 2, 200)))
+    assert touched
+    assert x == pytest.approx(100 - 2 - 10)
+    assert y == pytest.approx(0)
+
+
+def test_slides_along_wall():
+    x, y, touched = move(0, 0, 100, 100, 10, boxes((50, 0, 5, 500)))
+    assert touched
+    assert x == pytest.approx(35)
+    assert y == pytest.approx(100)
+
+
+def test_corner_contact():
+    x, y, _ = move(0, 0, 100, 100, 10, boxes((50, 50, 10, 10)))
+    corner_distance = np.hypot(x - 40, y - 40)
+    assert corner_distance == pytest.approx(10)
+
+
+def test_overlap_is_pushed_out():
+    x, y, touched = move(0, 0, 0, 0, 10, boxes((15, 0, 10, 10)))
+    assert touched
+    assert x == pytest.approx(-5)
+
+
+def test_missing_boxes_are_ignored():
+    box = boxes((np.nan, np.nan, np.nan, np.nan), (100, 0, 5, 50))
+    x, y, touched = move(0, 0, 200, 0, 10, box)
+    assert x == pytest.approx(85)
+
+
+def test_random_moves_never_end_inside_a_box():
+    rng = np.random.RandomState(3)
+    n, m = 500, 40
+    box_x = rng.uniform(0, 800, (n, m))
+    box_y = rng.uniform(0, 600, (n, m))
+    half = np.full((n, m), 23.5)
+    x = rng.uniform(0, 800, n)
+    y = rng.uniform(0, 600, n)
+    x, y, _ = collision.move_circles(
+        x, y, np.zeros(n), np.zeros(n), 55, box_x, box_y, half, half
+    )
+    # robots wedged between boxes that overlap each other cannot be pushed free, only check the others
+    push_x, push_y = collision.penetration(x, y, 55, box_x, box_y, half, half)
+    free = np.hypot(push_x, push_y) == 0
+    for _ in range(20):
+        dx = rng.uniform(-300, 300, n)
+        dy = rng.uniform(-300, 300, n)
+        x, y, _ = collision.move_circles(x, y, dx, dy, 55, box_x, box_y, half, half)
+        push_x, push_y = collision.penetration(x, y, 55, box_x, box_y, half, half)
+        assert np.all(np.hypot(push_x, push_y)[free] < 1e-3)
@@ -0,0 +1,46 @@
+import json
+from src.experiment import run_experiments, run_simulation
+
+
+def drive_forwards(observation, memory):
+    memory["steps"] = memory.get("steps", 0) + 1
+    return memory["speed"], 0
+
+
+def test_run_reaches_goal():
+    result = run_simulation(
+        "maze1.xml",
+        drive_forwards,
+        {"speed": 100, "start": [100, 100, 0], "goal": [300, 100], "max_time": 10},
+    )
+    assert result["time_to_goal"] is not None
+    assert result["time_to_goal"] < 3
+    assert result["distance"] > 100
+
+
+def test_results_are_streamed_to_file(tmp_path):
+    results_file = str(tmp_path / "results.jsonl")
+    results = run_experiments(
+        ["maze1.xml", "maze2.xml"],
+        [drive_forwards, "examples/BatchAvoider.py:controller"],
+        [{"speed": 50, "max_time": 2}],
+        results_file,
+        max_workers=2,
+    )
+    lines = [json.loads(line) for line in open(results_file)]
+    assert len(results) == len(lines) == 4
+    assert not any("error" in line for line in lines)
+    assert sorted(line["run"] for line in lines) == [0, 1, 2, 3]
+
+
+def test_batch_avoider_turns_away_from_obstacles():
+    from src.experiment import load_controller
+
+    controller = load_controller("examples/BatchAvoider.py:controller")
+    memory = {}
+    assert controller({"ir": [False, False, False]}, memory)[1] == 0
+    # obstacle on the left, spin right, and keep spinning right while the middle sensor sees it
+    assert controller({"ir": [True, False, False]}, memory)[1] < 0
+    assert controller({"ir": [False, True, False]}, memory)[1] < 0
+    assert controller({"ir": [False, False, True]}, memory)[1] > 0
+    assert controller({"ir": [True, True, True]}, memory)[1] > 0
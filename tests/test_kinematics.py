@@ -0,0 +1,39 @@
+import math
+
+import numpy as np
+import pytest
+from src import kinematics
+
+
+def test_straight_line():
+    assert kinematics.integrate_arc(1, 2, math.pi / 2, 10, 0, 0.5) == pytest.approx(
+        (1, 7, math.pi / 2)
+    )
+
+
+def test_full_circle_returns_to_start():
+    # 90 degrees per second for 4 seconds in a single step
+    x, y, theta = kinematics.integrate_arc(0, 0, 0, 100, math.pi / 2, 4)
+    assert (x, y) == pytest.approx((0, 0), abs=1e-9)
+    assert theta == pytest.approx(2 * math.pi)
+
+
+def test_pose_does_not_depend_on_step_size():
+    def drive(dt):
+        pose = (0.0, 0.0, 0.3)
+        for _ in range(int(round(3 / dt))):
+            pose = kinematics.integrate_arc(*pose, 80, -0.7, dt)
+        return pose
+
+    assert drive(1 / 10.0) == pytest.approx(drive(1 / 30.0))
+
+
+def test_vectorised_matches_scalar():
+    rng = np.random.RandomState(0)
+    x, y, theta, v = rng.uniform(-100, 100, (4, 50))
+    omega = rng.uniform(-3, 3, 50)
+    omega[:5] = 0.0
+    xs, ys, thetas = kinematics.integrate_arcs(x, y, theta, v, omega, 0.1)
+    for i in range(50):
+        expected = kinematics.integrate_arc(x[i], y[i], theta[i], v[i], omega[i], 0.1)
+        assert (xs[i], ys[i], thetas[i]) == pytest.approx(expected)
@@ -0,0 +1,55 @@
+import asyncio
+
+from src.robots import linkserver
+from src.robots.linkserver import LinkServer
+
+from .test_robotlink import client_socket, links, receive_states, say_hello
+
+
+class FakeLink(object):
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_stop_closes_the_open_links():
+    server = LinkServer()
+
+    async def open_link():
+        link = FakeLink()
+        server.links.add(link)
+        await asyncio.sleep(0)
+        return link
+
+    link = server.submit(open_link()).result(1)
+    server.stop()
+    assert link.closed
+    assert not server.thread.is_alive()
+
+
+def test_stop_closes_the_robot_links_still_open(links, client_socket, monkeypatch):
+    # a server of its own, which the test stops
+    monkeypatch.setattr(linkserver, "server", None)
+    stopped = links()
+    left_open = links()
+    server = linkserver.get_server()
+    say_hello(client_socket, stopped)
+    # the states are sent once every link of the endpoint has reported
+    stopped.update()
+    left_open.update()
+    assert len(receive_states(client_socket)) == 1
+
+    # the link sends its last state before it closes
+    stopped.robot.switch = 0
+    stopped.stop()
+    assert [state[-1] for state in receive_states(client_socket)] == ["0"]
+    assert stopped.closed
+    assert server.links == {left_open}
+
+    server.stop()
+    assert left_open.closed
+    assert left_open.endpoint.closed
+    assert not server.links
+    assert not server.thread.is_alive()
@@ -0,0 +1,288 @@
+import random
+import socket
+import threading
+import time
+
+import pytest
+
+from simclient import discovery, protocol, sharedmemory
+from simclient.simclient import SimulatorClient, open_shared_channels
+from src.robots import robotlink
+from src.simclock import SimClock
+
+
+class FakeRobot(object):
+    robot_name = "INITIO"
+
+    def __init__(self):
+        self.commands = []
+        self.sonar_range = 50.0
+        self.switch = 1
+
+    def get_state_values(self):
+        return (self.sonar_range, 1, 0, 1, 0, 5, 6, 7, 8, self.switch)
+
+    def get_state_message(self, values=None):
+        return "<<INITIO;%f;%d;%d;%d;%d;%d;%d;%d;%d;%d>>" % (
+            values or self.get_state_values()
+        )
+
+    def apply_command(self, values_list):
+        self.commands.append(values_list)
+
+
+class FakePi2Go(FakeRobot):
+    robot_name = "PI2GO"
+
+    def __init__(self):
+        super(FakePi2Go, self).__init__()
+        self.leds = (0,) * 24
+
+    def get_state_values(self):
+        return (50.0, 1, 0, 1, 0, 1, 5, 6, 7, 8) + self.leds + (1,)
+
+
+class DrivenRobot(FakeRobot):
+    """Moves along x at the commanded velocity plus seeded noise, the sonar reads x."""
+
+    def __init__(self, clock):
+        super(DrivenRobot, self).__init__()
+        self.clock = clock
+        self.x = 0.0
+        self.vx = 0.0
+        self.trajectory = []
+
+    def get_state_values(self):
+        return (self.x, 1, 0, 1, 0, 5, 6, 7, 8, 1)
+
+    def apply_command(self, values_list):
+        # the step the command was applied in
+        self.commands.append(self.clock.step_count)
+        self.vx = float(values_list[0])
+
+    def step(self):
+        self.x += self.vx * self.clock.fixed_dt + self.clock.rng.uniform(-1.0, 1.0)
+        self.trajectory.append(self.x)
+
+
+@pytest.fixture
+def links(tmp_path, monkeypatch):
+    monkeypatch.setattr(discovery, "DISCOVERY_DIR", str(tmp_path))
+    monkeypatch.setattr(robotlink, "SHARED_MEMORY", False)
+    monkeypatch.setitem(robotlink.settings, "command_port", 0)
+    monkeypatch.setitem(robotlink.settings, "data_port", 0)
+    opened = []
+
+    def open_link(robot=None, clock=None, num_command_values=3):
+        link = robotlink.RobotLink(
+            robot or FakeRobot(), clock or SimClock(), num_command_values
+        )
+        opened.append(link)
+        return link
+
+    yield open_link
+    for link in opened:
+        link.stop()
+
+
+@pytest.fixture
+def link(links):
+    return links()
+
+
+@pytest.fixture
+def client_socket():
+    """A socket which says hello to a link and receives its states."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(1.0)
+    yield sock
+    sock.close()
+
+
+def say_hello(sock, link):
+    sock.sendto(
+        protocol.encode(protocol.HELLO, protocol.NO_MODEL, robot_id=link.robot_id),
+        ("127.0.0.1", link.endpoint.command_port),
+    )
+    deadline = time.time() + 1
+    while link.client_address is None:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def receive_states(sock):
+    """Returns the values of the text states received until none arrives for a while."""
+    states = []
+    sock.settimeout(0.2)
+    try:
+        while True:
+            states.append(robotlink.decode_message(sock.recv(1024))[1:])
+    except socket.timeout:
+        return states
+
+
+def test_only_the_newest_command_is_applied(link):
+    for seq in range(1, 11):
+        link.handle_command((None, (float(seq), 0.0, 0.0), seq))
+    # arrives late, after newer commands
+    link.handle_command((None, (3.0, 0.0, 0.0), 3))
+    link.update()
+    link.update()
+    assert link.robot.commands == [(10.0, 0.0, 0.0)]
+    assert link.commands_received == 11
+    assert link.commands_dropped == 9
+    assert link.commands_stale == 1
+
+
+def test_commands_of_a_restarted_client_are_not_stale(link):
+    link.handle_command((None, (1.0, 0.0, 0.0), 500))
+    link.handle_command((None, (2.0, 0.0, 0.0), 1))
+    link.update()
+    assert link.robot.commands == [(2.0, 0.0, 0.0)]
+
+
+def test_one_snapshot_is_published_per_step_and_stop_sends_the_last(
+    link, client_socket
+):
+    say_hello(client_socket, link)
+    for step in range(5):
+        link.robot.sonar_range = float(step)
+        link.update()
+    states = receive_states(client_socket)
+    assert [float(state[0]) for state in states] == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+    link.robot.switch = 0
+    link.stop()
+    states = receive_states(client_socket)
+    assert [(float(state[0]), state[-1]) for state in states] == [(4.0, "0")]
+
+
+def test_each_client_only_receives_the_states_of_its_robot(
+    links, client_socket, monkeypatch
+):
+    # a client which never says hello, listening on the data port
+    legacy_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    legacy_socket.bind(("127.0.0.1", 0))
+    monkeypatch.setitem(robotlink.settings, "data_port", legacy_socket.getsockname()[1])
+    try:
+        first = links()
+        second = links()
+        assert (first.robot_id, second.robot_id) == (0, 1)
+        say_hello(client_socket, second)
+        for step in range(3):
+            first.robot.sonar_range = float(step)
+            second.robot.sonar_range = 10.0 + step
+            first.update()
+            second.update()
+
+        assert [float(state[0]) for state in receive_states(legacy_socket)] == [
+            0.0,
+            1.0,
+            2.0,
+        ]
+        states = []
+        client_socket.settimeout(0.2)
+        try:
+            while True:
+                data = client_socket.recv(protocol.MAX_DATAGRAM_SIZE)
+                states.extend(protocol.decode_batch(data, len(data)))
+        except socket.timeout:
+            pass
+        assert [(header.robot_id, values[0]) for header, values in states] == [
+            (1, 10.0),
+            (1, 11.0),
+            (1, 12.0),
+        ]
+    finally:
+        legacy_socket.close()
+
+
+@pytest.mark.skipif(
+    not sharedmemory.is_available(), reason="shared memory is not available"
+)
+def test_the_shared_state_is_only_written_once_a_client_says_hello(links, monkeypatch):
+    monkeypatch.setattr(robotlink, "SHARED_MEMORY", True)
+    link = links()
+    shared_state, shared_command = open_shared_channels(link.endpoint.command_port)
+    buffer = bytearray(sharedmemory.MAX_MESSAGE_SIZE)
+    try:
+        link.update()
+        assert shared_state.receive(buffer, timeout=0.2) is None
+
+        # the client is sent the latest state as soon as it says hello
+        shared_command.send(protocol.encode(protocol.HELLO, protocol.NO_MODEL))
+        size = shared_state.receive(buffer, timeout=1)
+        assert protocol.decode(buffer, size)[1][0] == 50.0
+
+        link.robot.sonar_range = 7.0
+        link.update()
+        size = shared_state.receive(buffer, timeout=1)
+        assert protocol.decode(buffer, size)[1][0] == 7.0
+    finally:
+        shared_state.close()
+        shared_command.close()
+
+
+def test_out_of_range_values_are_clamped(links):
+    link = links(FakePi2Go(), num_command_values=26)
+    leds = ["70000", "-5"] + ["4095"] * 22
+    command = link.read_command(("<<1.5;-2;%s>>" % ";".join(leds)).encode())
+    assert command == (None, (1.5, -2.0, 65535, 0) + (4095,) * 22, None)
+    assert link.read_command(("<<1.5;nan;%s>>" % ";".join(leds)).encode()) is None
+    assert link.read_command(("<<1.5;x;%s>>" % ";".join(leds)).encode()) is None
+
+    link.binary = True
+    link.robot.leds = (70000, -5) + (1,) * 22
+    header, values = protocol.decode(link.encode_state(link.take_snapshot()))
+    assert values[10:13] == (65535, 0, 1)
+
+
+def test_lockstep_waits_for_a_controller_before_the_first_step(links):
+    link = links(clock=SimClock(0.01, lockstep=True))
+    assert link.holds_step()
+    assert link.holds_step()
+    link.handle_command((0, (1.0, 0.0, 0.0), None))
+    assert not link.holds_step()
+    assert link.robot.commands == [(1.0, 0.0, 0.0)]
+
+
+def run_lockstep(links, seed, steps):
+    """Runs a lockstep simulation of a DrivenRobot controlled by a SimulatorClient and returns the trajectory of the
+    robot and the steps the commands were applied in."""
+    clock = SimClock(0.01, seed, lockstep=True)
+    link = links(DrivenRobot(clock), clock)
+    client = SimulatorClient(
+        transport="udp", command_port=link.endpoint.command_port, data_port=0
+    )
+
+    def control():
+        # turns back towards x = 0, taking a while to think about it
+        while client.wait_for_update(timeout=5) is not None:
+            time.sleep(random.uniform(0.0, 0.002))
+            client.cmd_vel(-100 if client.getDistance() > 0 else 100, 0)
+
+    controller = threading.Thread(target=control, daemon=True)
+    controller.start()
+    deadline = time.time() + 20
+    try:
+        for _ in range(steps):
+            while link.holds_step():
+                assert time.time() < deadline
+            clock.tick()
+            link.robot.step()
+            link.update()
+        while link.holds_step():
+            assert time.time() < deadline
+    finally:
+        client.cleanup()
+        controller.join(5)
+        link.stop()
+    return link.robot.trajectory, link.robot.commands
+
+
+def test_seeded_lockstep_runs_are_reproduced(links):
+    trajectory, commands = run_lockstep(links, 7, 60)
+    # every step, including step 0 before the first, got exactly one command
+    assert commands == list(range(61))
+    assert (trajectory, commands) == run_lockstep(links, 7, 60)
@@ -0,0 +1,81 @@
+import os
+import struct
+
+import numpy as np
+import pytest
+from simclient import protocol
+from src import util
+from src.robots.robotspecs import INITIO, PI2GO, ROBOT_SPECS, load_robot_spec
+
+
+def test_definitions_are_loaded_from_the_robots_folder():
+    assert set(ROBOT_SPECS) >= {"Pi2Go", "Initio"}
+    assert PI2GO["mounts"][("sonar", "sonar")] == (50, 0, 0, 5, 1700, 0.36)
+    assert INITIO["panning_sonar"]
+    assert [name for sensor_type, name in PI2GO["mounts"] if sensor_type == "ir"] == [
+        "left",
+        "middle",
+        "right",
+    ]
+    assert PI2GO["mounts"][("line", "right")] == (40, -14)
+
+
+def test_sensor_banks():
+    bank = PI2GO["distance_bank"]
+    assert bank.names == ["sonar", "left", "middle", "right"]
+    assert list(bank.of_type("ir")) == [1, 2, 3]
+    assert list(bank.max_range) == [1700, 35, 35, 35]
+    assert np.allclose(PI2GO["line_bank"].offset_y, [14, -14])
+    assert PI2GO["sensor_rates"][("sonar", "sonar")] == 10
+    assert PI2GO["sensor_rates"][("ir", "middle")] == 50
+    assert PI2GO["sensor_rates"][("line", "left")] == 100
+
+
+def test_state_layout_matches_the_protocol():
+    for spec, model in ((INITIO, protocol.INITIO), (PI2GO, protocol.PI2GO)):
+        state = struct.Struct("<" + spec["state_format"])
+        body = protocol.STATE_BODIES[model]
+        values = tuple(range(len(body.unpack(bytes(body.size)))))
+        assert state.pack(*values) == body.pack(*values)
+        assert spec["state_message"] % (
+            ("ROBOT",) + values
+        ) == "<<ROBOT;0.000000;%s>>" % (";".join(str(value) for value in values[1:]))
+    assert PI2GO["state_fields"][6:10] == [
+        ("light", "FrontLeft"),
+        ("light", "FrontRight"),
+        ("light", "BackRight"),
+        ("light", "BackLeft"),
+    ]
+    assert PI2GO["state_fields"][10] == ("led", "front1")
+    assert PI2GO["state_fields"][-1] == ("switch", "switch")
+
+
+def test_sensors_added_to_a_definition_get_a_state_field_and_their_own_rate(
+    tmp_path, monkeypatch
+):
+    definition = open(os.path.join(util.get_robot_path(), "Initio.xml")).read()
+    definition = definition.replace(
+        "<line_sensor",
+        '<distance_sensor type="ir" name="back" offset_x="-40" offset_y="0" rotation="3.14" min_range="5" '
+        'max_range="35" beam_angle="0.25" rate="25" />\n    <line_sensor',
+        1,
+    )
+    (tmp_path / "Initio.xml").write_text(definition)
+    # a robot the protocol does not know, whose state layout is free
+    (tmp_path / "Scout.xml").write_text(
+        definition.replace('name="INITIO"', 'name="SCOUT"', 1)
+    )
+    monkeypatch.setattr(util, "get_robot_path", lambda: str(tmp_path))
+    # the clients decode the state of an INITIO without the extra field
+    with pytest.raises(ValueError, match="fBBBBBhhhhB"):
+        load_robot_spec("Initio.xml")
+
+    spec = load_robot_spec("Scout.xml")
+    assert spec["state_fields"][3:6] == [
+        ("ir", "left"),
+        ("ir", "right"),
+        ("ir", "back"),
+    ]
+    assert spec["state_format"] == "fBBBBBhhhhB"
+    assert spec["sensor_rates"][("ir", "back")] == 25
+    assert spec["sensor_rates"][("ir", "left")] == 50
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from src.sensors import batchsensors
+from src.sensors.sonar import Map, Sonar
+from src.world import World
+
+
+@pytest.fixture(scope="module")
+def maze():
+    return World("maze1.xml")
+
+
+@pytest.mark.parametrize(
+    "min_range, max_range, cone_angle", [(5, 1700, 0.36), (5, 35, 0.25)]
+)
+def test_cast_rays_matches_sonar(maze, min_range, max_range, cone_angle):
+    rng = np.random.RandomState(0)
+    n = 200
+    x = rng.uniform(0, maze.width, n)
+    y = rng.uniform(0, maze.height, n)
+    theta = rng.uniform(0, 2 * np.pi, n)
+    sonar = Sonar(maze.sonar_map, min_range, max_range, cone_angle)
+    expected = [sonar.update_sonar(x[i], y[i], theta[i]) for i in range(n)]
+
+    ones = np.ones(n)
+    ranges = batchsensors.cast_rays(
+        maze.get_occupancy_grid()[None],
+        ones * maze.sonar_map.width,
+        ones * maze.sonar_map.height,
+        ones * maze.sonar_resolution,
+        np.zeros(n, dtype=int),
+        x,
+        y,
+        theta,
+        min_range,
+        max_range,
+        cone_angle,
+    )
+    assert ranges == pytest.approx(expected)
+
+
+def test_cast_rays_in_different_worlds():
+    empty = Map(200, 100, 10)
+    full = Map(200, 100, 10)
+    full.insert_rectangle(150, 50, 20, 100)
+    grids = batchsensors.stack_grids(
+        [np.array(empty.grid, dtype=bool), np.array(full.grid, dtype=bool)]
+    )
+    ones = np.ones(2)
+    ranges = batchsensors.cast_rays(
+        grids,
+        ones * 20,
+        ones * 10,
+        ones * 10,
+        np.array([0, 1]),
+        ones * 50,
+        ones * 50,
+        np.zeros(2),
+        5,
+        1700,
+        0.36,
+    )
+    assert ranges[0] > ranges[1]
+
+
+def test_sample_line_maps():
+    line_data = batchsensors.stack_grids(
+        [np.array([[0, 255], [0, 0]], dtype=np.uint8), np.zeros((1, 1), np.uint8)]
+    )
+    triggered = batchsensors.sample_line_maps(
+        line_data,
+        np.array([2, 2, 2, 0]),
+        np.array([2, 2, 2, 0]),
+        np.array([0, 0, 0, 1]),
+        np.array([1.5, 0.5, -1.0, 0.0]),
+        np.array([0.0, 0.0, 0.0, 0.0]),
+    )
+    assert list(triggered) == [True, False, False, False]
@@ -0,0 +1,31 @@
+import math
+
+import pytest
+from src.sensors.mounts import MountTransform
+
+
+def test_mounts_follow_robot_pose():
+    mounts = MountTransform()
+    offsets = [(50, 0), (33, 21), (-55, -35)]
+    indices = [mounts.add(*offset) for offset in offsets]
+    mounts.update(100, 200, 30)
+    heading = -math.radians(30)
+    assert mounts.heading == pytest.approx(heading)
+    for index, (offset_x, offset_y) in zip(indices, offsets):
+        assert mounts.position(index) == pytest.approx(
+            (
+                100 + offset_x * math.cos(heading) - offset_y * math.sin(heading),
+                200 + offset_x * math.sin(heading) + offset_y * math.cos(heading),
+            )
+        )
+
+
+def test_unchanged_pose_is_not_transformed_again():
+    mounts = MountTransform()
+    mounts.add(10, 0)
+    mounts.update(0, 0, 90)
+    positions = mounts.positions
+    mounts.update(0, 0, 90)
+    assert mounts.positions is positions
+    mounts.update(0, 0, 0)
+    assert mounts.position(0) == pytest.approx((10, 0))
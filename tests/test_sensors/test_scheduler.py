@@ -0,0 +1,47 @@
+from src.sensors.scheduler import SensorScheduler
+from src.sensors.sonar import Map
+from src.simclock import SimClock
+
+
+def test_sensors_read_at_their_rates():
+    clock = SimClock(fixed_dt=0.01)
+    scheduler = SensorScheduler(clock, {"sonar": 10.0, "line": 100.0, "ir": 50.0})
+    counts = {"sonar": 0, "line": 0, "ir": 0}
+    for _ in range(100):
+        for name in scheduler.due():
+            counts[name] += 1
+        clock.tick()
+    assert counts == {"sonar": 10, "line": 100, "ir": 50}
+
+
+def test_fast_sensors_read_every_step():
+    clock = SimClock(fixed_dt=1 / 30.0)
+    scheduler = SensorScheduler(clock, {"line": 100.0})
+    assert scheduler.due() == {"line"}
+    for _ in range(5):
+        clock.tick()
+        assert scheduler.due() == {"line"}
+
+
+def test_unchanged_sensors_are_not_read_again():
+    clock = SimClock(fixed_dt=0.01)
+    scheduler = SensorScheduler(clock, {"line": 100.0})
+    due = scheduler.due()
+    assert scheduler.needs_reading(due, "line", (10, 20, 0))
+    clock.tick()
+    due = scheduler.due()
+    assert not scheduler.needs_reading(due, "line", (10, 20, 0))
+    assert scheduler.needs_reading(None, "line", (10, 20, 0))
+    clock.tick()
+    due = scheduler.due()
+    assert scheduler.needs_reading(due, "line", (11, 20, 0))
+
+
+def test_map_version_changes_with_grid():
+    grid = Map(100, 100, 10)
+    version = grid.version
+    grid.insert_rectangle(50, 50, 20, 20)
+    assert grid.version > version
+    version = grid.version
+    grid.clear_map()
+    assert grid.version > version
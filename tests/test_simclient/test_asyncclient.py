@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from simclient import discovery, protocol, sharedmemory
+from simclient.asyncclient import AsyncSimulatorClient, StateProtocol
+from src.robots import robotlink
+from src.simclock import SimClock
+
+
+class FakeRobot(object):
+    robot_name = "INITIO"
+
+    def __init__(self):
+        self.sonar_range = 0.0
+        self.commands = []
+
+    def get_state_values(self):
+        return (self.sonar_range, 1, 0, 1, 0, 5, 6, 7, 8, 1)
+
+    def get_state_message(self, values=None):
+        return "<<INITIO;%f;%d;%d;%d;%d;%d;%d;%d;%d;%d>>" % (
+            values or self.get_state_values()
+        )
+
+    def apply_command(self, values_list):
+        self.commands.append(tuple(values_list))
+
+
+@pytest.fixture
+def link(tmp_path, monkeypatch):
+    monkeypatch.setattr(discovery, "DISCOVERY_DIR", str(tmp_path))
+    monkeypatch.setitem(robotlink.settings, "command_port", 0)
+    monkeypatch.setitem(robotlink.settings, "data_port", 0)
+    link = robotlink.RobotLink(FakeRobot(), SimClock(), 3)
+    yield link
+    link.stop()
+
+
+async def control(link, transport):
+    async def simulate():
+        while True:
+            link.robot.sonar_range += 1.0
+            link.update()
+            await asyncio.sleep(0.01)
+
+    simulation = asyncio.get_running_loop().create_task(simulate())
+    try:
+        async with AsyncSimulatorClient(
+            transport, command_port=link.endpoint.command_port
+        ) as client:
+            frames = []
+            async for frame in client.frames():
+                frames.append(frame)
+                await client.set_velocity(10, len(frames))
+                if len(frames) == 5:
+                    break
+            await client.wait_for_update(1.0)
+            await client.wait_for_update(1.0)
+    finally:
+        simulation.cancel()
+    return frames
+
+
+@pytest.mark.parametrize(
+    "transport",
+    [
+        "udp",
+        pytest.param(
+            "shm",
+            marks=pytest.mark.skipif(
+                not sharedmemory.is_available(), reason="no shared memory"
+            ),
+        ),
+    ],
+)
+def test_frames_and_commands(link, transport):
+    frames = asyncio.run(control(link, transport))
+    numbers = [frame.frame for frame in frames]
+    assert numbers == sorted(set(numbers))
+    assert all(frame.robot_name == "INITIO" for frame in frames)
+    assert frames[-1].sonar_range > frames[0].sonar_range
+    assert link.robot.commands[-1] == (10.0, 5.0, 0.0)
+
+
+def state_message(sonar_range):
+    return protocol.encode(
+        protocol.STATE, protocol.INITIO, (sonar_range, 1, 0, 1, 0, 5, 6, 7, 8, 1)
+    )
+
+
+def test_waiting_before_connecting_fails_clearly():
+    client = AsyncSimulatorClient("udp", command_port=1)
+    with pytest.raises(RuntimeError):
+        asyncio.run(client.wait_for_update(0.1))
+
+
+def test_malformed_datagrams_are_dropped(link):
+    async def receive():
+        async with AsyncSimulatorClient(
+            "udp", command_port=link.endpoint.command_port
+        ) as client:
+            state_protocol = StateProtocol(client)
+            state_protocol.datagram_received(b"<<INITIO;x>>", None)
+            state_protocol.datagram_received(state_message(7.0)[:-3], None)
+            state_protocol.datagram_received(state_message(7.0), None)
+            return client.snapshot()
+
+    assert asyncio.run(receive()).sonar_range == 7.0
+
+
+def test_the_timeout_covers_the_whole_wait(link):
+    async def wait():
+        async with AsyncSimulatorClient(
+            "udp", command_port=link.endpoint.command_port
+        ) as client:
+            loop = asyncio.get_running_loop()
+
+            async def receive_states():
+                # each new frame wakes up the waiter, none is newer than the frame it waits for
+                for sonar_range in range(40):
+                    client.receive_state(
+                        ("INITIO", [float(sonar_range)] + [0] * 9, None)
+                    )
+                    await asyncio.sleep(0.05)
+
+            states = loop.create_task(receive_states())
+            start = loop.time()
+            sensors = await client.wait_for_update(timeout=0.3, after=1000)
+            waited = loop.time() - start
+            states.cancel()
+            return sensors, waited
+
+    sensors, waited = asyncio.run(wait())
+    assert sensors is None
+    assert waited < 1.0
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+from simclient import discovery
+
+
+@pytest.fixture(autouse=True)
+def discovery_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(discovery, "DISCOVERY_DIR", str(tmp_path))
+    for name in ("PYSIM_HOST", "PYSIM_COMMAND_PORT", "PYSIM_DATA_PORT"):
+        monkeypatch.delenv(name, raising=False)
+    return tmp_path
+
+
+def test_defaults_without_any_simulator():
+    assert discovery.resolve() == ("127.0.0.1", 5001, 5000)
+
+
+def test_announced_ports_are_found_and_withdrawn():
+    path = discovery.announce("127.0.0.1", 40123, 0)
+    assert discovery.resolve() == ("127.0.0.1", 40123, 0)
+    assert discovery.resolve(command_port=40123) == ("127.0.0.1", 40123, 0)
+    assert discovery.find_simulators()[0]["robots"] == {}
+    discovery.withdraw(path)
+    assert discovery.find_simulators() == []
+
+
+def test_arguments_and_environment_win(monkeypatch):
+    discovery.announce("127.0.0.1", 40123, 0)
+    monkeypatch.setenv("PYSIM_DATA_PORT", "6000")
+    assert discovery.resolve() == ("127.0.0.1", 40123, 6000)
+    assert discovery.resolve(command_port=7001, data_port=7000) == (
+        "127.0.0.1",
+        7001,
+        7000,
+    )
+
+
+@pytest.mark.skipif(os.name != "posix", reason="only checked on POSIX")
+def test_announcements_of_exited_simulators_are_removed(monkeypatch):
+    discovery.announce("127.0.0.1", 40123, 0)
+    monkeypatch.setattr(discovery, "is_running", lambda pid: False)
+    assert discovery.find_simulators() == []
+    assert os.listdir(discovery.DISCOVERY_DIR) == []
@@ -0,0 +1,69 @@
+import pytest
+from simclient import protocol
+
+
+def test_state_round_trip():
+    values = (123.5, 1, 0, 1, 1, 0, 700, 20, 0, 1023) + tuple(range(24)) + (1,)
+    data = protocol.encode(protocol.STATE, protocol.PI2GO, values, seq=7, step=42)
+    assert len(data) == protocol.message_size(protocol.STATE, protocol.PI2GO)
+    assert protocol.is_binary(data)
+    header, decoded = protocol.decode(data)
+    assert header == protocol.Header(protocol.STATE, protocol.PI2GO, 0, 7, 42)
+    assert decoded == values
+
+
+def test_command_without_step():
+    data = protocol.encode(protocol.COMMAND, protocol.INITIO, (10.0, -0.5, 30.0))
+    header, decoded = protocol.decode(data)
+    assert header.step == protocol.NO_STEP
+    assert decoded == pytest.approx((10.0, -0.5, 30.0))
+
+
+def test_invalid_messages_are_rejected():
+    data = protocol.encode(protocol.COMMAND, protocol.INITIO, (1.0, 2.0, 3.0))
+    assert not protocol.is_binary(b"<<INITIO;1.0>>")
+    assert protocol.decode(data[:-1]) is None
+    assert protocol.decode(data[:2] + b"\x09" + data[3:]) is None
+    assert protocol.decode(b"PS") is None
+
+
+def test_decode_in_place_from_a_larger_buffer():
+    data = protocol.encode(protocol.COMMAND, protocol.INITIO, (1.0, 2.0, 3.0), seq=3)
+    buffer = bytearray(1024)
+    buffer[: len(data)] = data
+    header, decoded = protocol.decode(buffer, len(data))
+    assert header.seq == 3
+    assert decoded == (1.0, 2.0, 3.0)
+    assert protocol.decode(buffer) is None
+
+
+def test_batched_states_of_several_robots():
+    values = (50.0, 1, 0, 1, 0, 5, 6, 7, 8, 1)
+    messages = [
+        protocol.encode(protocol.STATE, protocol.INITIO, values, robot_id=robot_id)
+        for robot_id in range(40)
+    ]
+    datagrams = protocol.batch(messages)
+    assert len(datagrams) == 2
+    assert all(len(datagram) <= protocol.MAX_DATAGRAM_SIZE for datagram in datagrams)
+    decoded = []
+    for datagram in datagrams:
+        decoded.extend(protocol.decode_batch(datagram))
+    assert [header.robot_id for header, _ in decoded] == list(range(40))
+    assert protocol.message_robot_id(datagrams[1]) == len(datagrams[0]) // len(
+        messages[0]
+    )
+    assert protocol.decode_batch(datagrams[0][:-1]) is None
+    assert protocol.message_robot_id(b"<<0.0;0.0;0.0>>") == 0
+
+
+def test_values_are_clamped_to_their_fields():
+    values = protocol.clamp(
+        protocol.STATE,
+        protocol.INITIO,
+        ("1e39", 1, 300, -1, 0, 40000, -40000, 7.9, 0, True),
+    )
+    assert values == (protocol.FLOAT_MAX, 1, 255, 0, 0, 32767, -32768, 7, 0, 1)
+    protocol.encode(protocol.STATE, protocol.INITIO, values)
+    with pytest.raises(ValueError):
+        protocol.clamp(protocol.COMMAND, protocol.INITIO, (1.0, 2.0))
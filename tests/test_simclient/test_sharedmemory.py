@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from simclient import protocol, sharedmemory
+
+pytestmark = pytest.mark.skipif(
+    not sharedmemory.is_available(), reason="shared memory is not available"
+)
+
+
+@pytest.fixture
+def channels():
+    name = "pysim_test_%d" % os.getpid()
+    writer = sharedmemory.Channel(name, writer=True, create=True)
+    reader = sharedmemory.Channel(name, writer=False)
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+def test_reader_gets_the_latest_message(channels):
+    writer, reader = channels
+    buffer = bytearray(sharedmemory.MAX_MESSAGE_SIZE)
+    assert reader.receive(buffer, timeout=0) is None
+    for seq in (1, 2):
+        writer.send(
+            protocol.encode(protocol.COMMAND, protocol.INITIO, (seq, 0.0, 0.0), seq=seq)
+        )
+    size = reader.receive(buffer, timeout=1)
+    header, values = protocol.decode(buffer, size)
+    assert header.seq == 2
+    assert values == (2.0, 0.0, 0.0)
+    # the same message is not read twice
+    assert reader.receive(buffer, timeout=0) is None
+
+
+def test_attaching_to_a_missing_channel_fails():
+    with pytest.raises(FileNotFoundError):
+        sharedmemory.Channel("pysim_test_missing", writer=True)
+
+
+def test_attaching_to_a_channel_left_by_a_dead_process_fails():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    name = "pysim_test_dead_%d" % os.getpid()
+    writer = sharedmemory.Channel(name, writer=True, create=True)
+    try:
+        sharedmemory.OWNER.pack_into(
+            writer.block.memory.buf, sharedmemory.BLOCK_HEADER.size, process.pid
+        )
+        with pytest.raises(ConnectionRefusedError):
+            sharedmemory.Channel(name, writer=False)
+    finally:
+        writer.close()
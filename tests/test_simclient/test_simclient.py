@@ -0,0 +1,188 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from simclient import protocol, simrobot
+from simclient.simclient import KEEPALIVE_INTERVAL, SimulatorClient
+
+
+@pytest.fixture
+def simulator():
+    """A socket standing in for the simulator, which receives the commands of the client."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    yield sock
+    sock.close()
+
+
+@pytest.fixture
+def client(simulator):
+    client = SimulatorClient(
+        transport="udp",
+        host="127.0.0.1",
+        command_port=simulator.getsockname()[1],
+        data_port=0,
+    )
+    yield client
+    client.cleanup()
+
+
+def send_state(simulator, client, sonar_range=50.0, light=5):
+    simulator.sendto(
+        protocol.encode(
+            protocol.STATE,
+            protocol.INITIO,
+            (sonar_range, 1, 0, 1, 0, light, light + 1, light + 2, light + 3, 1),
+        ),
+        ("127.0.0.1", client.data_port),
+    )
+
+
+def receive_messages(simulator, duration=0.2):
+    """Returns the (header, values) of the messages received over duration seconds."""
+    messages = []
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        simulator.settimeout(deadline - time.time())
+        try:
+            messages.append(protocol.decode(simulator.recv(1024)))
+        except socket.timeout:
+            break
+    return messages
+
+
+def receive_command(simulator, timeout=1.0):
+    """Returns the values of the next command received and the time it arrived, skipping hello messages."""
+    deadline = time.time() + timeout
+    simulator.settimeout(timeout)
+    while True:
+        header, values = protocol.decode(simulator.recv(1024))
+        assert time.time() < deadline
+        if header.kind == protocol.COMMAND:
+            return values, time.time()
+
+
+def connect(simulator, client):
+    """Has the client receive its first state and returns the command it answers with."""
+    send_state(simulator, client)
+    return receive_command(simulator)[0]
+
+
+def wait_for_frame(client, frame):
+    deadline = time.time() + 1
+    while client.frame_seq < frame:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_a_command_set_before_the_robot_is_known_goes_out_with_the_first_state(
+    client, simulator
+):
+    client.cmd_vel(10, 2)
+    # only hello messages until the client knows the robot
+    messages = receive_messages(simulator)
+    assert messages
+    assert {header.kind for header, values in messages} == {protocol.HELLO}
+    assert connect(simulator, client) == (10.0, 2.0, 0.0)
+
+
+def test_changes_are_sent_straight_away_and_only_once(client, simulator):
+    assert connect(simulator, client) == (0.0, 0.0, 0.0)
+    start = time.time()
+    client.cmd_vel(5, 1)
+    values, arrived = receive_command(simulator)
+    assert values == (5.0, 1.0, 0.0)
+    assert arrived - start < KEEPALIVE_INTERVAL / 2
+
+    # the same command is not sent again before the keepalive is due
+    client.cmd_vel(5, 1)
+    client.setServo(1, 0)
+    assert receive_messages(simulator, KEEPALIVE_INTERVAL / 2) == []
+
+
+def test_the_command_is_repeated_as_a_keepalive(client, simulator):
+    connect(simulator, client)
+    client.cmd_vel(5, 1)
+    _, sent = receive_command(simulator)
+    values, repeated = receive_command(simulator, timeout=2 * KEEPALIVE_INTERVAL)
+    assert values == (5.0, 1.0, 0.0)
+    assert repeated - sent >= KEEPALIVE_INTERVAL * 0.9
+    values, repeated_again = receive_command(simulator, timeout=2 * KEEPALIVE_INTERVAL)
+    assert values == (5.0, 1.0, 0.0)
+    assert repeated_again - repeated >= KEEPALIVE_INTERVAL * 0.9
+
+
+def test_wait_for_update_blocks_until_a_newer_frame_arrives(client, simulator):
+    connect(simulator, client)
+    assert client.wait_for_update(timeout=1) == 1
+    threading.Timer(0.2, send_state, (simulator, client, 7.0)).start()
+    start = time.time()
+    assert client.wait_for_update(timeout=1) == 2
+    assert time.time() - start >= 0.15
+    assert client.getDistance() == 7.0
+    assert client.wait_for_update(timeout=0.1) is None
+
+
+def test_wait_for_update_after_a_given_frame(client, simulator):
+    connect(simulator, client)
+    send_state(simulator, client)
+    send_state(simulator, client)
+    wait_for_frame(client, 3)
+    # the newest frame is returned, the ones in between are skipped
+    assert client.wait_for_update(timeout=0, after=1) == 3
+    assert client.wait_for_update(timeout=0.1, after=3) is None
+    assert client.wait_for_update(timeout=0, after=0) == 3
+
+
+def test_cleanup_wakes_up_wait_for_update(client):
+    threading.Timer(0.1, client.cleanup).start()
+    start = time.time()
+    assert client.wait_for_update(timeout=5) is None
+    assert time.time() - start < 1
+
+
+def test_simrobot_mirrors_the_frames_of_the_client(client, simulator, monkeypatch):
+    monkeypatch.setattr(simrobot, "sim", client)
+    assert simrobot.frame_seq() == 0
+    assert simrobot.wait_for_update(0.1) is None
+    connect(simulator, client)
+    assert simrobot.wait_for_update(1) == 1
+    assert simrobot.frame_seq() == 1
+
+
+def test_robot_name_and_frame_seq_read_like_attributes(client, simulator):
+    assert client.robot_name == client.getRobotName() == "Not Connected"
+    assert client.frame_seq == 0
+    connect(simulator, client)
+    assert client.robot_name == client.getRobotName() == "INITIO"
+    assert client.frame_seq == client.snapshot().frame == 1
+
+
+def test_a_snapshot_holds_the_readings_of_one_frame(client, simulator):
+    send_state(simulator, client, 0.0, 0)
+    receive_command(simulator)
+
+    def simulate():
+        for frame in range(1, 301):
+            send_state(simulator, client, float(frame), frame)
+            time.sleep(0.001)
+
+    simulation = threading.Thread(target=simulate)
+    simulation.start()
+    snapshots = []
+    while simulation.is_alive():
+        snapshots.append(client.snapshot())
+    simulation.join()
+    assert len({sensors.frame for sensors in snapshots}) > 10
+    for sensors in snapshots:
+        assert sensors.sonar_range == sensors.light_front_left
+        assert sensors.light_back_left == sensors.light_front_left + 3
+
+    # the getters read the latest snapshot
+    wait_for_frame(client, 301)
+    sensors = client.snapshot()
+    assert client.getDistance() == sensors.sonar_range == 300.0
+    assert [client.getLight(sensor) for sensor in range(4)] == [300, 301, 302, 303]
+    assert (client.irLeft(), client.irRight(), client.getSwitch()) == (1, 0, 1)
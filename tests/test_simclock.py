@@ -0,0 +1,48 @@
+import pytest
+from src.simclock import SimClock
+
+
+def test_fixed_step_ignores_wall_clock_dt():
+    clock = SimClock(0.05)
+    assert clock.tick(0.2) == 0.05
+    assert clock.tick() == 0.05
+    assert clock.now() == pytest.approx(0.1)
+
+
+def test_real_time_follows_wall_clock_dt():
+    clock = SimClock()
+    assert not clock.is_fixed_step()
+    clock.tick(0.2)
+    clock.tick(0.1)
+    assert clock.now() == pytest.approx(0.3)
+
+
+@pytest.mark.parametrize(
+    "fixed_dt, period, steps, expected",
+    [
+        (0.01, 0.03, 30, 10),
+        (0.05, 0.03, 30, 30),
+        (1.0 / 30, 0.03, 30, 30),
+        (0.005, 0.03, 60, 10),
+    ],
+)
+def test_interval_due_count(fixed_dt, period, steps, expected):
+    clock = SimClock(fixed_dt)
+    interval = clock.interval(period)
+    count = 0
+    for i in range(steps):
+        clock.tick()
+        if interval.due():
+            count += 1
+    assert count == expected
+
+
+def test_seeded_rng_is_reproducible():
+    first = [SimClock(0.01, 42).rng.uniform(0, 1) for i in range(3)]
+    second = [SimClock(0.01, 42).rng.uniform(0, 1) for i in range(3)]
+    assert first == second
+
+
+def test_lockstep_requires_fixed_step():
+    assert SimClock(0.01, lockstep=True).is_lockstep()
+    assert not SimClock(lockstep=True).is_lockstep()
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+from src.batchenv import BatchEnv
+from src.snapshot import Snapshot, restore_robot, take_robot_fields
+
+
+def test_binary_round_trip():
+    snapshot = Snapshot(
+        {
+            "x": np.arange(5.0),
+            "hit": np.array([True, False]),
+            "step_count": 12,
+            "names": ["object", "light"],
+        }
+    )
+    restored = Snapshot.from_bytes(snapshot.to_bytes())
+    assert restored == snapshot
+    assert restored["names"].tolist() == ["object", "light"]
+
+
+def test_fields_are_read_only_copies():
+    x = np.zeros(3)
+    snapshot = Snapshot({"x": x})
+    x[0] = 1
+    assert snapshot["x"][0] == 0
+    with pytest.raises(ValueError):
+        snapshot["x"][0] = 2
+
+
+def test_bad_data_is_rejected():
+    with pytest.raises(ValueError):
+        Snapshot.from_bytes(b"NOPE" + bytes(4))
+
+
+def test_batch_env_restore_repeats_the_run():
+    env = BatchEnv("maze1.xml", num_robots=4)
+    env.reset()
+    rng = np.random.RandomState(0)
+    actions = rng.uniform(-100, 100, (30, 4, 2))
+    for action in actions[:10]:
+        env.step(action)
+    snapshot = env.snapshot()
+    for action in actions[10:]:
+        first = env.step(action)
+    env.restore(Snapshot.from_bytes(snapshot.to_bytes()))
+    assert env.step_count == 10
+    for action in actions[10:]:
+        second = env.step(action)
+    for key in first:
+        assert np.array_equal(first[key], second[key])
+
+
+class Drawing(object):
+    def delete(self):
+        pass
+
+
+@pytest.fixture
+def pi2go(tmp_path, monkeypatch):
+    pyglet = pytest.importorskip("pyglet")
+    pyglet.options["headless"] = True
+    try:
+        from src.robots import pi2go
+    except Exception as e:
+        pytest.skip("the robots cannot be loaded here: %s" % e)
+    from simclient import discovery
+    from src.robots import robotlink
+    from src.sensors.sonar import Map
+
+    class RobotBatch(pyglet.graphics.Batch):
+        """The drawing batch of the window, the sensors and LEDs are drawn with the pyglet 1 batch.add()."""
+
+        def add(self, *args):
+            return Drawing()
+
+    monkeypatch.setattr(discovery, "DISCOVERY_DIR", str(tmp_path))
+    monkeypatch.setattr(robotlink, "SHARED_MEMORY", False)
+    monkeypatch.setitem(robotlink.settings, "command_port", 0)
+    monkeypatch.setitem(robotlink.settings, "data_port", 0)
+    robot = pi2go.Pi2Go(
+        line_map_sprite=None,
+        sonar_map=Map(640, 480, 4),
+        static_objects=[],
+        batch=RobotBatch(),
+        window_width=640,
+        window_height=480,
+    )
+    yield robot
+    robot.link.stop()
+
+
+def test_robot_fields(pi2go):
+    pi2go.x = 100.0
+    pi2go.control_switch_on = True
+    front_led = pi2go.sensors[("led", "front1")]
+    front_led.set_colour(1, 2, 3)
+    light_sensor = pi2go.sensors[("light", "FrontLeft")]
+    light_sensor.value = 500
+    snapshot = Snapshot(take_robot_fields(pi2go))
+    assert snapshot["robot.led.front1.red_value"] == 1
+    assert snapshot["robot.light.FrontLeft.value"] == 500
+
+    pi2go.x = 50.0
+    pi2go.control_switch_on = False
+    front_led.turn_off()
+    light_sensor.value = 0
+    restore_robot(pi2go, snapshot)
+    assert pi2go.x == 100.0
+    assert pi2go.control_switch_on
+    assert front_led.get_colour() == (1, 2, 3)
+    assert light_sensor.value == 500
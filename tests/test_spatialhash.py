@@ -0,0 +1,90 @@
+import random
+from types import SimpleNamespace
+from src.spatialhash import SpatialHash
+
+
+def make_box(x, y, size=47):
+    return SimpleNamespace(x=x, y=y, width=size, height=size)
+
+
+def overlaps(box, x, y, half_width, half_height):
+    return (
+        abs(box.x - x) <= box.width / 2.0 + half_width
+        and abs(box.y - y) <= box.height / 2.0 + half_height
+    )
+
+
+def test_query_finds_every_overlapping_object():
+    rng = random.Random(1)
+    boxes = [make_box(rng.uniform(0, 800), rng.uniform(0, 600)) for _ in range(400)]
+    spatial_hash = SpatialHash()
+    for box in boxes:
+        spatial_hash.insert(box)
+    for _ in range(100):
+        x, y = rng.uniform(0, 800), rng.uniform(0, 600)
+        found = spatial_hash.query(x, y, 55, 55)
+        assert len(found) == len(set(map(id, found)))
+        for box in boxes:
+            if overlaps(box, x, y, 55, 55):
+                assert box in found
+
+
+def test_move_and_remove():
+    spatial_hash = SpatialHash()
+    box = make_box(100, 100)
+    spatial_hash.insert(box)
+    assert spatial_hash.query(100, 100, 10, 10) == [box]
+    box.x, box.y = 500, 400
+    spatial_hash.move(box)
+    assert spatial_hash.query(100, 100, 10, 10) == []
+    assert spatial_hash.query(500, 400, 10, 10) == [box]
+    spatial_hash.remove(box)
+    assert len(spatial_hash) == 0
+    assert spatial_hash.cells == {}
+
+
+class CountingBox(object):
+    """A box comparing like the sprites, from the corner of one box to the other, counting its tests."""
+
+    def __init__(self, x, y, size=47):
+        self.x = x
+        self.y = y
+        self.width = size
+        self.height = size
+        self.tests = 0
+
+    def collides_with(self, other):
+        self.tests += 1
+        return (
+            self.x < other.x + other.width
+            and self.x + self.width > other.x
+            and self.y < other.y + other.height
+            and self.height + self.y > other.y
+        )
+
+
+def test_collides_matches_testing_every_pair_and_only_tests_neighbours():
+    rng = random.Random(2)
+    boxes = [
+        CountingBox(rng.uniform(0, 2000), rng.uniform(0, 2000)) for _ in range(400)
+    ]
+    spatial_hash = SpatialHash()
+    for box in boxes:
+        spatial_hash.insert(box)
+    for dragged in boxes[:50]:
+        expected = any(
+            other is not dragged and dragged.collides_with(other) for other in boxes
+        )
+        dragged.tests = 0
+        assert spatial_hash.collides(dragged) == expected
+        assert dragged.tests < 20
+
+
+def test_collides_finds_objects_much_larger_than_obj():
+    spatial_hash = SpatialHash()
+    wall = CountingBox(150, 500, size=400)
+    dragged = CountingBox(500, 500)
+    spatial_hash.insert(wall)
+    spatial_hash.insert(dragged)
+    assert dragged.collides_with(wall)
+    assert spatial_hash.collides(dragged)